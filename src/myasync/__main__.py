@@ -0,0 +1,3 @@
+from myasync.cli import main
+
+main()
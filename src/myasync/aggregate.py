@@ -0,0 +1,360 @@
+import asyncio
+import math
+from array import array
+from asyncio import Queue, QueueFull
+from bisect import bisect_left
+from typing import Callable, Iterator, Protocol
+
+from myasync import clock
+from myasync.records import SampleBatch
+
+
+class WindowBatch:
+    """
+    Columnar min/max/mean/count summaries of one device's samples, one row
+    per window of `width` seconds starting at starts[i]
+    """
+
+    __slots__ = (
+        "device",
+        "width",
+        "starts",
+        "counts",
+        "mins",
+        "maxs",
+        "means",
+        "enqueued_at",
+        "spool_position",
+    )
+
+    def __init__(self, device: str = "", width: float = 0.0) -> None:
+        self.device: str = device
+        self.width: float = width
+        self.starts: array = array("d")
+        self.counts: array = array("q")
+        self.mins: array = array("d")
+        self.maxs: array = array("d")
+        self.means: array = array("d")
+        self.enqueued_at: float = 0.0  # set by reduce_batches
+        self.spool_position: tuple[str, int, int] | None = None  # never spooled
+
+    def append(
+        self, start: float, count: int, low: float, high: float, mean: float
+    ) -> None:
+        self.starts.append(start)
+        self.counts.append(count)
+        self.mins.append(low)
+        self.maxs.append(high)
+        self.means.append(mean)
+
+    def rows(self) -> Iterator[tuple[float, float, int, float, float, float]]:
+        """(start, end, count, min, max, mean) per window"""
+        width: float = self.width
+        return zip(
+            self.starts,
+            (start + width for start in self.starts),
+            self.counts,
+            self.mins,
+            self.maxs,
+            self.means,
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __repr__(self) -> str:
+        return f"WindowBatch(device={self.device!r}, width={self.width!r}, windows={len(self)})"
+
+
+class Reducer(Protocol):
+    """A stage that turns incoming SampleBatches into fewer rows to persist"""
+
+    def process(self, batch: SampleBatch) -> SampleBatch | WindowBatch: ...
+
+    def flush(
+        self, now: float | None = None
+    ) -> list[SampleBatch] | list[WindowBatch]: ...
+
+
+def _subset(batch: SampleBatch, keep: list[int]) -> SampleBatch:
+    out = SampleBatch(batch.device)
+    timestamps, intervals, values = batch.timestamps, batch.intervals, batch.values
+    for i in keep:
+        out.append(timestamps[i], intervals[i], values[i])
+    return out
+
+
+class DeadbandFilter:
+    """
+    Forwards a sample only when its value has moved more than `tolerance`
+    from the last forwarded value of the same device. Holding the last
+    forwarded value between forwarded samples reconstructs every dropped
+    sample to within `tolerance`. With max_gap, a sample is also forwarded
+    when max_gap device intervals have passed, so a flat signal still shows
+    it is alive.
+
+    A batch that stays inside the band is dropped with one min() and one
+    max() over its value array; only batches that cross it are walked.
+    """
+
+    def __init__(self, tolerance: float, max_gap: int | None = None) -> None:
+        self.tolerance: float = tolerance
+        self.max_gap: int | None = max_gap
+        self.last: dict[str, tuple[int, float]] = {}  # device: (interval, value)
+
+    def process(self, batch: SampleBatch) -> SampleBatch:
+        values: array = batch.values
+        if not values:
+            return SampleBatch(batch.device)
+        tolerance: float = self.tolerance
+        last: tuple[int, float] | None = self.last.get(batch.device)
+        if last is not None:
+            last_interval, last_value = last
+            if (
+                last_value - tolerance <= min(values)
+                and max(values) <= last_value + tolerance
+                and (
+                    self.max_gap is None
+                    or batch.intervals[-1] - last_interval < self.max_gap
+                )
+            ):
+                return SampleBatch(batch.device)
+        else:
+            last_interval, last_value = batch.intervals[0], math.inf
+
+        keep: list[int] = []
+        max_gap: int | None = self.max_gap
+        for i, (interval, value) in enumerate(zip(batch.intervals, values)):
+            if abs(value - last_value) > tolerance or (
+                max_gap is not None and interval - last_interval >= max_gap
+            ):
+                keep.append(i)
+                last_interval, last_value = interval, value
+        self.last[batch.device] = (last_interval, last_value)
+        return _subset(batch, keep)
+
+    def flush(self, now: float | None = None) -> list[SampleBatch]:
+        return []
+
+
+class _Door:
+    """Swinging door state of one device"""
+
+    __slots__ = ("anchor", "held", "upper", "lower")
+
+    def __init__(self, anchor: tuple[float, int, float]) -> None:
+        self.anchor: tuple[float, int, float] = anchor  # last forwarded sample
+        self.held: tuple[float, int, float] | None = None  # last sample seen
+        # Slopes from the anchor that pass within tolerance of every held-over sample
+        self.upper: float = -math.inf  # the lower door
+        self.lower: float = math.inf  # the upper door
+
+
+class SwingingDoorFilter:
+    """
+    Swinging door trending over the device's interval counter. The held
+    sample is forwarded once the line from the last forwarded sample to a
+    new one would pass further than `tolerance` from a sample between them,
+    so linear interpolation between forwarded samples reconstructs every
+    dropped one to within `tolerance`. Unlike a deadband, ramps compress as
+    well as plateaus.
+
+    The last sample seen is held until the door closes; flush() with no
+    argument forwards the held samples, e.g. at shutdown.
+    """
+
+    def __init__(self, tolerance: float) -> None:
+        self.tolerance: float = tolerance
+        self.doors: dict[str, _Door] = {}
+
+    def process(self, batch: SampleBatch) -> SampleBatch:
+        out = SampleBatch(batch.device)
+        tolerance: float = self.tolerance
+        door: _Door | None = self.doors.get(batch.device)
+        for sample in batch.rows():
+            if door is None:
+                door = _Door(sample)
+                out.append(*sample)
+                continue
+            _, anchor_interval, anchor_value = door.anchor
+            dx: int = sample[1] - anchor_interval
+            if dx <= 0:
+                # Interval counter went back (device restart): start a new line
+                if door.held is not None:
+                    out.append(*door.held)
+                door = _Door(sample)
+                out.append(*sample)
+                continue
+            value: float = sample[2]
+            slope: float = (value - anchor_value) / dx
+            if not door.lower >= slope >= door.upper:
+                # A line to this sample misses an earlier one by more than the
+                # tolerance: the held sample ends the line and starts the next
+                held: tuple[float, int, float] = door.held
+                out.append(*held)
+                door.anchor = held
+                door.upper, door.lower = -math.inf, math.inf
+                dx = sample[1] - held[1]
+                if dx <= 0:
+                    # Repeats the held interval (e.g. a line resent after a
+                    # reconnect): start a new line at it
+                    door = _Door(sample)
+                    out.append(*sample)
+                    continue
+                slope = (value - held[2]) / dx
+            upper: float = max(door.upper, slope - tolerance / dx)
+            lower: float = min(door.lower, slope + tolerance / dx)
+            door.upper, door.lower, door.held = upper, lower, sample
+        if door is not None:
+            self.doors[batch.device] = door
+        return out
+
+    def flush(self, now: float | None = None) -> list[SampleBatch]:
+        if now is not None:
+            return []
+        batches: list[SampleBatch] = []
+        for device, door in self.doors.items():
+            if door.held is not None:
+                batch = SampleBatch(device)
+                batch.append(*door.held)
+                batches.append(batch)
+                door.anchor, door.held = door.held, None
+                door.upper, door.lower = -math.inf, math.inf
+        return batches
+
+
+class WindowAggregator:
+    """
+    Per-device min/max/mean/count over windows of `width` seconds of
+    sample timestamp. Tumbling by default; with step < width, windows start
+    every `step` seconds and overlap (step must divide width).
+
+    Samples are summarised into step-sized panes as they arrive, each run of
+    samples in a pane with one min()/max()/sum() over an array slice, and
+    windows are combined from their panes. A window is emitted once a
+    sample past its end arrives, or by flush(now) once `now` is past its end.
+    """
+
+    def __init__(self, width: float, step: float | None = None) -> None:
+        step = width if step is None else step
+        panes: int = round(width / step)
+        if step <= 0 or panes < 1 or not math.isclose(panes * step, width):
+            raise ValueError(f"step {step} must divide window width {width}")
+        self.width: float = width
+        self.step: float = step
+        self.panes_per_window: int = panes
+        # device: {pane index: [count, min, max, sum]}
+        self.panes: dict[str, dict[int, list[float]]] = {}
+        self.emitted_through: dict[str, int] = {}  # last pane a window ended in
+
+    def process(self, batch: SampleBatch) -> WindowBatch:
+        panes: dict[int, list[float]] = self.panes.setdefault(batch.device, {})
+        timestamps, values = batch.timestamps, batch.values
+        step: float = self.step
+        n: int = len(values)
+        i: int = 0
+        while i < n:
+            pane: int = math.floor(timestamps[i] / step)
+            end: int = max(i + 1, bisect_left(timestamps, (pane + 1) * step, i))
+            run = values[i:end]
+            stats: list[float] | None = panes.get(pane)
+            if stats is None:
+                panes[pane] = [end - i, min(run), max(run), sum(run)]
+            else:
+                stats[0] += end - i
+                stats[1] = min(stats[1], min(run))
+                stats[2] = max(stats[2], max(run))
+                stats[3] += sum(run)
+            i = end
+        if not panes:
+            return WindowBatch(batch.device, self.width)
+        # Windows ending before the newest pane will get no more samples
+        return self._emit(batch.device, max(panes) - 1)
+
+    def flush(self, now: float | None = None) -> list[WindowBatch]:
+        batches: list[WindowBatch] = []
+        for device, panes in self.panes.items():
+            if not panes:
+                continue
+            if now is None:
+                # Everything, including sliding windows still open at the end
+                through: int = max(panes) + self.panes_per_window - 1
+            else:
+                through = math.floor(now / self.step) - 1
+            batch: WindowBatch = self._emit(device, through)
+            if batch:
+                batches.append(batch)
+        return batches
+
+    def _emit(self, device: str, through: int) -> WindowBatch:
+        """Windows of device ending in panes up to and including `through`"""
+        out = WindowBatch(device, self.width)
+        panes: dict[int, list[float]] = self.panes[device]
+        k: int = self.panes_per_window
+        after: int = self.emitted_through.get(device, min(panes) - 1)
+        ends: set[int] = {
+            end
+            for pane in panes
+            for end in range(max(pane, after + 1), min(pane + k - 1, through) + 1)
+        }
+        for end in sorted(ends):
+            window: list[list[float]] = [
+                panes[pane] for pane in range(end - k + 1, end + 1) if pane in panes
+            ]
+            count: float = sum(stats[0] for stats in window)
+            out.append(
+                (end - k + 1) * self.step,
+                int(count),
+                min(stats[1] for stats in window),
+                max(stats[2] for stats in window),
+                sum(stats[3] for stats in window) / count,
+            )
+        if through > after:
+            self.emitted_through[device] = through
+            for pane in [pane for pane in panes if pane <= through - k + 1]:
+                del panes[pane]
+        return out
+
+
+async def reduce_batches(
+    in_queue: Queue,
+    out_queue: Queue,
+    reducer: Reducer,
+    flush_interval: float = 1.0,
+    now: Callable[[], float] = clock.now,
+) -> None:
+    """
+    Pipeline stage between the reader and the database writer: pass every
+    SampleBatch from in_queue through reducer and queue what it emits.
+    Every flush_interval seconds without input, windows that have ended by
+    now() are flushed so a quiet device does not hold its last window back.
+    When cancelled, everything the reducer still holds is flushed to
+    out_queue, as far as it has room.
+    """
+    reduced: list = []  # emitted, not yet on out_queue
+    try:
+        while True:
+            try:
+                batch: SampleBatch = await asyncio.wait_for(
+                    in_queue.get(), flush_interval
+                )
+            except TimeoutError:
+                reduced = reducer.flush(now())
+            else:
+                reduced = [reducer.process(batch)]
+                in_queue.task_done()
+            while reduced:
+                item = reduced[0]
+                if item:
+                    item.enqueued_at = now()
+                    await out_queue.put(item)
+                del reduced[0]
+    except asyncio.CancelledError:
+        for item in reduced + reducer.flush():
+            if item:
+                item.enqueued_at = now()
+                try:
+                    out_queue.put_nowait(item)
+                except QueueFull:
+                    print(f"Dropped {len(item)} reduced rows at shutdown, queue full")
+        raise
@@ -1,27 +1,185 @@
 import asyncio
-import serial_asyncio
+import contextlib
+import random
 from asyncio import Queue, StreamReader, StreamWriter, Task
+from typing import TYPE_CHECKING, Awaitable, Callable
 
+from myasync import clock
+from myasync.aggregate import Reducer, WindowAggregator, reduce_batches
+from myasync.capture import CaptureWriter, open_capturing_serial_connection
+from myasync.clock import ClockAligner
+from myasync.codec import (
+    JSON_LINES,
+    BinaryCodec,
+    CodecProtocol,
+    JsonLinesCodec,
+    open_codec_serial_connection,
+)
+from myasync.command_writer import CommandQueue, CommandWriterStats, write_commands
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.eventlog import LOG
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+from myasync.live import LiveStore
+from myasync.metrics import LoopLagMonitor, PipelineMetrics, serve_metrics
+from myasync.records import SampleBatch
+from myasync.serial_thread import open_threaded_serial_connection
+from myasync.spool import SpoolQueue
+from myasync.watermark_queue import OverflowPolicy, WatermarkQueue
 
-async def read_from_arduino(reader: StreamReader, db_queue: Queue) -> None:
-    """Continuously read from Arduino serial port and queue data for database"""
+if TYPE_CHECKING:
+    # pyzmq is only needed when publishing
+    from myasync.publisher import SamplePublisher
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    rng: Callable[[], float] = random.random,
+) -> float:
+    """Exponential backoff with full jitter, so many ports do not reconnect in lockstep"""
+    return rng() * min(max_delay, base_delay * 2**attempt)
+
+
+async def put_batch(
+    db_queue: Queue,
+    batch: SampleBatch,
+    metrics: PipelineMetrics | None = None,
+    live: LiveStore | None = None,
+    publisher: "SamplePublisher | None" = None,
+    aligner: ClockAligner | None = None,
+) -> None:
+    if aligner is not None:
+        aligner.align(batch)
+    # Before the put, which can block on a full queue
+    if live is not None:
+        live.update(batch)
+    if publisher is not None:
+        publisher.update(batch)
+    await db_queue.put(batch)
+    if metrics is not None:
+        metrics.batch_enqueued(batch)
+
+
+async def read_from_arduino(
+    reader: StreamReader,
+    db_queue: Queue,
+    line_delay: float = 0.5,
+    batch_size: int = 100,
+    max_linger: float = 0.05,
+    metrics: PipelineMetrics | None = None,
+    live: LiveStore | None = None,
+    publisher: "SamplePublisher | None" = None,
+    aligner: ClockAligner | None = None,
+) -> None:
+    """
+    Continuously read from Arduino serial port and queue data for database.
+    Decoded samples are queued as SampleBatches of up to batch_size, flushed
+    at the latest max_linger seconds after the first sample in the batch.
+    Set line_delay to 0 for the ingest mode that reads as fast as the device
+    sends; backpressure then comes from a bounded db_queue.
+    """
+    loop = asyncio.get_running_loop()
+    batch: SampleBatch = SampleBatch()
+    flush_at: float = 0.0
     while True:
         try:
-            data: bytes = await reader.readline()
+            if batch and loop.time() >= flush_at:
+                await put_batch(db_queue, batch, metrics, live, publisher, aligner)
+                batch = SampleBatch()
+
+            try:
+                async with asyncio.timeout_at(flush_at if batch else None):
+                    data: bytes = await reader.readline()
+            except TimeoutError:
+                continue
+
+            if not data and reader.at_eof():
+                if batch:
+                    await put_batch(db_queue, batch, metrics, live, publisher, aligner)
+                print("Arduino serial port closed")
+                return
             decoded_data: str = data.decode("utf-8").strip()
             if decoded_data:
-                await db_queue.put(decoded_data)
-                await asyncio.sleep(0.5)
+                if not batch:
+                    flush_at = loop.time() + max_linger
+                if not batch.append_line(decoded_data, clock.now()):
+                    LOG.log("reader", "Ignoring non-sample line", line=decoded_data)
+                if len(batch) >= batch_size:
+                    await put_batch(db_queue, batch, metrics, live, publisher, aligner)
+                    batch = SampleBatch()
+                if line_delay > 0:
+                    await asyncio.sleep(line_delay)
+        except OSError as e:
+            # The port itself has failed (e.g. unplugged); leave reconnecting
+            # to the caller, see myasync.supervisor
+            print(f"Arduino serial port failed: {e}")
+            raise
         except Exception as e:
+            if metrics is not None:
+                metrics.read_errors.inc()
             print(f"Error reading from Arduino: {e}")
             await asyncio.sleep(0.5)
 
 
+async def read_batches_from_arduino(
+    protocol: LineFramingProtocol,
+    db_queue: Queue,
+    metrics: PipelineMetrics | None = None,
+    live: LiveStore | None = None,
+    publisher: "SamplePublisher | None" = None,
+    aligner: ClockAligner | None = None,
+) -> None:
+    """
+    Queue data for database from a LineFramingProtocol, which wakes this
+    task once per serial chunk rather than once per line. Each chunk's
+    lines become one SampleBatch.
+    """
+    rejected: int = 0
+    while True:
+        received_at, lines = await protocol.read_timed_batch()
+        if not lines:
+            print("Arduino serial port closed")
+            return
+        batch: SampleBatch = SampleBatch.from_lines(lines, received_at)
+        if batch.rejected:
+            # Rate limited; the running total covers the records left out
+            rejected += batch.rejected
+            LOG.log(
+                "reader",
+                "Ignored non-sample lines",
+                lines=batch.rejected,
+                total=rejected,
+            )
+        if batch:
+            await put_batch(db_queue, batch, metrics, live, publisher, aligner)
+
+
+async def read_samples_from_arduino(
+    protocol: CodecProtocol,
+    db_queue: Queue,
+    metrics: PipelineMetrics | None = None,
+    live: LiveStore | None = None,
+    publisher: "SamplePublisher | None" = None,
+    aligner: ClockAligner | None = None,
+) -> None:
+    """
+    Queue data for database from a CodecProtocol, which decodes JSON lines or
+    binary frames depending on what was negotiated with the device.
+    """
+    while True:
+        batch: SampleBatch = await protocol.read_samples()
+        if not batch:
+            print("Arduino serial port closed")
+            return
+        await put_batch(db_queue, batch, metrics, live, publisher, aligner)
+
+
 async def write_to_database(db_queue: Queue) -> None:
     """Process database writes from the queue"""
     while True:
         try:
-            data: str = await db_queue.get()
+            data: SampleBatch = await db_queue.get()
             # Your database write logic here
             await write_data_to_db(data)
             db_queue.task_done()
@@ -29,45 +187,224 @@ async def write_to_database(db_queue: Queue) -> None:
             print(f"Error writing to database: {e}")
 
 
-async def handle_arduino_commands(writer: StreamWriter, command_queue: Queue) -> None:
-    """Process commands that need to be sent to Arduino"""
-    while True:
-        try:
-            command: str = await command_queue.get()
-            writer.write(f"{command}\n".encode("utf-8"))
-            await writer.drain()
-            command_queue.task_done()
-            print(f"Sent arduino command: {command}")
-        except Exception as e:
-            print(f"Error writing to Arduino: {e}")
+async def handle_arduino_commands(
+    writer: StreamWriter,
+    command_queue: Queue,
+    stats: CommandWriterStats | None = None,
+    codec: JsonLinesCodec | BinaryCodec = JSON_LINES,
+    metrics: PipelineMetrics | None = None,
+) -> None:
+    """
+    Process commands that need to be sent to Arduino. Queue plain strings or
+    Commands; each burst goes out in one write with superseded setpoint and
+    LED commands dropped (see myasync.command_writer).
+    """
+    await write_commands(writer, command_queue, stats, codec, metrics)
 
 
-async def write_data_to_db(data: str) -> None:
+async def write_data_to_db(data: SampleBatch) -> None:
     """Placeholder for your database write implementation"""
     # Your actual database code here
     await asyncio.sleep(0.01)  # Simulate async DB operation
-    print(f"Wrote to DB: {data}")
+    if data:
+        LOG.log(
+            "db",
+            "Wrote to DB",
+            rows=len(data),
+            first_interval=data.intervals[0],
+            last_interval=data.intervals[-1],
+        )
+    else:
+        LOG.log("db", "Wrote to DB", rows=0)
+
 
+async def main(
+    line_delay: float = 0.5,
+    queue_size: int = 1000,
+    high_watermark: int | None = None,
+    low_watermark: int | None = None,
+    overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    db_path: str = "readings.db",
+    max_batch_size: int = 500,
+    max_linger: float = 0.05,
+    framed: bool = False,
+    codec: str | None = None,
+    url: str = "/dev/ttyACM0",  # Adjust for your Arduino port
+    baudrate: int = 115200,
+    sink: SQLiteSink | None = None,  # used instead of db_path and left open
+    capture_path: str | None = None,  # raw serial input, see myasync.capture
+    metrics_port: int | None = None,  # serve Prometheus metrics on 127.0.0.1
+    spool_dir: str | None = None,  # spill db_queue overflow to disk, see myasync.spool
+    reducer: Reducer | None = None,  # filter or window samples, see myasync.aggregate
+    threaded: bool = False,  # read on a dedicated thread, see myasync.serial_thread
+    live: LiveStore | None = None,  # latest samples for live queries, see myasync.live
+    publish_endpoint: str | None = None,  # ZMQ PUB fan-out, see myasync.publisher
+    align_clock: bool = False,  # store acquisition times, see myasync.clock
+) -> None:
+    if spool_dir is not None and isinstance(reducer, WindowAggregator):
+        raise ValueError("WindowBatches cannot be spooled; use a filter or no spool")
+    owns_sink: bool = sink is None
+    if sink is None:
+        sink = SQLiteSink(db_path)
 
-async def main() -> None:
     # Create queues for inter-task communication
-    db_queue: Queue = Queue()
-    command_queue: Queue = Queue()
-
-    # Open serial connection to Arduino
-    reader: StreamReader
-    writer: StreamWriter
-    reader, writer = await serial_asyncio.open_serial_connection(
-        url="/dev/ttyACM0",  # Adjust for your Arduino port
-        baudrate=115200,
+    db_queue: WatermarkQueue | SpoolQueue
+    max_retries: int | None = 3
+    catchup_batch_size: int | None = None
+    if spool_dir is not None:
+        # queue_size batches stay in memory; the database is retried until it
+        # recovers while the backlog goes to disk, resuming after a restart
+        db_queue = SpoolQueue(
+            spool_dir, memory_size=queue_size, start=await sink.spool_position("db")
+        )
+        max_retries = None
+        catchup_batch_size = 10 * max_batch_size
+    else:
+        db_queue = WatermarkQueue(
+            maxsize=queue_size,
+            high_watermark=high_watermark,
+            low_watermark=low_watermark,
+            policy=overflow_policy,
+        )
+    command_queue: CommandQueue = CommandQueue()
+    # With a reducer the readers queue raw batches for it instead of db_queue
+    read_queue: Queue = db_queue if reducer is None else Queue(maxsize=queue_size)
+
+    metrics: PipelineMetrics | None = None
+    metrics_server: asyncio.Server | None = None
+    if metrics_port is not None:
+        metrics = PipelineMetrics()
+        metrics.watch_queue("db", db_queue)
+        metrics.watch_queue("command", command_queue)
+        if reducer is not None:
+            metrics.watch_queue("reduce", read_queue)
+        metrics_server = await serve_metrics(metrics.registry, port=metrics_port)
+
+    publisher: "SamplePublisher | None" = None
+    if publish_endpoint is not None:
+        from myasync.publisher import SamplePublisher
+
+        publisher = SamplePublisher.bind(publish_endpoint)
+
+    aligner: ClockAligner | None = ClockAligner() if align_clock else None
+
+    capture: CaptureWriter | None = (
+        None if capture_path is None else CaptureWriter(capture_path)
     )
 
+    async def connect() -> (
+        tuple[StreamWriter, Awaitable[None], JsonLinesCodec | BinaryCodec]
+    ):
+        """Open the serial connection to Arduino; returns its writer and reader"""
+        if codec is not None:
+            codec_protocol: CodecProtocol
+            codec_protocol, writer = await open_codec_serial_connection(
+                url=url,
+                baudrate=baudrate,
+                codec=codec,
+                capture=capture,
+            )
+            return (
+                writer,
+                read_samples_from_arduino(
+                    codec_protocol, read_queue, metrics, live, publisher, aligner
+                ),
+                codec_protocol.codec,
+            )
+        if threaded or framed:
+            open_connection = (
+                open_threaded_serial_connection
+                if threaded
+                else open_framed_serial_connection
+            )
+            protocol: LineFramingProtocol
+            protocol, writer = await open_connection(
+                url=url,
+                baudrate=baudrate,
+                capture=capture,
+            )
+            return (
+                writer,
+                read_batches_from_arduino(
+                    protocol, read_queue, metrics, live, publisher, aligner
+                ),
+                JSON_LINES,
+            )
+        reader: StreamReader
+        reader, writer = await open_capturing_serial_connection(
+            url=url,
+            baudrate=baudrate,
+            capture=capture,
+        )
+        return (
+            writer,
+            read_from_arduino(
+                reader,
+                read_queue,
+                line_delay,
+                metrics=metrics,
+                live=live,
+                publisher=publisher,
+                aligner=aligner,
+            ),
+            JSON_LINES,
+        )
+
+    async def run_port() -> None:
+        """
+        Read from the port and send it commands; when it fails or closes,
+        reopen it with jittered backoff as SerialSupervisor does
+        """
+        attempt: int = 0
+        while True:
+            try:
+                writer, read, command_codec = await connect()
+            except OSError as e:
+                error: str = f"connect failed: {e!r}"
+            else:
+                attempt = 0
+                commands: Task = asyncio.create_task(
+                    handle_arduino_commands(
+                        writer, command_queue, codec=command_codec, metrics=metrics
+                    )
+                )
+                try:
+                    await read
+                    error = "port closed"
+                except OSError as e:
+                    error = repr(e)
+                finally:
+                    commands.cancel()
+                    await asyncio.gather(commands, return_exceptions=True)
+                    writer.close()
+                    with contextlib.suppress(Exception):
+                        await writer.wait_closed()
+            delay: float = backoff_delay(attempt)
+            attempt += 1
+            print(f"{url}: {error}, reconnecting in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
     # Create and run all tasks concurrently
     tasks: list[Task] = [
-        asyncio.create_task(read_from_arduino(reader, db_queue)),
-        asyncio.create_task(write_to_database(db_queue)),
-        asyncio.create_task(handle_arduino_commands(writer, command_queue)),
+        asyncio.create_task(run_port()),
+        asyncio.create_task(
+            write_batches_to_database(
+                db_queue,
+                sink,
+                max_batch_size,
+                max_linger,
+                max_retries=max_retries,
+                metrics=metrics,
+                catchup_batch_size=catchup_batch_size,
+            )
+        ),
     ]
+    if reducer is not None:
+        tasks.append(asyncio.create_task(reduce_batches(read_queue, db_queue, reducer)))
+    if metrics is not None:
+        tasks.append(
+            asyncio.create_task(LoopLagMonitor(histogram=metrics.loop_lag).run())
+        )
 
     try:
         # Example: Add a command to the queue
@@ -78,10 +415,29 @@ async def main() -> None:
 
     except KeyboardInterrupt:
         print("Shutting down...")
+    finally:
+        # Stop reading first; a reducer flushes the samples it holds as it stops
+        writer: Task = tasks.pop(1)
         for task in tasks:
             task.cancel()
-        writer.close()
-        await writer.wait_closed()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if reducer is not None and not writer.done():
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(5.0):
+                    await db_queue.join()
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+        print(f"db_queue stats: {db_queue.stats}")
+        if owns_sink:
+            await sink.close()
+        if capture is not None:
+            capture.close()
+        if isinstance(db_queue, SpoolQueue):
+            db_queue.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        if publisher is not None:
+            publisher.close()
 
 
 if __name__ == "__main__":
@@ -2,18 +2,20 @@
 # Copyright (c) PyZMQ Developers.
 # This example is in the public domain (CC-0)
 
+import argparse
 import asyncio
 import json
 import random
 import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
 
 import zmq
-from zmq.asyncio import Context, Poller
+from zmq.asyncio import Context, Socket
 
 url = 'tcp://127.0.0.1:5555'
 
-ctx = Context.instance()
-
 
 async def ping() -> None:
     """print dots to indicate idleness"""
@@ -22,43 +24,145 @@ async def ping() -> None:
         print('.')
 
 
-# async def receiver() -> None:
-#     """receive messages with polling"""
-#     pull = ctx.socket(zmq.PULL)
-#     pull.connect(url)
-#     poller = Poller()
-#     poller.register(pull, zmq.POLLIN)
-#     while True:
-#         events = await poller.poll()
-#         if pull in dict(events):
-#             print("recving", events)
-#             msg = await pull.recv_multipart()
-#             print('recvd', json.loads(msg[0].decode("utf-8")))
+def target_temp_message() -> bytes:
+    target_temp = random.randrange(10, 30)
+    return json.dumps({"target-temp": target_temp}).encode("utf-8")
 
 
-async def sender() -> None:
-    """send a message every second"""
-    tic = time.time()
+def push_socket(ctx: Context, url: str = url, sndhwm: int = 1000) -> Socket:
+    """PUSH socket bound to url; sends wait once sndhwm messages are queued"""
     push = ctx.socket(zmq.PUSH)
+    push.setsockopt(zmq.SNDHWM, sndhwm)
     push.bind(url)
+    return push
+
+
+def percentile(values: Iterable[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+@dataclass
+class PublishStats:
+    messages: int = 0
+    sends: int = 0
+    elapsed: float = 0.0
+    # The most recent sends only, so an unbounded run does not grow memory
+    send_latencies: deque[float] = field(default_factory=lambda: deque(maxlen=100_000))
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        if not self.send_latencies:
+            return "nothing sent"
+        p50, p99 = percentile(self.send_latencies, 50), percentile(self.send_latencies, 99)
+        return (
+            f"{self.messages:,} msgs in {self.sends:,} sends over {self.elapsed:.2f}s "
+            f"= {self.rate:,.0f} msgs/s; send latency p50={p50 * 1e6:.1f}us "
+            f"p99={p99 * 1e6:.1f}us max={max(self.send_latencies) * 1e6:.1f}us"
+        )
+
+
+async def publish(
+    push: Socket,
+    rate: float,
+    batch_size: int = 1,
+    duration: float | None = None,
+    count: int | None = None,
+    make_message: Callable[[], bytes] = target_temp_message,
+) -> PublishStats:
+    """
+    Send `rate` messages per second as multipart sends of batch_size frames
+    until duration seconds or count messages. Sends are scheduled against
+    absolute deadlines, so a late send is followed immediately by the next
+    one rather than drifting below the target rate.
+    """
+    loop = asyncio.get_running_loop()
+    stats = PublishStats()
+    period: float = batch_size / rate
+    start: float = loop.time()
+    next_send: float = start
+    end: float | None = None if duration is None else start + duration
+
+    while (end is None or loop.time() < end) and (count is None or stats.messages < count):
+        frames: list[bytes] = [make_message() for _ in range(batch_size)]
+        tic: float = time.perf_counter()
+        await push.send_multipart(frames)
+        stats.send_latencies.append(time.perf_counter() - tic)
+        stats.messages += batch_size
+        stats.sends += 1
+
+        next_send += period
+        delay: float = next_send - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    stats.elapsed = loop.time() - start
+    return stats
+
+
+async def sender(ctx: Context | None = None, url: str = url, interval: float = 20) -> None:
+    """send a random target temperature every `interval` seconds"""
+    ctx = Context.instance() if ctx is None else ctx
+    push = push_socket(ctx, url)
+    while True:
+        string_to_send = target_temp_message()
+        print(f"sending = {string_to_send.decode('utf-8')}")
+        await push.send_multipart([string_to_send])
+        await asyncio.sleep(interval)
+
+
+async def count_received(pull: Socket, received: list[int]) -> None:
+    """Local PULL consumer for load tests; counts frames in received[0]"""
     while True:
-        # time_elapsed = time.time() - tic
-        # string_to_send = json.dumps({"time-elapsed": time_elapsed})
-
-        target_temp = random.randrange(10, 30)
-        string_to_send = json.dumps({"target-temp": target_temp})
-
-        print(f"sending = {string_to_send}")
-        await push.send_multipart([string_to_send.encode("utf-8")])
-        await asyncio.sleep(20)
-
-
-asyncio.run(
-    asyncio.wait(
-        [
-            # ping(),
-            # receiver(),
-            sender(),
-        ]
-    )
-)
+        frames = await pull.recv_multipart()
+        received[0] += len(frames)
+
+
+async def load_test(
+    rate: float,
+    batch_size: int = 1,
+    duration: float = 5.0,
+    sndhwm: int = 1000,
+    url: str = "tcp://127.0.0.1:5556",
+) -> PublishStats:
+    """Publish at `rate` msgs/s against a local PULL consumer and report what was achieved"""
+    ctx = Context()
+    push = push_socket(ctx, url, sndhwm)
+    pull = ctx.socket(zmq.PULL)
+    pull.connect(url)
+    received: list[int] = [0]
+    consumer = asyncio.create_task(count_received(pull, received))
+    try:
+        stats = await publish(push, rate, batch_size, duration=duration)
+        # Give the consumer a moment to catch up with what is still queued
+        for _ in range(100):
+            if received[0] >= stats.messages:
+                break
+            await asyncio.sleep(0.01)
+        print(stats.summary())
+        print(f"consumer received {received[0]:,} of {stats.messages:,}")
+        return stats
+    finally:
+        consumer.cancel()
+        push.close(linger=0)
+        pull.close(linger=0)
+        ctx.term()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish target temperatures over ZMQ")
+    parser.add_argument("--url", default=url)
+    parser.add_argument("--interval", type=float, default=20, help="seconds between sends")
+    parser.add_argument("--rate", type=float, help="load-test at this many msgs/s instead")
+    parser.add_argument("--batch", type=int, default=1, help="frames per multipart send")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--sndhwm", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.rate:
+        asyncio.run(load_test(args.rate, args.batch, args.duration, args.sndhwm, args.url))
+    else:
+        asyncio.run(sender(url=args.url, interval=args.interval))
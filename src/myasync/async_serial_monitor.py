@@ -1,22 +1,27 @@
 import asyncio
-import serial_asyncio
 
+from myasync.eventlog import LOG, EventLog
+from myasync.framing import open_framed_serial_connection
 
-async def simple_monitor(port: str, baudrate: int = 115200):
-    """Simple async Arduino monitor"""
+
+async def simple_monitor(port: str, baudrate: int = 115200, log: EventLog = LOG):
+    """Simple async Arduino monitor; lines go to `log` under the "serial" category"""
+    writer = None
     try:
         # Open connection
-        reader, writer = await serial_asyncio.open_serial_connection(
-            url=port, baudrate=baudrate
-        )
+        protocol, writer = await open_framed_serial_connection(port, baudrate)
         print(f"Connected to {port}")
 
-        # Reading loop
+        # Reading loop, one wakeup per batch of lines
         while True:
-            data: bytes = await reader.readline()
-            if data:
+            lines: list[bytes] = await protocol.read_batch()
+            if not lines:
+                print(f"{port} closed")
+                break
+
+            for data in lines:
                 message: str = data.decode("utf-8").strip()
-                print(f"Arduino: {message}")
+                log.log("serial", "Arduino", port=port, line=message)
 
                 # Example: Echo back or send commands
                 if message == "PING":
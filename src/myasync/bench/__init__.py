@@ -0,0 +1 @@
+"""Throughput and latency benchmarks, runnable with `python -m myasync.bench.<name>`"""
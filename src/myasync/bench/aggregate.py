@@ -0,0 +1,67 @@
+"""Rows kept and cost per sample of each reducer on a slowly varying signal"""
+
+import argparse
+import time
+
+from myasync.aggregate import (
+    DeadbandFilter,
+    Reducer,
+    SwingingDoorFilter,
+    WindowAggregator,
+)
+from myasync.records import SampleBatch
+from myasync.samples import sine_wave_value
+
+
+def signal(
+    samples: int, batch_size: int, period: int, rate: float
+) -> list[SampleBatch]:
+    """The test generator's sine, sampled `rate` times a second, in reader-sized batches"""
+    batches: list[SampleBatch] = []
+    for start in range(0, samples, batch_size):
+        batch = SampleBatch("ttyACM0")
+        for interval in range(start, min(start + batch_size, samples)):
+            batch.append(interval / rate, interval, sine_wave_value(interval, period))
+        batches.append(batch)
+    return batches
+
+
+def run(reducer: Reducer, batches: list[SampleBatch]) -> tuple[int, float]:
+    """(rows out, seconds)"""
+    start: float = time.perf_counter()
+    rows: int = sum(len(reducer.process(batch)) for batch in batches)
+    rows += sum(len(batch) for batch in reducer.flush())
+    return rows, time.perf_counter() - start
+
+
+def main(
+    samples: int = 200_000,
+    batch_size: int = 100,
+    period: int = 2000,
+    rate: float = 100.0,
+) -> None:
+    batches: list[SampleBatch] = signal(samples, batch_size, period, rate)
+    reducers: dict[str, Reducer] = {
+        "deadband 0.05": DeadbandFilter(0.05),
+        "deadband 0.01": DeadbandFilter(0.01),
+        "swinging door 0.01": SwingingDoorFilter(0.01),
+        "swinging door 0.001": SwingingDoorFilter(0.001),
+        "tumbling 1s": WindowAggregator(1.0),
+        "sliding 10s/1s": WindowAggregator(10.0, 1.0),
+    }
+    for name, reducer in reducers.items():
+        rows, elapsed = run(reducer, batches)
+        print(
+            f"{name:<22} {rows:>8} rows  {samples / rows:>7.1f}x fewer"
+            f"  {elapsed / samples * 1e9:>7.0f} ns/sample"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--period", type=int, default=2000, help="samples per cycle")
+    parser.add_argument("--rate", type=float, default=100.0, help="samples/s")
+    args = parser.parse_args()
+    main(args.samples, args.batch_size, args.period, args.rate)
@@ -0,0 +1,85 @@
+"""Push setpoint bursts through ZmqSerialBridge over inproc and report throughput and conflation"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import zmq
+from zmq.asyncio import Context
+
+from myasync.bridge import ZmqSerialBridge, temp_frame
+
+
+class PacedWriter:
+    """Stands in for the serial StreamWriter; drain() takes as long as the baud rate needs"""
+
+    def __init__(self, baudrate: int) -> None:
+        self.baudrate: int = baudrate
+        self.pending: int = 0
+        self.bytes_written: int = 0
+        self.draining: bool = False
+
+    def write(self, data: bytes) -> None:
+        self.pending += len(data)
+        self.bytes_written += len(data)
+
+    async def drain(self) -> None:
+        self.draining = True
+        # 8N1 framing: 10 bits on the wire per byte
+        await asyncio.sleep(self.pending * 10 / self.baudrate)
+        self.pending = 0
+        self.draining = False
+
+
+async def main(messages: int = 100_000, baudrate: int = 115200, burst: int = 100) -> None:
+    ctx = Context()
+    push = ctx.socket(zmq.PUSH)
+    push.bind("inproc://bench-bridge")
+    pull = ctx.socket(zmq.PULL)
+    pull.connect("inproc://bench-bridge")
+    writer = PacedWriter(baudrate)
+    bridge = ZmqSerialBridge(pull, writer)
+
+    payloads: list[bytes] = [
+        json.dumps({"target-temp": 10 + i % 20}).encode("utf-8") for i in range(messages)
+    ]
+    start = time.perf_counter()
+    bridge_task = asyncio.create_task(bridge.run())
+    # Bursts interleaved with the running bridge, which conflates whatever
+    # queued up while its previous write was draining
+    for i in range(0, messages, burst):
+        for payload in payloads[i : i + burst]:
+            await push.send_multipart([payload])
+        await asyncio.sleep(0)
+    # pump() goes from counting the last message to drain() without yielding,
+    # so once all are received the final write is in flight or done
+    while bridge.stats.received < messages or writer.draining:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    bridge_task.cancel()
+    await asyncio.gather(bridge_task, return_exceptions=True)
+
+    stats = bridge.stats
+    print(f"{stats.received:,} messages in {elapsed:.3f}s = {stats.received / elapsed:,.0f} msgs/s")
+    print(
+        f"wakeups={stats.wakeups:,} conflated={stats.conflated:,} "
+        f"frames_written={stats.frames_written:,} serial_bytes={writer.bytes_written:,}"
+    )
+    unconflated: int = sum(len(temp_frame(10 + i % 20)) for i in range(messages))
+    print(
+        f"one frame per message would be {unconflated:,} bytes, "
+        f"{unconflated * 10 / baudrate:.1f}s at {baudrate} baud"
+    )
+    push.close(linger=0)
+    pull.close(linger=0)
+    ctx.term()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--burst", type=int, default=100, help="messages per send burst")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.baudrate, args.burst))
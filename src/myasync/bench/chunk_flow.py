@@ -0,0 +1,86 @@
+"""
+Per-sample latency through InputChunkProtocol with watermark flow control,
+against the original pause-after-every-chunk protocol resumed by a 100 ms
+poll, reading a paced VirtualArduino.
+"""
+
+import argparse
+import asyncio
+import time
+
+import serial_asyncio
+
+from myasync.bench.e2e import percentile
+from myasync.framing import FramingStats, split_lines
+from myasync.records import parse_sample_line
+from myasync.test_serial_asyncio import InputChunkProtocol
+from myasync.virtual_device import VirtualArduino
+
+
+class PolledChunkProtocol(InputChunkProtocol):
+    """The original behaviour: pause after every chunk, resumed by poll()"""
+
+    def data_received(self, data: bytes) -> None:
+        super().data_received(data)
+        self.pause_reading()
+
+    async def read(self) -> bytes:
+        chunk: bytes = await self._chunks.get()
+        self.buffered -= len(chunk)
+        return chunk
+
+    async def poll(self, interval: float = 0.1) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.resume_reading()
+
+
+async def bench_protocol(factory, samples: int, rate: float) -> dict[str, float]:
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    with VirtualArduino(rate=rate, count=samples) as device:
+        transport, protocol = await serial_asyncio.create_serial_connection(
+            loop, factory, device.port, baudrate=115200
+        )
+        poller = (
+            asyncio.create_task(protocol.poll())
+            if isinstance(protocol, PolledChunkProtocol)
+            else None
+        )
+        buffer, stats = bytearray(), FramingStats()
+        try:
+            while len(latencies) < samples:
+                buffer += await protocol.read()
+                read_at: float = time.perf_counter()
+                for line in split_lines(buffer, 4096, stats):
+                    sample = parse_sample_line(line)
+                    if sample is not None and sample[0] in device.sent_at:
+                        latencies.append(read_at - device.sent_at[sample[0]])
+        finally:
+            if poller is not None:
+                poller.cancel()
+            transport.close()
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "chunks": protocol.stats.chunks,
+        "pauses": protocol.stats.pauses,
+        "paused_s": protocol.stats.paused_seconds,
+    }
+
+
+async def main(samples: int = 2000, rate: float = 1000.0) -> None:
+    for name, factory in (
+        ("polled 100 ms", PolledChunkProtocol),
+        ("watermarks", InputChunkProtocol),
+    ):
+        result = await bench_protocol(factory, samples, rate)
+        print(f"{name:<14} " + "  ".join(f"{k} {v:.2f}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="samples/s")
+    args = parser.parse_args()
+    asyncio.run(main(args.samples, args.rate))
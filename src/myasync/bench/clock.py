@@ -0,0 +1,70 @@
+"""
+Accuracy and cost of ClockAligner on a simulated device: per-sample error
+of receive stamps against the aligned acquisition times, for chunked
+delivery with exponential queueing jitter.
+"""
+
+import argparse
+import random
+import time
+
+from myasync.bench.e2e import percentile
+from myasync.clock import ClockAligner
+from myasync.records import SampleBatch
+
+
+def simulate(
+    samples: int, period: float, per_chunk: int, jitter: float, link: float
+) -> tuple[list[float], list[SampleBatch]]:
+    """True acquisition times, and batches stamped with their chunk's receive time"""
+    rng = random.Random(0)
+    acquired: list[float] = [1_700_000_000.0 + period * i for i in range(samples)]
+    batches: list[SampleBatch] = []
+    for first in range(0, samples, per_chunk):
+        last: int = min(first + per_chunk, samples) - 1
+        received_at: float = acquired[last] + link + rng.expovariate(1 / jitter)
+        batch = SampleBatch()
+        for i in range(first, last + 1):
+            batch.append(received_at, i, 0.0)
+        batches.append(batch)
+    return acquired, batches
+
+
+def main(
+    samples: int = 100_000,
+    period: float = 0.001 * (1 + 50e-6),
+    per_chunk: int = 16,
+    jitter: float = 0.005,
+    link: float = 0.001,
+) -> None:
+    acquired, batches = simulate(samples, period, per_chunk, jitter, link)
+    aligner = ClockAligner()
+    raw: list[float] = []
+    aligned: list[float] = []
+    elapsed: float = 0.0
+    for batch in batches:
+        raw.extend(t - acquired[i] for t, i in zip(batch.timestamps, batch.intervals))
+        start: float = time.perf_counter()
+        aligner.align(batch)
+        elapsed += time.perf_counter() - start
+        aligned.extend(
+            abs(t - link - acquired[i])
+            for t, i in zip(batch.timestamps, batch.intervals)
+        )
+    settled: list[float] = aligned[samples // 4 :]
+    print(f"align()            {elapsed / samples * 1e9:>8.0f} ns/sample")
+    for name, errors in (("receive stamp", raw), ("aligned, settled", settled)):
+        print(
+            f"{name:<18} error p50 {percentile(errors, 50) * 1000:.3f} ms"
+            f"  p99 {percentile(errors, 99) * 1000:.3f} ms"
+        )
+    print(f"period {aligner.period:.9f} s (true {period:.9f}), {aligner.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--per-chunk", type=int, default=16)
+    parser.add_argument("--jitter", type=float, default=0.005, help="mean, seconds")
+    args = parser.parse_args()
+    main(args.samples, per_chunk=args.per_chunk, jitter=args.jitter)
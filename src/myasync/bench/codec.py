@@ -0,0 +1,57 @@
+"""Compare the JSON lines and binary codecs: wire size, link throughput and decode cost"""
+
+import argparse
+import time
+
+from myasync.codec import BINARY, JSON_LINES, BinaryCodec, JsonLinesCodec
+from myasync.records import SampleBatch
+from myasync.samples import sine_wave_value
+
+# 8N1 serial: a start and a stop bit around every data byte
+BITS_PER_BYTE: int = 10
+
+
+def encode_stream(codec: JsonLinesCodec | BinaryCodec, samples: int) -> bytes:
+    return b"".join(
+        codec.encode_sample(interval, sine_wave_value(interval))
+        for interval in range(samples)
+    )
+
+
+def decode_cpu(
+    codec: JsonLinesCodec | BinaryCodec, stream: bytes, samples: int, chunk_size: int
+) -> float:
+    """CPU nanoseconds per decoded sample, feeding the stream in serial-read sized chunks"""
+    decoder = codec.decoder()
+    batch: SampleBatch = SampleBatch()
+    timestamp: float = time.time()
+    cpu_start: float = time.process_time()
+    for i in range(0, len(stream), chunk_size):
+        decoder.decode(stream[i : i + chunk_size], batch, timestamp)
+    cpu: float = time.process_time() - cpu_start
+    assert len(batch) == samples, f"{codec.name} decoded {len(batch)} of {samples}"
+    return cpu / samples * 1e9
+
+
+def main(
+    samples: int = 200_000, baudrate: int = 115200, chunk_size: int = 1024
+) -> None:
+    print(f"{samples:,} samples, {baudrate} baud, {chunk_size} byte chunks")
+    for codec in (JSON_LINES, BINARY):
+        stream: bytes = encode_stream(codec, samples)
+        per_sample: float = len(stream) / samples
+        link_rate: float = baudrate / BITS_PER_BYTE / per_sample
+        cpu_ns: float = decode_cpu(codec, stream, samples, chunk_size)
+        print(
+            f"{codec.name:<8} {per_sample:>6.1f} bytes/sample "
+            f"{link_rate:>8,.0f} samples/s on the link {cpu_ns:>8,.0f} ns CPU/sample"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+    main(args.samples, args.baudrate, args.chunk_size)
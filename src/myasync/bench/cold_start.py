@@ -0,0 +1,115 @@
+"""
+Cold start of the `myasync` command: for each subcommand, what importing
+the module it runs costs in a fresh interpreter (from -X importtime) and
+which of asyncio, sqlite3, pyserial and pyzmq it pulls in, plus the wall
+time of `python -m myasync --help` over a bare interpreter. --check exits 1
+when the entry point is over budget or imports a transport before a
+subcommand asks for it.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import myasync
+
+# Subcommand -> module it imports when chosen
+TARGETS: dict[str, str] = {
+    "(entry point)": "myasync.cli",
+    "monitor": "myasync.async_serial_monitor",
+    "ingest": "myasync.arduino_serial_loop",
+    "ingest --config": "myasync.supervisor",
+    "bridge": "myasync.test_asyncio_reader_writer",
+    "publish": "myasync.async_send",
+}
+HEAVY: tuple[str, ...] = ("asyncio", "sqlite3", "serial", "serial_asyncio", "zmq")
+
+# Milliseconds; generous for a slow single-core machine
+IMPORT_BUDGET_MS: float = 40.0  # importing myasync.cli
+HELP_BUDGET_MS: float = 80.0  # `myasync --help` over `python -c pass`
+
+
+def environment() -> dict[str, str]:
+    src: str = str(Path(myasync.__file__).parents[1])
+    path: str = os.environ.get("PYTHONPATH", "")
+    env: dict[str, str] = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [src, path])),
+    }
+    # Measure what an installed package costs: bytecode cached, not recompiled
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_cost(module: str, runs: int) -> tuple[float, list[str]]:
+    """Median cumulative import time in ms, and the HEAVY modules it loaded"""
+    code: str = (
+        f"import sys, {module}\n"
+        f"print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    costs: list[float] = []
+    loaded: list[str] = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            env=environment(),
+            check=True,
+        )
+        for line in result.stderr.splitlines():
+            fields: list[str] = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                costs.append(int(fields[1]) / 1000)
+        loaded = result.stdout.split()
+    return statistics.median(costs), loaded
+
+
+def wall_time(argv: list[str], runs: int) -> float:
+    """Median wall time in ms to run argv to completion"""
+    times: list[float] = []
+    for _ in range(runs):
+        start: float = time.perf_counter()
+        subprocess.run(argv, capture_output=True, env=environment(), check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(runs: int = 10) -> list[str]:
+    """Print the measurements; returns what is over budget"""
+    # Compile once so every run measures the cached bytecode
+    warm_up: str = "import " + ", ".join(TARGETS.values())
+    subprocess.run([sys.executable, "-c", warm_up], env=environment(), check=True)
+    failures: list[str] = []
+    for command, module in TARGETS.items():
+        cost, loaded = import_cost(module, runs)
+        print(f"{command:<16} {module:<36} {cost:>7.1f} ms  {' '.join(loaded)}")
+        if module == "myasync.cli":
+            if cost > IMPORT_BUDGET_MS:
+                failures.append(f"import {module}: {cost:.1f} > {IMPORT_BUDGET_MS} ms")
+            if loaded:
+                failures.append(f"import {module} loads {', '.join(loaded)}")
+
+    bare: float = wall_time([sys.executable, "-c", "pass"], runs)
+    help_: float = wall_time([sys.executable, "-m", "myasync", "--help"], runs)
+    print(f"python -c pass {bare:.1f} ms, myasync --help {help_:.1f} ms")
+    if help_ - bare > HELP_BUDGET_MS:
+        failures.append(f"--help: {help_ - bare:.1f} > {HELP_BUDGET_MS} ms")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--check", action="store_true", help="exit 1 over budget")
+    args = parser.parse_args()
+
+    failures = main(args.runs)
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if args.check:
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,81 @@
+"""Compare rows/s of the per-row database path against the batched writer"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+from asyncio import Queue, Task
+
+from myasync.arduino_serial_loop import write_to_database
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+
+
+async def _drain(db_queue: Queue, consumer: Task) -> None:
+    await db_queue.join()
+    consumer.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await consumer
+
+
+async def _fill(rows: int, batch_size: int) -> Queue:
+    """Queue `rows` samples as the reader would, batch_size samples per item"""
+    db_queue: Queue = Queue()
+    lines: list[bytes] = list(sample_lines(rows))
+    for start in range(0, rows, batch_size):
+        db_queue.put_nowait(SampleBatch.from_lines(lines[start : start + batch_size]))
+    return db_queue
+
+
+async def bench_placeholder(rows: int) -> float:
+    """The original write_to_database / write_data_to_db path, one await per row"""
+    db_queue = await _fill(rows, batch_size=1)
+    start = time.perf_counter()
+    # write_data_to_db logs every row (sampled, see myasync.eventlog); keep it quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        await _drain(db_queue, asyncio.create_task(write_to_database(db_queue)))
+    return rows / (time.perf_counter() - start)
+
+
+async def bench_sqlite(rows: int, path: str, max_batch_size: int) -> float:
+    """The batched writer; max_batch_size=1 gives one transaction per row"""
+    db_queue = await _fill(rows, batch_size=min(max_batch_size, 100))
+    sink = SQLiteSink(path)
+    start = time.perf_counter()
+    await _drain(
+        db_queue,
+        asyncio.create_task(
+            write_batches_to_database(db_queue, sink, max_batch_size, max_linger=0.01)
+        ),
+    )
+    elapsed = time.perf_counter() - start
+    await sink.close()
+    return rows / elapsed
+
+
+async def main(rows: int = 10_000, placeholder_rows: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        results: dict[str, float] = {
+            "per-row write_data_to_db": await bench_placeholder(placeholder_rows),
+            "per-row sqlite commit": await bench_sqlite(
+                rows, os.path.join(tmp, "per_row.db"), max_batch_size=1
+            ),
+            "batched sqlite (500)": await bench_sqlite(
+                rows, os.path.join(tmp, "batched.db"), max_batch_size=500
+            ),
+        }
+
+    for name, rate in results.items():
+        print(f"{name:<28} {rate:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--placeholder-rows", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.placeholder_rows))
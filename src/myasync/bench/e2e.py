@@ -0,0 +1,325 @@
+"""
+End-to-end benchmarks against a VirtualArduino on a pseudo-terminal:
+arduino_serial_loop.main in each read mode, simple_monitor and the
+device_commands helpers. Each result is the median of --repeats runs of
+the suite; results can be saved as a baseline and later runs checked
+against it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from myasync.arduino_serial_loop import main as ingest_main
+from myasync.async_serial_monitor import simple_monitor
+from myasync.connection_pool import SerialConnectionPool
+from myasync.db_writer import SQLiteSink
+from myasync.device_commands import send_command_to_device, send_pipelined_commands
+from myasync.eventlog import EventLog
+from myasync.records import SampleBatch
+from myasync.virtual_device import VirtualArduino
+
+BASELINE: Path = Path(__file__).with_name("baseline.json")
+
+# Metrics named *_per_s are better when higher, everything else when lower
+Results = dict[str, dict[str, float]]
+
+# Scheduling jitter on a shared machine; latencies within it of the
+# baseline are never regressions, however small the baseline
+LATENCY_SLACK_MS: float = 2.0
+
+INGEST_MODES: dict[str, dict[str, Any]] = {
+    "readline": {"line_delay": 0},
+    "framed": {"framed": True},
+    "binary": {"codec": "binary"},
+}
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def latency_metrics(latencies: list[float]) -> dict[str, float]:
+    return {
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+class TimedSink(SQLiteSink):
+    """SQLiteSink that records when each sample interval was committed"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.persisted_at: dict[int, float] = {}
+        self.rows: int = 0
+
+    async def write_batch(self, batches: list[SampleBatch]) -> None:
+        await super().write_batch(batches)
+        committed_at: float = time.perf_counter()
+        for batch in batches:
+            for interval in batch.intervals:
+                self.persisted_at[interval] = committed_at
+            self.rows += len(batch)
+
+
+class LineClock(io.TextIOBase):
+    """EventLog stream recording when simple_monitor's log wrote each sample"""
+
+    def __init__(self) -> None:
+        self.printed_at: dict[int, float] = {}
+
+    def write(self, text: str) -> int:
+        printed_at: float = time.perf_counter()
+        for record in text.splitlines():
+            _, found, line = record.partition(" line=")
+            try:
+                if found:
+                    interval = json.loads(json.loads(line))["interval"]
+                    self.printed_at[interval] = printed_at
+            except (ValueError, KeyError):
+                pass
+        return len(text)
+
+
+async def _wait_for(condition, timeout: float) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def _summarise(
+    device: VirtualArduino, arrived_at: dict[int, float], cpu: float
+) -> dict[str, float]:
+    samples: int = len(arrived_at)
+    elapsed: float = max(arrived_at.values()) - min(device.sent_at.values())
+    latencies: list[float] = [
+        arrived_at[interval] - device.sent_at[interval] for interval in arrived_at
+    ]
+    return {
+        "samples_per_s": samples / elapsed,
+        **latency_metrics(latencies),
+        "cpu_us_per_sample": (cpu - device.cpu_time) / samples * 1e6,
+    }
+
+
+async def bench_ingest(
+    mode: str,
+    samples: int,
+    rate: float | None = None,
+    baudrate: int | None = None,
+    timeout: float = 60.0,
+) -> dict[str, float]:
+    """Run arduino_serial_loop.main until `samples` rows are committed to SQLite"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = TimedSink(str(Path(tmp) / "bench.db"))
+        device = VirtualArduino(rate=rate, baudrate=baudrate, count=samples)
+        cpu_start: float = time.process_time()
+        device.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            task = asyncio.create_task(
+                ingest_main(url=device.port, sink=sink, **INGEST_MODES[mode])
+            )
+            try:
+                await _wait_for(lambda: sink.rows >= samples or task.done(), timeout)
+            finally:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+                device.stop()
+        cpu: float = time.process_time() - cpu_start
+        await sink.close()
+    return _summarise(device, sink.persisted_at, cpu)
+
+
+async def bench_monitor(
+    samples: int, rate: float | None = None, baudrate: int | None = None
+) -> dict[str, float]:
+    """Run simple_monitor until its unsampled log has written `samples` lines"""
+    clock = LineClock()
+    log = EventLog(stream=clock, sampling={}, maxsize=samples)
+    device = VirtualArduino(rate=rate, baudrate=baudrate, count=samples)
+    cpu_start: float = time.process_time()
+    device.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        task = asyncio.create_task(simple_monitor(device.port, log=log))
+        try:
+            await _wait_for(lambda: len(clock.printed_at) >= samples, 60.0)
+        finally:
+            device.stop()
+            await task
+            log.close()
+    cpu: float = time.process_time() - cpu_start
+    return _summarise(device, clock.printed_at, cpu)
+
+
+async def bench_commands(commands: int, baudrate: int | None = 115200) -> Results:
+    """
+    Round trips through a pooled send_command_to_device, then the same
+    commands pipelined over the same connection. Both send ids, so the
+    device's responses are the same size: over a paced link the responses
+    saturate it either way, and pipelining only pays off where round-trip
+    latency rather than baud rate is the limit (baudrate=None).
+    """
+    results: Results = {}
+    suffix: str = "" if baudrate else "_max"
+    with VirtualArduino(rate=0, baudrate=baudrate) as device:
+        pings: list[dict] = [
+            {"action": "ping", "id": f"cmd_{i:03d}"} for i in range(1, commands + 1)
+        ]
+        async with SerialConnectionPool() as pool:
+            latencies: list[float] = []
+            start: float = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for ping in pings:
+                    tic: float = time.perf_counter()
+                    await send_command_to_device(ping, port=device.port, pool=pool)
+                    latencies.append(time.perf_counter() - tic)
+            results[f"commands_single{suffix}"] = {
+                "commands_per_s": commands / (time.perf_counter() - start),
+                **latency_metrics(latencies),
+            }
+
+            start = time.perf_counter()
+            responses: list = await send_pipelined_commands(
+                pings, port=device.port, pool=pool
+            )
+            assert all(response.get("status") == "ok" for response in responses)
+            results[f"commands_pipelined{suffix}"] = {
+                "commands_per_s": commands / (time.perf_counter() - start)
+            }
+    return results
+
+
+async def run_suite(
+    samples: int = 20_000,
+    paced_samples: int = 300,
+    rate: float = 200.0,
+    baudrate: int = 115200,
+    commands: int = 200,
+) -> Results:
+    """
+    Each ingest path runs twice: unpaced (rate and baud unlimited) for
+    throughput and CPU per sample, and paced at `rate` over `baudrate` for
+    latency as a real device would see it.
+    """
+    results: Results = {}
+    for mode in INGEST_MODES:
+        results[f"ingest_{mode}_max"] = await bench_ingest(mode, samples)
+        results[f"ingest_{mode}_paced"] = await bench_ingest(
+            mode, paced_samples, rate, baudrate
+        )
+    results["monitor_max"] = await bench_monitor(samples)
+    results["monitor_paced"] = await bench_monitor(paced_samples, rate, baudrate)
+    results.update(await bench_commands(commands, baudrate))
+    results.update(await bench_commands(commands, None))
+    return results
+
+
+def median_results(runs: list[Results]) -> Results:
+    """Per metric, the median over repeated runs of the suite"""
+    return {
+        bench: {
+            metric: statistics.median(run[bench][metric] for run in runs)
+            for metric in metrics
+        }
+        for bench, metrics in runs[0].items()
+    }
+
+
+def compare(
+    results: Results,
+    baseline: Results,
+    tolerance: float,
+    p99_tolerance: float = 1.0,
+) -> list[str]:
+    """
+    Throughput and latency metrics more than `tolerance` (a fraction) worse
+    than the baseline; p99 latencies get `p99_tolerance`, and latencies also
+    LATENCY_SLACK_MS. CPU per sample is reported but not checked: on the
+    paced runs it mostly measures the loop idling between samples.
+    """
+    regressions: list[str] = []
+    for bench, metrics in results.items():
+        for metric, value in metrics.items():
+            base: float | None = baseline.get(bench, {}).get(metric)
+            if base is None:
+                continue
+            if metric.endswith("_per_s"):
+                worse: bool = value < base * (1 - tolerance)
+            elif metric.startswith("latency_"):
+                allowed: float = (
+                    p99_tolerance if metric == "latency_p99_ms" else tolerance
+                )
+                worse = value > base * (1 + allowed) + LATENCY_SLACK_MS
+            else:
+                continue
+            if worse:
+                regressions.append(f"{bench}.{metric}: {value:,.3f} vs {base:,.3f}")
+    return regressions
+
+
+def report(results: Results) -> None:
+    for bench, metrics in results.items():
+        line: str = "  ".join(
+            f"{metric}={value:,.3f}" for metric, value in metrics.items()
+        )
+        print(f"{bench:<22} {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=20_000)
+    parser.add_argument("--paced-samples", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--check", action="store_true", help="exit 1 on a regression from the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--p99-tolerance", type=float, default=1.0)
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="report the median of this many runs"
+    )
+    args = parser.parse_args()
+
+    results = median_results(
+        [
+            asyncio.run(
+                run_suite(
+                    args.samples,
+                    args.paced_samples,
+                    args.rate,
+                    args.baudrate,
+                    args.commands,
+                )
+            )
+            for _ in range(args.repeats)
+        ]
+    )
+    report(results)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"baseline saved to {args.baseline}")
+    elif args.check:
+        regressions = compare(
+            results,
+            json.loads(args.baseline.read_text()),
+            args.tolerance,
+            args.p99_tolerance,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,66 @@
+"""
+Caller-side cost of EventLog.log() against print(), with a fast sink, a sink
+that blocks for a millisecond per write, and records sampled out. The
+EventLog cost should not depend on the sink.
+"""
+
+import argparse
+import io
+import time
+
+from myasync.eventlog import EventLog, Sampling
+
+
+class SlowSink(io.TextIOBase):
+    """A terminal or pipe that takes `delay` seconds per write"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay: float = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return len(text)
+
+
+def per_call_ns(fn, calls: int) -> float:
+    start: int = time.perf_counter_ns()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter_ns() - start) / calls
+
+
+def main(calls: int = 200_000, delay: float = 0.001) -> None:
+    line: str = '{"interval": 1234, "value": 21.5}'
+    results: dict[str, float] = {}
+    for name, sink in (("fast sink", io.StringIO()), ("slow sink", SlowSink(delay))):
+        results[f"print, {name}"] = per_call_ns(
+            lambda i: print(f"Arduino: {line}", file=sink), calls // 10
+        )
+        log = EventLog(stream=sink, sampling={})
+        results[f"log, {name}"] = per_call_ns(
+            lambda i: log.log("serial", "Arduino", interval=i, line=line), calls
+        )
+        log.close()
+        print(f"{name}: {log.stats}")
+    sampled = EventLog(stream=io.StringIO(), sampling={"serial": Sampling(every=100)})
+    results["log, 1 in 100 kept"] = per_call_ns(
+        lambda i: sampled.log("serial", "Arduino", interval=i, line=line), calls
+    )
+    sampled.close()
+    limited = EventLog(
+        stream=io.StringIO(), sampling={"serial": Sampling(per_second=50)}
+    )
+    results["log, rate limited"] = per_call_ns(
+        lambda i: limited.log("serial", "Arduino", interval=i, line=line), calls
+    )
+    limited.close()
+    for name, cost in results.items():
+        print(f"{name:<24} {cost:>9.0f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--delay", type=float, default=0.001, help="slow sink, s/write")
+    args = parser.parse_args()
+    main(args.calls, args.delay)
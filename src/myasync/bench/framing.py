@@ -0,0 +1,77 @@
+"""Compare StreamReader.readline against LineFramingProtocol on the same byte stream"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from myasync.framing import LineFramingProtocol
+from myasync.samples import sample_lines
+
+
+def make_chunks(lines: int, chunk_size: int) -> list[bytes]:
+    """Cut the sample stream into serial-read sized chunks, splitting lines across them"""
+    stream: bytes = b"".join(sample_lines(lines))
+    return [stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+
+async def _produce(chunks: list[bytes], feed: Callable[[bytes], None]) -> None:
+    for chunk in chunks:
+        feed(chunk)
+        # Let the consumer run between chunks, as it would between serial reads
+        await asyncio.sleep(0)
+
+
+async def _measure(
+    chunks: list[bytes], feed: Callable[[bytes], None], consume: Awaitable[int]
+) -> tuple[float, float]:
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    consumer = asyncio.create_task(consume)
+    await _produce(chunks, feed)
+    lines: int = await consumer
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return lines / wall, cpu / lines * 1e9
+
+
+async def bench_readline(chunks: list[bytes], lines: int) -> tuple[float, float]:
+    reader = asyncio.StreamReader()
+
+    async def consume() -> int:
+        count = 0
+        while count < lines:
+            data = await reader.readline()
+            if data.decode("utf-8").strip():
+                count += 1
+        return count
+
+    return await _measure(chunks, reader.feed_data, consume())
+
+
+async def bench_framing(chunks: list[bytes], lines: int) -> tuple[float, float]:
+    protocol = LineFramingProtocol()
+
+    async def consume() -> int:
+        count = 0
+        while count < lines:
+            for line in await protocol.read_batch():
+                if line.decode("utf-8"):
+                    count += 1
+        return count
+
+    return await _measure(chunks, protocol.data_received, consume())
+
+
+async def main(lines: int = 200_000, chunk_size: int = 1024) -> None:
+    chunks = make_chunks(lines, chunk_size)
+    print(f"{lines:,} lines in {len(chunks):,} chunks of {chunk_size} bytes")
+    for name, bench in (("readline", bench_readline), ("framing", bench_framing)):
+        rate, cpu_ns = await bench(chunks, lines)
+        print(f"{name:<10} {rate:>12,.0f} lines/s {cpu_ns:>8,.0f} ns CPU/line")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.lines, args.chunk_size))
@@ -0,0 +1,75 @@
+"""Cost of LiveStore updates and queries, and how fast next() wakes a waiter"""
+
+import argparse
+import asyncio
+import time
+
+from myasync.bench.e2e import percentile
+from myasync.live import LiveStore
+from myasync.records import SampleBatch
+
+
+def make_batch(start: int, count: int) -> SampleBatch:
+    batch = SampleBatch("uno")
+    for i in range(start, start + count):
+        batch.append(i / 100, i, 20.0 + (i % 7) / 10)
+    return batch
+
+
+async def per_call_us(fn, calls: int) -> float:
+    start: float = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def wake_latency_us(live: LiveStore, wakes: int) -> list[float]:
+    """From update() to the waiting task running again"""
+    latencies: list[float] = []
+    batch: SampleBatch = make_batch(0, 1)
+    for _ in range(wakes):
+        waiter = asyncio.create_task(live.next("uno"))
+        await asyncio.sleep(0)
+        updated_at: float = time.perf_counter()
+        live.update(batch)
+        await waiter
+        latencies.append((time.perf_counter() - updated_at) * 1e6)
+    return latencies
+
+
+async def main(capacity: int = 65536, batch_size: int = 100, calls: int = 10_000):
+    live = LiveStore(capacity)
+    batches: list[SampleBatch] = [
+        make_batch(start, batch_size) for start in range(0, capacity, batch_size)
+    ]
+    start: float = time.perf_counter()
+    for batch in batches:
+        live.update(batch)
+    update_us: float = (time.perf_counter() - start) / len(batches) * 1e6
+    now: float = live.ring("uno").last().timestamp
+
+    results: dict[str, float] = {
+        f"update({batch_size} samples)": update_us,
+        "last": await per_call_us(lambda: live.last("uno"), calls),
+        "last_n(100)": await per_call_us(lambda: live.last_n("uno", 100), calls),
+    }
+    for seconds in (1.0, 60.0):
+        results[f"window({seconds:.0f}s, {int(seconds * 100)} samples)"] = (
+            await per_call_us(lambda: live.window("uno", seconds, now=now), calls // 10)
+        )
+    for name, cost in results.items():
+        print(f"{name:<28} {cost:>9.2f} us")
+    latencies: list[float] = await wake_latency_us(live, calls // 10)
+    print(
+        f"{'next() wake':<28} p50 {percentile(latencies, 50):.1f} us"
+        f"  p99 {percentile(latencies, 99):.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--capacity", type=int, default=65536)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.capacity, args.batch_size, args.calls))
@@ -0,0 +1,47 @@
+"""Hot-path cost of the pipeline metrics, per call and per sample"""
+
+import argparse
+import time
+
+from myasync.metrics import PipelineMetrics
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+
+
+def per_call_ns(fn, calls: int) -> float:
+    start: float = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main(calls: int = 1_000_000, batch_size: int = 100) -> None:
+    metrics = PipelineMetrics()
+    batch: SampleBatch = SampleBatch.from_lines(sample_lines(batch_size))
+    batches: list[SampleBatch] = [batch]
+
+    baseline: float = per_call_ns(lambda: None, calls)
+    inc: float = per_call_ns(lambda: metrics.samples_read.inc(batch_size), calls)
+    observe: float = per_call_ns(
+        lambda: metrics.read_to_enqueue.observe(0.003, batch_size), calls
+    )
+
+    def per_batch() -> None:
+        metrics.batch_enqueued(batch)
+        metrics.batches_committed(batches)
+
+    batch_ns: float = per_call_ns(per_batch, calls // 10)
+    print(f"Counter.inc          {inc - baseline:>8.1f} ns/call")
+    print(f"Histogram.observe    {observe - baseline:>8.1f} ns/call")
+    print(
+        f"enqueue+commit       {batch_ns - baseline:>8.1f} ns/batch of {batch_size} "
+        f"= {(batch_ns - baseline) / batch_size:.2f} ns/sample"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    main(args.calls, args.batch_size)
@@ -0,0 +1,110 @@
+"""
+Cost of SamplePublisher.update() on the reader path with dozens of local
+subscribers, one of which never reads. The slow subscriber should only
+show up as dropped messages, never as a slower publisher.
+"""
+
+import argparse
+import asyncio
+import time
+
+import zmq
+from zmq.asyncio import Context
+
+from myasync.bench.e2e import percentile
+from myasync.publisher import SamplePublisher, SampleSubscriber
+from myasync.records import SampleBatch
+
+ENDPOINT: str = "ipc:///tmp/myasync-bench-publisher"
+
+
+def make_batch(start: int, count: int) -> SampleBatch:
+    batch = SampleBatch("uno")
+    for i in range(start, start + count):
+        batch.append(i / 1000, i, 20.0 + (i % 7) / 10)
+    return batch
+
+
+async def consume(subscriber: SampleSubscriber, received: list[int], i: int) -> None:
+    while True:
+        for batch in await subscriber.receive():
+            received[i] += len(batch)
+
+
+async def main(
+    subscribers: int = 32,
+    batches: int = 2000,
+    batch_size: int = 100,
+    conflating: int = 4,
+    send_hwm: int = 1000,
+) -> None:
+    ctx = Context()
+    publisher = SamplePublisher.bind(ENDPOINT, context=ctx, send_hwm=send_hwm)
+    readers: list[SampleSubscriber] = [
+        SampleSubscriber.connect(ENDPOINT, ctx, conflate=i < conflating)
+        for i in range(subscribers)
+    ]
+    slow = ctx.socket(zmq.SUB)  # subscribed but never read
+    slow.connect(ENDPOINT)
+    slow.setsockopt(zmq.SUBSCRIBE, b"")
+    received: list[int] = [0] * subscribers
+    tasks: list[asyncio.Task] = [
+        asyncio.create_task(consume(reader, received, i))
+        for i, reader in enumerate(readers)
+    ]
+    await asyncio.sleep(0.2)  # let the subscriptions reach the publisher
+
+    payload: list[SampleBatch] = [
+        make_batch(i * batch_size, batch_size) for i in range(batches)
+    ]
+    costs: list[float] = []
+    start: float = time.perf_counter()
+    for batch in payload:
+        sent_at: float = time.perf_counter()
+        publisher.update(batch)
+        costs.append((time.perf_counter() - sent_at) * 1e6)
+        await asyncio.sleep(0)  # the reader task yields between batches
+    elapsed: float = time.perf_counter() - start
+    await asyncio.sleep(0.5)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    total: int = batches * batch_size
+    full: list[int] = received[conflating:]
+    print(f"{subscribers} subscribers ({conflating} conflating) + 1 never reading")
+    print(f"published     {total / elapsed:>12,.0f} samples/s")
+    print(
+        f"update()      p50 {percentile(costs, 50):.1f} us"
+        f"  p99 {percentile(costs, 99):.1f} us"
+    )
+    if full:
+        print(
+            f"full-rate subscribers got {min(full) / total:.0%}..{max(full) / total:.0%}"
+        )
+    print(f"publisher stats {publisher.stats}")
+
+    for reader in readers:
+        reader.close()
+    slow.close(linger=0)
+    publisher.close()
+    ctx.term()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--conflating", type=int, default=4)
+    parser.add_argument("--send-hwm", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.subscribers,
+            args.batches,
+            args.batch_size,
+            args.conflating,
+            args.send_hwm,
+        )
+    )
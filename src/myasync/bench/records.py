@@ -0,0 +1,50 @@
+"""Memory per buffered sample: decoded str lines vs JSON dicts vs SampleBatch"""
+
+import argparse
+import json
+import tracemalloc
+from typing import Any, Callable
+
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+
+
+def _measure(build: Callable[[list[bytes]], Any], lines: list[bytes]) -> float:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = build(lines)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return (after - before) / len(lines)
+
+
+def as_strings(lines: list[bytes]) -> list[str]:
+    return [line.decode("utf-8").strip() for line in lines]
+
+
+def as_dicts(lines: list[bytes]) -> list[dict]:
+    return [json.loads(line) for line in lines]
+
+
+def as_batches(lines: list[bytes], batch_size: int = 100) -> list[SampleBatch]:
+    return [
+        SampleBatch.from_lines(lines[start : start + batch_size], timestamp=0.0)
+        for start in range(0, len(lines), batch_size)
+    ]
+
+
+def main(samples: int = 100_000) -> None:
+    lines: list[bytes] = list(sample_lines(samples))
+    for name, build in (
+        ("str lines", as_strings),
+        ("json dicts", as_dicts),
+        ("SampleBatch x100", as_batches),
+    ):
+        print(f"{name:<18} {_measure(build, lines):>8.1f} bytes/sample")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=100_000)
+    main(parser.parse_args().samples)
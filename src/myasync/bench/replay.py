@@ -0,0 +1,108 @@
+"""
+Replay a serial capture through the ingest pipeline and report throughput.
+With --record, first capture one from a VirtualArduino.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from myasync.arduino_serial_loop import (
+    read_batches_from_arduino,
+    read_from_arduino,
+    read_samples_from_arduino,
+)
+from myasync.capture import CaptureWriter, ReplayStats, replay, replay_reader
+from myasync.codec import CodecProtocol
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+from myasync.virtual_device import VirtualArduino
+from myasync.watermark_queue import WatermarkQueue
+
+MODES: tuple[str, ...] = ("readline", "framed", "codec")
+
+
+async def record(
+    path: str, samples: int, rate: float | None, baudrate: int | None
+) -> None:
+    """Capture `samples` samples from a VirtualArduino at the given rate and baud"""
+    with (
+        CaptureWriter(path) as capture,
+        VirtualArduino(rate, baudrate, samples) as device,
+    ):
+        protocol, writer = await open_framed_serial_connection(
+            device.port, capture=capture
+        )
+        received: int = 0
+        while received < samples:
+            received += len(await protocol.read_batch())
+        writer.close()
+    print(f"captured {capture.chunks:,} chunks, {capture.bytes:,} bytes to {path}")
+
+
+async def replay_pipeline(
+    path: str, mode: str, speed: float | None
+) -> tuple[ReplayStats, int, float]:
+    """Replay into one reader mode plus the batched SQLite writer; returns (stats, rows, seconds)"""
+    db_queue: WatermarkQueue = WatermarkQueue()
+    rows: list[int] = [0]
+
+    class CountingSink(SQLiteSink):
+        async def write_batch(self, batches) -> None:
+            await super().write_batch(batches)
+            rows[0] += sum(len(batch) for batch in batches)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = CountingSink(str(Path(tmp) / "replay.db"))
+        writer = asyncio.create_task(write_batches_to_database(db_queue, sink))
+        start: float = time.perf_counter()
+        if mode == "readline":
+            reader, replaying = replay_reader(path, speed)
+            await read_from_arduino(reader, db_queue, line_delay=0)
+        elif mode == "framed":
+            protocol = LineFramingProtocol()
+            replaying = asyncio.create_task(replay(path, protocol, speed))
+            await read_batches_from_arduino(protocol, db_queue)
+        else:
+            codec_protocol = CodecProtocol()
+            replaying = asyncio.create_task(replay(path, codec_protocol, speed))
+            await read_samples_from_arduino(codec_protocol, db_queue)
+        await db_queue.join()
+        elapsed: float = time.perf_counter() - start
+        writer.cancel()
+        await sink.close()
+    return await replaying, rows[0], elapsed
+
+
+async def main(path: str, modes: list[str], speed: float | None) -> None:
+    for mode in modes:
+        stats, rows, elapsed = await replay_pipeline(path, mode, speed)
+        print(
+            f"{mode:<9} {rows:>10,} rows in {elapsed:6.2f}s = {rows / elapsed:>10,.0f} rows/s "
+            f"(replay {stats.rate / 1e6:,.1f} MB/s, max lag {stats.max_lag * 1000:.1f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "capture", help="capture file to replay (and record with --record)"
+    )
+    parser.add_argument(
+        "--speed",
+        default="max",
+        help="1 for real time, N for N times faster, max for as fast as possible",
+    )
+    parser.add_argument("--mode", choices=MODES, action="append")
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--baudrate", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.capture, args.samples, args.rate, args.baudrate))
+    speed: float | None = None if args.speed == "max" else float(args.speed)
+    asyncio.run(main(args.capture, args.mode or list(MODES), speed))
@@ -0,0 +1,100 @@
+"""
+Read jitter of the asyncio serial transport against the dedicated reader
+thread while the event loop is loaded with CPU-bound stalls.
+
+Read delay is the time from the VirtualArduino writing a sample to the
+reader stamping it. A pseudo-terminal never drops data, so "would drop"
+counts samples whose delay exceeded the time a 4 KiB kernel tty buffer
+takes to fill at the link's baud rate, which is when a real port overruns.
+"""
+
+import argparse
+import asyncio
+import time
+
+from myasync.bench.e2e import percentile
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+from myasync.metrics import LoopLagMonitor
+from myasync.records import SampleBatch
+from myasync.serial_thread import open_threaded_serial_connection
+from myasync.virtual_device import BITS_PER_BYTE, VirtualArduino
+
+TTY_BUFFER: int = 4096
+MODES = {
+    "asyncio": open_framed_serial_connection,
+    "thread": open_threaded_serial_connection,
+}
+
+
+async def load(stall: float, period: float) -> None:
+    """Hold the loop (and the GIL) busy for `stall` seconds every `period`"""
+    while True:
+        await asyncio.sleep(period)
+        end: float = time.perf_counter() + stall
+        while time.perf_counter() < end:
+            pass
+
+
+async def bench_mode(
+    mode: str, samples: int, rate: float, baudrate: int, stall: float, period: float
+) -> dict[str, float]:
+    # sent_at is perf_counter(), receive times are time.time()
+    offset: float = time.time() - time.perf_counter()
+    monitor = LoopLagMonitor(interval=0.01)
+    tasks = [asyncio.create_task(monitor.run())]
+    if stall:
+        tasks.append(asyncio.create_task(load(stall, period)))
+    delays: list[float] = []
+    with VirtualArduino(rate=rate, baudrate=baudrate, count=samples) as device:
+        protocol: LineFramingProtocol
+        protocol, writer = await MODES[mode](device.port, baudrate)
+        while len(delays) < samples:
+            received_at, lines = await protocol.read_timed_batch()
+            if not lines:
+                break
+            for interval in SampleBatch.from_lines(lines).intervals:
+                delays.append(received_at - offset - device.sent_at[interval])
+        writer.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    overrun_after: float = TTY_BUFFER * BITS_PER_BYTE / baudrate
+    return {
+        "delay_p50_ms": percentile(delays, 50) * 1000,
+        "delay_p99_ms": percentile(delays, 99) * 1000,
+        "delay_max_ms": max(delays) * 1000,
+        "would_drop": sum(delay > overrun_after for delay in delays),
+        "lost": samples - len(delays),
+        "loop_lag_max_ms": monitor.max * 1000,
+    }
+
+
+async def main(
+    samples: int = 5000,
+    rate: float = 1000.0,
+    baudrate: int = 115200,
+    stall: float = 0.4,
+    period: float = 0.5,
+) -> None:
+    for load_name, load_stall in (
+        ("idle", 0.0),
+        (f"{stall * 1000:.0f}ms stalls", stall),
+    ):
+        for mode in MODES:
+            result = await bench_mode(mode, samples, rate, baudrate, load_stall, period)
+            print(
+                f"{mode:<8} {load_name:<14}"
+                + "".join(f"  {name} {value:>8.1f}" for name, value in result.items())
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="samples/s")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--stall", type=float, default=0.4, help="seconds")
+    parser.add_argument("--period", type=float, default=0.5, help="seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.samples, args.rate, args.baudrate, args.stall, args.period))
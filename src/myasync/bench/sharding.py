@@ -0,0 +1,77 @@
+"""
+Aggregate samples/s of ShardedPipeline against the number of worker
+processes. The VirtualArduinos run in a process of their own, so encoding
+samples does not compete with the pipeline for a core; expect roughly
+linear scaling only up to the cores left over for the workers.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+from myasync.sharding import CONTEXT, ShardedPipeline
+from myasync.supervisor import PortConfig
+from myasync.virtual_device import VirtualArduino
+
+
+def host_devices(
+    devices: int, samples: int, ports: multiprocessing.Queue, stop
+) -> None:
+    """Device process: run `devices` VirtualArduinos until stop is set"""
+    running: list[VirtualArduino] = [
+        VirtualArduino(rate=None, baudrate=None, count=samples) for _ in range(devices)
+    ]
+    for device in running:
+        device.start()
+    ports.put([device.port for device in running])
+    stop.wait()
+    for device in running:
+        device.stop()
+
+
+async def bench_workers(workers: int, devices: int, samples: int) -> float:
+    ports: multiprocessing.Queue = CONTEXT.Queue()
+    stop = CONTEXT.Event()
+    host = CONTEXT.Process(
+        target=host_devices, args=(devices, samples, ports, stop), daemon=True
+    )
+    host.start()
+    urls: list[str] = await asyncio.to_thread(ports.get)
+    pipeline = ShardedPipeline([PortConfig(url) for url in urls], workers)
+    task = asyncio.create_task(pipeline.run())
+    try:
+        received: int = 0
+        start: float | None = None
+        while received < devices * samples:
+            batch = await pipeline.db_queue.get()
+            # Time from the first sample, not from process start-up
+            start = start or time.perf_counter()
+            received += len(batch)
+        return received / (time.perf_counter() - start)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        stop.set()
+        host.join()
+
+
+async def main(
+    devices: int = 8, samples: int = 50_000, max_workers: int | None = None
+) -> None:
+    max_workers = max_workers or os.cpu_count() or 1
+    workers: int = 1
+    while workers <= max_workers:
+        rate: float = await bench_workers(workers, devices, samples)
+        print(f"{workers:>3} workers  {devices} devices  {rate:>12,.0f} samples/s")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=50_000, help="per device")
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.devices, args.samples, args.max_workers))
@@ -0,0 +1,68 @@
+"""Rows/s of the batched writer draining a spooled backlog, live vs catch-up sized"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+from myasync.spool import SpoolQueue
+
+
+def spill(directory: str, rows: int, batch_size: int) -> SpoolQueue:
+    """A backlog as left by an outage: every batch on disk, none in memory"""
+    db_queue = SpoolQueue(directory, memory_size=0)
+    lines: list[bytes] = list(sample_lines(rows))
+    for start in range(0, rows, batch_size):
+        db_queue.put_nowait(SampleBatch.from_lines(lines[start : start + batch_size]))
+    return db_queue
+
+
+async def bench_catchup(
+    tmp: str, name: str, rows: int, catchup_batch_size: int | None
+) -> float:
+    db_queue = spill(os.path.join(tmp, name), rows, batch_size=16)
+    sink = SQLiteSink(os.path.join(tmp, f"{name}.db"))
+    start = time.perf_counter()
+    consumer = asyncio.create_task(
+        write_batches_to_database(
+            db_queue,
+            sink,
+            max_linger=0.05,
+            catchup_batch_size=catchup_batch_size,
+        )
+    )
+    await db_queue.join()
+    elapsed = time.perf_counter() - start
+    consumer.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await consumer
+    db_queue.close()
+    await sink.close()
+    return rows / elapsed
+
+
+async def main(rows: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        results: dict[str, float] = {
+            "spool drain, live sizing (500)": await bench_catchup(
+                tmp, "live", rows, None
+            ),
+            "spool drain, catch-up (5000)": await bench_catchup(
+                tmp, "catchup", rows, 5000
+            ),
+        }
+
+    for name, rate in results.items():
+        print(f"{name:<32} {rate:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
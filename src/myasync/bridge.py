@@ -0,0 +1,100 @@
+import asyncio
+import json
+from asyncio import StreamWriter
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import zmq
+from zmq.asyncio import Poller, Socket
+
+
+def temp_frame(temp: Any) -> bytes:
+    """The `<temp>` frame the Arduino sketch expects for a new target temperature"""
+    return ("<" + str(temp) + ">").encode()
+
+
+@dataclass
+class BridgeStats:
+    wakeups: int = 0
+    received: int = 0
+    malformed: int = 0  # not JSON, or JSON with none of the bridged keys
+    conflated: int = 0  # superseded by a newer value in the same wakeup
+    frames_written: int = 0
+    writes: int = 0
+
+
+class ZmqSerialBridge:
+    """
+    Forwards setpoints from a ZMQ PULL socket to a serial writer.
+
+    Each wakeup drains every message already queued on the socket
+    (NOBLOCK until zmq.Again), keeps only the latest value per key and
+    writes the resulting frames with one write() and one drain(), so a
+    burst upstream costs one frame per key on the serial link.
+    """
+
+    def __init__(
+        self,
+        socket: Socket,
+        writer: StreamWriter,
+        frames: dict[str, Callable[[Any], bytes]] | None = None,
+        max_messages: int = 10_000,
+    ) -> None:
+        self.socket: Socket = socket
+        self.writer: StreamWriter = writer
+        self.frames: dict[str, Callable[[Any], bytes]] = (
+            {"target-temp": temp_frame} if frames is None else frames
+        )
+        self.max_messages: int = max_messages  # per wakeup, so one burst cannot starve the loop
+        self.stats: BridgeStats = BridgeStats()
+        self._poller: Poller = Poller()
+        self._poller.register(socket, zmq.POLLIN)
+
+    async def run(self) -> None:
+        while True:
+            await self._poller.poll()
+            await self.pump()
+
+    async def _drain_socket(self) -> list[list[bytes]]:
+        messages: list[list[bytes]] = []
+        while len(messages) < self.max_messages:
+            try:
+                messages.append(await self.socket.recv_multipart(flags=zmq.NOBLOCK))
+            except zmq.Again:
+                break
+        return messages
+
+    async def pump(self) -> int:
+        """Handle everything queued on the socket now; returns the number of frames written"""
+        messages: list[list[bytes]] = await self._drain_socket()
+        if not messages:
+            return 0
+        self.stats.wakeups += 1
+
+        latest: dict[str, Any] = {}
+        # Publishers may batch several JSON messages into one multipart send
+        for frame in (frame for msg in messages for frame in msg):
+            self.stats.received += 1
+            try:
+                received = json.loads(frame.decode("utf-8"))
+            except ValueError:
+                self.stats.malformed += 1
+                continue
+            bridged: list[str] = [
+                key for key in self.frames if isinstance(received, dict) and key in received
+            ]
+            if not bridged:
+                self.stats.malformed += 1
+                continue
+            for key in bridged:
+                if key in latest:
+                    self.stats.conflated += 1
+                latest[key] = received[key]
+
+        if not latest:
+            return 0
+        self.writer.write(b"".join(self.frames[key](value) for key, value in latest.items()))
+        await self.writer.drain()
+        self.stats.writes += 1
+        self.stats.frames_written += len(latest)
+        return len(latest)
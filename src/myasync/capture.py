@@ -0,0 +1,223 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from asyncio import StreamReader, StreamWriter
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+# Capture file: header, then one record per serial chunk as it was received.
+# Header: magic (8) | wall-clock start, seconds since the epoch (float64 LE)
+# Record: nanoseconds since start (uint64 LE) | length (uint32 LE) | raw bytes
+MAGIC: bytes = b"MYASCAP1"
+HEADER: struct.Struct = struct.Struct("<8sd")
+RECORD: struct.Struct = struct.Struct("<QI")
+
+
+class CaptureWriter:
+    """
+    Append-only recorder of raw serial chunks with their receive times.
+
+    Records go through a large write buffer so record() costs a memcpy on
+    the event loop thread; call flush() or close() to push them to disk.
+    Appending to an existing capture continues its timeline, so the time
+    between sessions is kept as a gap rather than overlapping them.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 16) -> None:
+        self.path: str = path
+        self.chunks: int = 0
+        self.bytes: int = 0
+        self._file = open(path, "ab", buffering=buffer_size)
+        if self._file.tell() == 0:
+            self.started_at: float = time.time()
+            self._file.write(HEADER.pack(MAGIC, self.started_at))
+        else:
+            with open(path, "rb") as existing:
+                self.started_at = read_header(existing.read(HEADER.size), path)
+        self._base_ns: int = time.monotonic_ns() - int(
+            (time.time() - self.started_at) * 1e9
+        )
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record(self, data: bytes) -> None:
+        self._file.write(RECORD.pack(time.monotonic_ns() - self._base_ns, len(data)))
+        self._file.write(data)
+        self.chunks += 1
+        self.bytes += len(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_header(header: bytes, path: str) -> float:
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a capture")
+    magic, started_at = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a capture file")
+    return started_at
+
+
+class CaptureFile:
+    """
+    Memory-mapped capture for replay. Iterating yields (seconds since
+    capture start, chunk) with each chunk a memoryview into the map, so
+    reading a capture copies nothing. A record cut short by a crash while
+    capturing ends the capture.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        with open(path, "rb") as file:
+            size: int = os.fstat(file.fileno()).st_size
+            self.started_at: float = read_header(file.read(HEADER.size), path)
+            self._map: mmap.mmap = mmap.mmap(
+                file.fileno(), size, access=mmap.ACCESS_READ
+            )
+
+    def __enter__(self) -> "CaptureFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[tuple[float, memoryview]]:
+        data: mmap.mmap = self._map
+        size: int = len(data)
+        offset: int = HEADER.size
+        with memoryview(data) as view:
+            while offset + RECORD.size <= size:
+                offset_ns, length = RECORD.unpack_from(data, offset)
+                start: int = offset + RECORD.size
+                if start + length > size:
+                    break
+                chunk: memoryview = view[start : start + length]
+                try:
+                    yield offset_ns / 1e9, chunk
+                finally:
+                    chunk.release()
+                offset = start + length
+
+    def close(self) -> None:
+        self._map.close()
+
+
+@dataclass
+class ReplayStats:
+    chunks: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+    max_lag: float = 0.0  # furthest behind schedule a chunk was delivered, in seconds
+
+    @property
+    def rate(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+async def replay(
+    path: str,
+    protocol: asyncio.Protocol,
+    speed: float | None = 1.0,
+    max_gap: float | None = None,
+) -> ReplayStats:
+    """
+    Feed a capture into protocol.data_received as if it were the serial
+    transport, then call connection_lost(None). speed=1 replays in real
+    time, 10 at 10x and None as fast as possible (still yielding to the loop
+    between chunks so readers keep up the way they would on a port).
+    Gaps longer than max_gap capture seconds are shortened to max_gap.
+    """
+    loop = asyncio.get_running_loop()
+    stats = ReplayStats()
+    start: float = loop.time()
+    skipped: float = 0.0
+    previous: float | None = None
+    with CaptureFile(path) as capture, closing(iter(capture)) as records:
+        for at, chunk in records:
+            if max_gap is not None and previous is not None:
+                skipped += max(0.0, at - previous - max_gap)
+            previous = at
+            if speed:
+                due: float = start + (at - skipped) / speed
+                delay: float = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_lag = max(stats.max_lag, -delay)
+            protocol.data_received(bytes(chunk))
+            stats.chunks += 1
+            stats.bytes += len(chunk)
+            if not speed:
+                await asyncio.sleep(0)
+    stats.elapsed = loop.time() - start
+    protocol.connection_lost(None)
+    return stats
+
+
+def replay_reader(
+    path: str, speed: float | None = 1.0, max_gap: float | None = None
+) -> tuple[StreamReader, asyncio.Task]:
+    """
+    A StreamReader fed from a capture, to stand in for the reader from
+    serial_asyncio.open_serial_connection (e.g. in read_from_arduino).
+    The task returns the ReplayStats once the reader has hit EOF.
+    """
+    reader = StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    return reader, asyncio.create_task(replay(path, protocol, speed, max_gap))
+
+
+def capturing(
+    protocol_factory: Callable[[], asyncio.Protocol], capture: CaptureWriter
+) -> Callable[[], asyncio.Protocol]:
+    """Wrap a protocol factory so every chunk is recorded before the protocol sees it"""
+
+    def factory() -> asyncio.Protocol:
+        protocol: asyncio.Protocol = protocol_factory()
+        data_received = protocol.data_received
+
+        def record_and_receive(data: bytes) -> None:
+            capture.record(data)
+            data_received(data)
+
+        protocol.data_received = record_and_receive  # type: ignore[method-assign]
+        return protocol
+
+    return factory
+
+
+async def open_capturing_serial_connection(
+    url: str,
+    baudrate: int = 115200,
+    capture: CaptureWriter | None = None,
+    **kwargs: Any,
+) -> tuple[StreamReader, StreamWriter]:
+    """serial_asyncio.open_serial_connection that also records what it reads to capture"""
+    import serial_asyncio
+
+    if capture is None:
+        return await serial_asyncio.open_serial_connection(
+            url=url, baudrate=baudrate, **kwargs
+        )
+    loop = asyncio.get_running_loop()
+    reader = StreamReader()
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop,
+        capturing(lambda: asyncio.StreamReaderProtocol(reader), capture),
+        url,
+        baudrate=baudrate,
+        **kwargs,
+    )
+    return reader, StreamWriter(transport, protocol, reader, loop)
@@ -0,0 +1,178 @@
+"""
+The `myasync` command, one entry point for every pipeline:
+
+    myasync monitor /dev/ttyACM0
+    myasync ingest --url /dev/ttyACM0 --framed --publish tcp://*:5600
+    myasync ingest --config ports.json --workers 4
+    myasync bridge --url tcp://127.0.0.1:5555 --port /dev/ttyACM0
+    myasync publish --rate 10000 --batch 100
+    myasync bench clock --samples 10000
+
+Only argparse is imported up front. A subcommand imports the module it
+runs, and with it asyncio, pyserial or pyzmq, once it has been chosen, so
+`--help`, typos and short diagnostic runs don't pay for the transports
+they never touch. myasync.bench.cold_start measures this.
+"""
+
+import argparse
+import sys
+from collections.abc import Coroutine, Sequence
+
+
+def _options(args: argparse.Namespace, *names: str) -> dict[str, object]:
+    """The named options that were given; the rest keep the callee's defaults"""
+    return {name: getattr(args, name) for name in names if hasattr(args, name)}
+
+
+def _run(main: Coroutine[object, object, object]) -> None:
+    import asyncio
+
+    try:
+        asyncio.run(main)
+    except KeyboardInterrupt:
+        pass
+
+
+def monitor(args: argparse.Namespace) -> None:
+    from myasync.async_serial_monitor import simple_monitor
+
+    _run(simple_monitor(args.port, **_options(args, "baudrate")))
+
+
+INGEST_OPTIONS: tuple[str, ...] = (
+    "url",
+    "baudrate",
+    "db_path",
+    "queue_size",
+    "framed",
+    "codec",
+    "threaded",
+    "capture_path",
+    "metrics_port",
+    "spool_dir",
+    "publish_endpoint",
+    "align_clock",
+)
+
+
+def ingest(args: argparse.Namespace) -> None:
+    options: dict[str, object] = _options(args, *INGEST_OPTIONS)
+    if not hasattr(args, "config"):
+        if hasattr(args, "workers"):
+            sys.exit("ingest: --workers needs --config")
+        from myasync.arduino_serial_loop import main
+
+        _run(main(**options))
+        return
+    if options.keys() - {"db_path"}:
+        sys.exit("ingest: --config only combines with --db and --workers")
+    db: dict[str, object] = _options(args, "db_path")
+    if hasattr(args, "workers"):
+        from myasync.sharding import main as sharded_main
+
+        _run(sharded_main(args.config, args.workers, **db))
+    else:
+        from myasync.supervisor import main as supervised_main
+
+        _run(supervised_main(args.config, **db))
+
+
+def bridge(args: argparse.Namespace) -> None:
+    from myasync.test_asyncio_reader_writer import main
+
+    _run(main(**_options(args, "url", "port", "baudrate")))
+
+
+def publish(args: argparse.Namespace) -> None:
+    from myasync.async_send import load_test, sender
+
+    if hasattr(args, "rate"):
+        options = ("rate", "batch_size", "duration", "sndhwm", "url")
+        _run(load_test(**_options(args, *options)))
+    else:
+        _run(sender(**_options(args, "url", "interval")))
+
+
+def bench_names() -> list[str]:
+    """Modules in myasync.bench, found without importing them"""
+    import pkgutil
+
+    import myasync.bench
+
+    return sorted(info.name for info in pkgutil.iter_modules(myasync.bench.__path__))
+
+
+def bench(args: argparse.Namespace) -> None:
+    import runpy
+
+    names: list[str] = bench_names()
+    if args.name is None:
+        print("\n".join(names))
+        return
+    if args.name not in names:
+        sys.exit(f"unknown bench {args.name!r}; one of: {', '.join(names)}")
+    # The bench parses sys.argv itself, as under `python -m myasync.bench.<name>`
+    sys.argv = [f"myasync bench {args.name}", *args.args]
+    runpy.run_module(f"myasync.bench.{args.name}", run_name="__main__")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="myasync", description="Arduino serial pipelines and their benchmarks"
+    )
+    commands = parser.add_subparsers(required=True, metavar="command")
+
+    def command(handler, help: str) -> argparse.ArgumentParser:
+        # Options left out are not set, so the callee's defaults apply
+        sub = commands.add_parser(
+            handler.__name__, help=help, argument_default=argparse.SUPPRESS
+        )
+        sub.set_defaults(handler=handler)
+        return sub
+
+    sub = command(monitor, "print what an Arduino sends")
+    sub.add_argument("port")
+    sub.add_argument("--baudrate", type=int)
+
+    sub = command(ingest, "store samples from one Arduino, or several with --config")
+    sub.add_argument("--url", help="serial port (default /dev/ttyACM0)")
+    sub.add_argument("--baudrate", type=int)
+    sub.add_argument("--db", dest="db_path", help="SQLite file (default readings.db)")
+    sub.add_argument("--queue-size", type=int)
+    sub.add_argument("--framed", action="store_true", help="read through framing")
+    sub.add_argument("--codec", help="negotiate a codec, e.g. binary")
+    sub.add_argument("--threaded", action="store_true", help="read on a thread")
+    sub.add_argument("--capture", dest="capture_path", help="record raw input")
+    sub.add_argument("--metrics-port", type=int, help="serve Prometheus metrics")
+    sub.add_argument("--spool-dir", help="spill overflow to disk")
+    sub.add_argument("--publish", dest="publish_endpoint", help="ZMQ PUB endpoint")
+    sub.add_argument("--align-clock", action="store_true")
+    sub.add_argument("--config", help='JSON file: {"ports": [{"url": ...}]}')
+    sub.add_argument("--workers", type=int, help="with --config, worker processes")
+
+    sub = command(bridge, "forward ZMQ setpoints to an Arduino")
+    sub.add_argument("--url", help="ZMQ endpoint to PULL from")
+    sub.add_argument("--port", help="serial port")
+    sub.add_argument("--baudrate", type=int)
+
+    sub = command(publish, "send target temperatures over ZMQ")
+    sub.add_argument("--url")
+    sub.add_argument("--interval", type=float, help="seconds between sends")
+    sub.add_argument("--rate", type=float, help="load-test at this many msgs/s")
+    sub.add_argument("--batch", dest="batch_size", type=int, help="with --rate")
+    sub.add_argument("--duration", type=float, help="with --rate")
+    sub.add_argument("--sndhwm", type=int, help="with --rate")
+
+    sub = command(bench, "run a benchmark, or list them")
+    sub.add_argument("name", nargs="?", default=None)
+    sub.add_argument("args", nargs=argparse.REMAINDER, default=[])
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from myasync.records import SampleBatch
+
+# time.time() at the moment time.monotonic() read zero, fixed at import
+_EPOCH_OFFSET: float = time.time() - time.monotonic()
+
+
+def now() -> float:
+    """
+    Receive time for samples: time.monotonic() (nanosecond resolution, never
+    stepped by NTP or the user) on the time.time() scale, so it can be
+    stored and compared with wall-clock times.
+    """
+    return time.monotonic() + _EPOCH_OFFSET
+
+
+@dataclass
+class AlignerStats:
+    observed: int = 0
+    resets: int = 0  # the device counter went backwards, e.g. a reboot
+
+
+class ClockAligner:
+    """
+    Online estimate of when a device acquired each sample, from its
+    `interval` counter and the host receive times of the lines.
+
+    Host time is modelled as offset + period * counter. The period, the
+    device's sample period in host seconds including its oscillator drift,
+    is fitted by exponentially weighted least squares (forgetting with the
+    given half_life, in observations). Transfer and queueing only ever add
+    delay, so the offset follows the lower envelope: the smallest
+    receive time - period * counter over the last `window` observations,
+    i.e. the fastest delivery seen. Acquisition times are therefore exact
+    up to the constant minimum link latency, which cannot be observed from
+    one direction.
+
+    The envelope is kept as a sliding-window minimum for one reference
+    period, and rebuilt from the window when the fitted period has moved
+    far enough to shift an estimate by more than `tolerance` seconds.
+
+    Lines received in one chunk share one receive time; only the last of
+    each such run is observed, as the earlier ones only add delay.
+    Not thread-safe; use one per device.
+    """
+
+    def __init__(
+        self,
+        window: int = 1000,
+        half_life: float = 10_000.0,
+        period: float | None = None,
+        tolerance: float = 100e-6,
+    ) -> None:
+        self.window: int = window
+        self.decay: float = 0.5 ** (1.0 / half_life)
+        self.nominal_period: float | None = period  # used until it can be fitted
+        self.tolerance: float = tolerance
+        self.stats: AlignerStats = AlignerStats()
+        self.reset()
+
+    def reset(self) -> None:
+        self.last_counter: int | None = None
+        self._weight: float = 0.0
+        self._mean_x: float = 0.0
+        self._mean_y: float = 0.0
+        self._cxx: float = 0.0
+        self._cxy: float = 0.0
+        self._points: deque[tuple[int, float]] = deque(maxlen=self.window)
+        # The period the envelope's offsets were computed with
+        self._reference: float = self.nominal_period or 0.0
+        # (counter, receive time - reference * counter), offsets increasing
+        self._envelope: deque[tuple[int, float]] = deque()
+
+    @property
+    def period(self) -> float | None:
+        if self._cxx > 0.0:
+            return self._cxy / self._cxx
+        return self.nominal_period
+
+    def observe(self, counter: int, received_at: float) -> None:
+        if self.last_counter is not None and counter < self.last_counter:
+            self.stats.resets += 1
+            self.reset()
+        if counter == self.last_counter:
+            return
+        self.last_counter = counter
+        self.stats.observed += 1
+
+        # Weighted Welford update of the means and co-moments
+        self._weight = self.decay * self._weight + 1.0
+        dx: float = counter - self._mean_x
+        self._mean_x += dx / self._weight
+        self._mean_y += (received_at - self._mean_y) / self._weight
+        self._cxx = self.decay * self._cxx + dx * (counter - self._mean_x)
+        self._cxy = self.decay * self._cxy + dx * (received_at - self._mean_y)
+
+        self._points.append((counter, received_at))
+        period: float = self.period or 0.0
+        span: int = counter - self._points[0][0]
+        if abs(period - self._reference) * span > self.tolerance:
+            self._rebuild(period)
+        else:
+            self._push(counter, received_at)
+
+    def _push(self, counter: int, received_at: float) -> None:
+        envelope = self._envelope
+        offset: float = received_at - self._reference * counter
+        while envelope and envelope[-1][1] >= offset:
+            envelope.pop()
+        envelope.append((counter, offset))
+        while envelope[0][0] < self._points[0][0]:
+            envelope.popleft()
+
+    def _rebuild(self, period: float) -> None:
+        self._reference = period
+        self._envelope.clear()
+        for counter, received_at in self._points:
+            self._push(counter, received_at)
+
+    def acquisition_time(self, counter: int) -> float | None:
+        """Estimated host time the device took sample `counter`, once observed"""
+        if not self._envelope:
+            return None
+        return self._envelope[0][1] + self._reference * counter
+
+    def align(self, batch: "SampleBatch") -> None:
+        """
+        Observe a batch whose timestamps are receive times, then replace
+        them with estimated acquisition times
+        """
+        timestamps, intervals = batch.timestamps, batch.intervals
+        count: int = len(batch)
+        if not count:
+            return
+        if not batch.received_at:
+            batch.received_at = timestamps[0]
+        for i in range(count):
+            if i + 1 == count or timestamps[i + 1] != timestamps[i]:
+                self.observe(intervals[i], timestamps[i])
+        offset, period = self._envelope[0][1], self._reference
+        batch.timestamps = array("d", [offset + period * c for c in intervals])
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import struct
+from asyncio import BaseTransport, StreamWriter
+from asyncio.streams import FlowControlMixin
+from binascii import crc_hqx
+from functools import partial
+from typing import Any
+
+from myasync import clock
+from myasync.capture import CaptureWriter, capturing
+from myasync.records import SampleBatch
+
+# Decoded non-sample traffic: JSON objects (command responses) or plain text lines
+Message = dict | str
+
+
+class JsonLinesDecoder:
+    """
+    Incremental decoder for newline-terminated JSON. Sample objects go into
+    the batch, anything else is returned as a message. Lines longer than
+    max_line_length are discarded as overruns, and sample objects whose
+    fields do not convert are counted in batch.rejected. Decoding stops
+    right after a codec switch acknowledgement so the bytes behind it can be
+    handed to the next decoder.
+    """
+
+    def __init__(self, max_line_length: int = 4096) -> None:
+        self.buffer: bytearray = bytearray()
+        self.switch_to: str | None = None
+        self.max_line_length: int = max_line_length
+        self.overruns: int = 0
+        # Inside an overrun line: its bytes are dropped up to the next newline
+        self.discarding: bool = False
+
+    def decode(
+        self, data: bytes, batch: SampleBatch, timestamp: float
+    ) -> list[Message]:
+        buffer: bytearray = self.buffer
+        buffer += data
+        messages: list[Message] = []
+        start: int = 0
+        with memoryview(buffer) as view:
+            while self.switch_to is None:
+                newline: int = buffer.find(b"\n", start)
+                if newline < 0:
+                    break
+                if self.discarding or newline - start > self.max_line_length:
+                    if not self.discarding:
+                        self.overruns += 1
+                    self.discarding = False
+                    start = newline + 1
+                    continue
+                line: bytes = bytes(view[start:newline]).strip()
+                start = newline + 1
+                if not line:
+                    continue
+                try:
+                    decoded = json.loads(line)
+                except ValueError:
+                    messages.append(line.decode("utf-8", "replace"))
+                    continue
+                if (
+                    isinstance(decoded, dict)
+                    and "interval" in decoded
+                    and "value" in decoded
+                ):
+                    try:
+                        interval: int = int(decoded["interval"])
+                        value: float = float(decoded["value"])
+                    except (TypeError, ValueError, OverflowError):
+                        batch.rejected += 1
+                    else:
+                        batch.append(timestamp, interval, value)
+                    continue
+                messages.append(decoded)
+                if (
+                    isinstance(decoded, dict)
+                    and decoded.get("status") == "ok"
+                    and decoded.get("codec") in CODECS
+                ):
+                    self.switch_to = decoded["codec"]
+        del buffer[:start]
+        if self.switch_to is None and len(buffer) > self.max_line_length:
+            # A partial line that is already too long; drop it and the rest to come
+            buffer.clear()
+            if not self.discarding:
+                self.overruns += 1
+            self.discarding = True
+        return messages
+
+
+class JsonLinesCodec:
+    """The original device protocol: one JSON object per line"""
+
+    name: str = "json"
+
+    def decoder(self) -> JsonLinesDecoder:
+        return JsonLinesDecoder()
+
+    def encode_sample(self, interval: int, value: float) -> bytes:
+        return (json.dumps({"interval": interval, "value": value}) + "\r\n").encode()
+
+    def encode_command(self, command: dict | str) -> bytes:
+        if isinstance(command, str):
+            return f"{command}\n".encode("utf-8")
+        return (json.dumps(command) + "\n").encode()
+
+
+# Binary frame: sync (2) | kind (1) | payload length (2, LE) | payload | CRC-16/CCITT (2, LE)
+# The CRC covers kind, length and payload.
+SYNC: bytes = b"\xa5\x5a"
+HEADER: struct.Struct = struct.Struct("<2sBH")
+CRC: struct.Struct = struct.Struct("<H")
+# uint32 interval, float32 value as sent by an AVR
+SAMPLE: struct.Struct = struct.Struct("<If")
+KIND_SAMPLE: int = 1
+KIND_JSON: int = 2
+KIND_TEXT: int = 3
+MAX_PAYLOAD: int = 1024
+
+
+class BinaryDecoder:
+    """Incremental decoder for BinaryCodec frames; resynchronises on the next sync word after a bad frame"""
+
+    switch_to: str | None = None
+
+    def __init__(self) -> None:
+        self.buffer: bytearray = bytearray()
+        self.crc_errors: int = 0
+
+    def decode(
+        self, data: bytes, batch: SampleBatch, timestamp: float
+    ) -> list[Message]:
+        buffer: bytearray = self.buffer
+        buffer += data
+        messages: list[Message] = []
+        size: int = len(buffer)
+        pos: int = 0
+        with memoryview(buffer) as view:
+            while True:
+                start: int = buffer.find(SYNC, pos)
+                if start < 0:
+                    # Keep a trailing byte that may be the first half of a sync word
+                    pos = max(pos, size - 1)
+                    break
+                if size - start < HEADER.size:
+                    pos = start
+                    break
+                _, kind, length = HEADER.unpack_from(buffer, start)
+                if length > MAX_PAYLOAD:
+                    pos = start + 1
+                    continue
+                payload_at: int = start + HEADER.size
+                end: int = payload_at + length + CRC.size
+                if end > size:
+                    pos = start
+                    break
+                (crc,) = CRC.unpack_from(buffer, end - CRC.size)
+                if crc_hqx(view[start + 2 : end - CRC.size], 0xFFFF) != crc:
+                    self.crc_errors += 1
+                    pos = start + 1
+                    continue
+
+                if kind == KIND_SAMPLE and length == SAMPLE.size:
+                    interval, value = SAMPLE.unpack_from(buffer, payload_at)
+                    batch.append(timestamp, interval, value)
+                elif kind == KIND_JSON:
+                    try:
+                        messages.append(
+                            json.loads(bytes(view[payload_at : end - CRC.size]))
+                        )
+                    except ValueError:
+                        messages.append(
+                            bytes(view[payload_at : end - CRC.size]).decode(
+                                "utf-8", "replace"
+                            )
+                        )
+                elif kind == KIND_TEXT:
+                    messages.append(
+                        bytes(view[payload_at : end - CRC.size]).decode(
+                            "utf-8", "replace"
+                        )
+                    )
+                pos = end
+        del buffer[:pos]
+        return messages
+
+
+class BinaryCodec:
+    """
+    Length-prefixed struct frames with a CRC. A sample is 15 bytes on the
+    wire against about 40 for a JSON line, and decodes without json.loads.
+    Values travel as float32, the precision an AVR Arduino works in anyway.
+    """
+
+    name: str = "binary"
+
+    def decoder(self) -> BinaryDecoder:
+        return BinaryDecoder()
+
+    @staticmethod
+    def frame(kind: int, payload: bytes) -> bytes:
+        header: bytes = HEADER.pack(SYNC, kind, len(payload))
+        return header + payload + CRC.pack(crc_hqx(header[2:] + payload, 0xFFFF))
+
+    def encode_sample(self, interval: int, value: float) -> bytes:
+        return self.frame(KIND_SAMPLE, SAMPLE.pack(interval, value))
+
+    def encode_command(self, command: dict | str) -> bytes:
+        if isinstance(command, str):
+            return self.frame(KIND_TEXT, command.encode("utf-8"))
+        return self.frame(KIND_JSON, json.dumps(command).encode())
+
+
+JSON_LINES: JsonLinesCodec = JsonLinesCodec()
+BINARY: BinaryCodec = BinaryCodec()
+CODECS: dict[str, JsonLinesCodec | BinaryCodec] = {
+    JSON_LINES.name: JSON_LINES,
+    BINARY.name: BINARY,
+}
+
+
+class CodecProtocol(FlowControlMixin, asyncio.Protocol):
+    """
+    Serial protocol that decodes with the connection's current codec.
+    Samples from each chunk are queued as one SampleBatch for read_samples();
+    everything else (command responses, text) is queued for read_message().
+    The codec switches in place when the device acknowledges a negotiation.
+
+    Reading is paused once high_watermark samples are queued and resumed
+    when read_samples() has drained them to low_watermark, as in
+    LineFramingProtocol. Messages nobody reads must not hold the port up,
+    so past max_messages the oldest is dropped and counted instead.
+    """
+
+    def __init__(
+        self,
+        codec: JsonLinesCodec | BinaryCodec = JSON_LINES,
+        device: str = "",
+        high_watermark: int = 10_000,
+        low_watermark: int | None = None,
+        max_messages: int = 1000,
+    ) -> None:
+        super().__init__()
+        self.codec: JsonLinesCodec | BinaryCodec = codec
+        self.device: str = device
+        self.high_watermark: int = high_watermark
+        self.low_watermark: int = (
+            high_watermark // 4 if low_watermark is None else low_watermark
+        )
+        if not 0 <= self.low_watermark < self.high_watermark:
+            raise ValueError(
+                "Watermarks must satisfy 0 <= low < high, "
+                f"got low={self.low_watermark} high={self.high_watermark}"
+            )
+        self.max_messages: int = max_messages
+        self.transport: BaseTransport | None = None
+        self.queued: int = 0  # samples received but not yet read
+        self.pauses: int = 0
+        self.dropped_messages: int = 0
+        self._reading_paused: bool = False
+        self._closed: bool = False
+        self._decoder: JsonLinesDecoder | BinaryDecoder = codec.decoder()
+        self._batches: asyncio.Queue[SampleBatch] = asyncio.Queue()
+        # One slot more than max_messages for the None that marks the close
+        self._messages: asyncio.Queue[Message | None] = asyncio.Queue(max_messages + 1)
+        self._close_waiter: asyncio.Future = self._loop.create_future()
+
+    def connection_made(self, transport: BaseTransport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        batch: SampleBatch = SampleBatch(self.device)
+        timestamp: float = clock.now()
+        messages: list[Message] = self._decoder.decode(data, batch, timestamp)
+        while self._decoder.switch_to is not None:
+            leftover: bytes = bytes(self._decoder.buffer)
+            self.codec = CODECS[self._decoder.switch_to]
+            self._decoder = self.codec.decoder()
+            messages += self._decoder.decode(leftover, batch, timestamp)
+
+        if batch:
+            self._batches.put_nowait(batch)
+            self.queued += len(batch)
+            if (
+                self.queued >= self.high_watermark
+                and not self._reading_paused
+                and self.transport is not None
+            ):
+                self._reading_paused = True
+                self.pauses += 1
+                self.transport.pause_reading()
+        for message in messages:
+            self._put_message(message)
+
+    def _put_message(self, message: Message) -> None:
+        if self._messages.qsize() >= self.max_messages:
+            self._messages.get_nowait()
+            self.dropped_messages += 1
+        self._messages.put_nowait(message)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        super().connection_lost(exc)
+        self._closed = True
+        self._batches.put_nowait(SampleBatch(self.device))
+        self._messages.put_nowait(None)
+        if not self._close_waiter.done():
+            self._close_waiter.set_result(None)
+
+    def _get_close_waiter(self, stream: StreamWriter) -> asyncio.Future:
+        return self._close_waiter
+
+    async def read_samples(self) -> SampleBatch:
+        """Next batch of samples; an empty batch means the port closed"""
+        batch: SampleBatch = await self._batches.get()
+        self.queued -= len(batch)
+        if self._reading_paused and self.queued <= self.low_watermark:
+            self._reading_paused = False
+            if not self._closed:
+                self.transport.resume_reading()
+        return batch
+
+    async def read_message(self) -> Message | None:
+        """Next non-sample message; None means the port closed"""
+        return await self._messages.get()
+
+
+async def negotiate_codec(
+    protocol: CodecProtocol,
+    writer: StreamWriter,
+    name: str = "binary",
+    timeout: float = 1.0,
+) -> JsonLinesCodec | BinaryCodec:
+    """
+    Ask the device to switch to codec `name`. Devices that do not answer
+    with {"status": "ok", "codec": name} stay on the current codec.
+    """
+    if protocol.codec.name == name:
+        return protocol.codec
+    writer.write(protocol.codec.encode_command({"action": "codec", "codec": name}))
+    await writer.drain()
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                message: Message | None = await protocol.read_message()
+                if message is None:
+                    raise ConnectionError("port closed during codec negotiation")
+                if isinstance(message, dict) and "codec" in message:
+                    break
+    except TimeoutError:
+        print(
+            f"Device did not answer codec negotiation, staying with {protocol.codec.name}"
+        )
+    return protocol.codec
+
+
+async def open_codec_serial_connection(
+    url: str,
+    baudrate: int = 115200,
+    codec: str | None = "binary",
+    device: str = "",
+    capture: CaptureWriter | None = None,
+    **kwargs: Any,
+) -> tuple[CodecProtocol, StreamWriter]:
+    """
+    Open a port with a CodecProtocol and, if codec is given, negotiate it.
+    With a capture, every chunk read is also recorded to it.
+    """
+    import serial_asyncio
+
+    loop = asyncio.get_running_loop()
+    factory = partial(CodecProtocol, device=device or url)
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop,
+        factory if capture is None else capturing(factory, capture),
+        url,
+        baudrate=baudrate,
+        **kwargs,
+    )
+    writer: StreamWriter = StreamWriter(transport, protocol, None, loop)
+    if codec is not None:
+        await negotiate_codec(protocol, writer, codec)
+    return protocol, writer
@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+from asyncio import Future, StreamReader, StreamWriter, Task
+from typing import Any
+
+from myasync.codec import JSON_LINES, Message
+from myasync.eventlog import LOG
+from myasync.records import SampleBatch
+
+
+class CommandClient:
+    """
+    Pipelined JSON command client for one device connection.
+
+    Every command carries an "id" (one is assigned if missing) and up to
+    `window` commands are in flight at once. A background task reads
+    responses and resolves the waiting command by its id; a response
+    without an id resolves the oldest outstanding command, for devices
+    that answer in order but do not echo ids. Sample lines the device
+    streams in between are skipped, never taken for a response; both
+    directions go through the JSON lines codec.
+    """
+
+    def __init__(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+        window: int = 8,
+        timeout: float | None = 1.0,
+    ) -> None:
+        self.reader: StreamReader = reader
+        self.writer: StreamWriter = writer
+        self.timeout: float | None = timeout
+        self.unmatched_responses: int = 0
+        self.skipped_samples: int = 0
+        self._window: asyncio.Semaphore = asyncio.Semaphore(window)
+        self._pending: dict[str, Future] = {}  # insertion order is send order
+        self._ids = itertools.count(1)
+        self._reader_task: Task | None = None
+        self._decoder = JSON_LINES.decoder()
+
+    async def __aenter__(self) -> "CommandClient":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._reader_task is None:
+            self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+        self._fail_pending(ConnectionError("command client closed"))
+
+    def _next_id(self) -> str:
+        while True:
+            command_id: str = f"cmd_{next(self._ids):03d}"
+            if command_id not in self._pending:
+                return command_id
+
+    async def send(self, command: dict, timeout: float | None = None) -> dict:
+        """Send one command and wait for the response with the same id"""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._window:
+            command_id: str = str(command.get("id") or self._next_id())
+            if command_id in self._pending:
+                raise ValueError(f"Command id {command_id} is already in flight")
+            command = {**command, "id": command_id}
+
+            future: Future = asyncio.get_running_loop().create_future()
+            self._pending[command_id] = future
+            try:
+                self.writer.write(JSON_LINES.encode_command(command))
+                await self.writer.drain()
+                return await asyncio.wait_for(future, timeout)
+            except TimeoutError:
+                raise TimeoutError(
+                    f"No response to command {command_id} within {timeout}s"
+                ) from None
+            finally:
+                self._pending.pop(command_id, None)
+
+    async def send_many(self, commands: list[dict]) -> list[dict]:
+        """Send all commands through the window; responses come back in command order"""
+        return await asyncio.gather(*(self.send(command) for command in commands))
+
+    async def _read_responses(self) -> None:
+        while True:
+            line: bytes = await self.reader.readline()
+            if not line:
+                self._fail_pending(ConnectionError("device closed the connection"))
+                return
+            samples: SampleBatch = SampleBatch()
+            responses: list[Message] = self._decoder.decode(line, samples, 0.0)
+            self.skipped_samples += len(samples) + samples.rejected
+            for response in responses:
+                if isinstance(response, str):
+                    LOG.log("command", "Ignoring non-JSON line", line=response)
+                else:
+                    self._resolve(response)
+
+    def _resolve(self, response: Message) -> None:
+        future: Future | None = None
+        if isinstance(response, dict) and "id" in response:
+            future = self._pending.get(str(response["id"]))
+        else:
+            future = next((f for f in self._pending.values() if not f.done()), None)
+
+        if future is None or future.done():
+            self.unmatched_responses += 1
+            LOG.log(
+                "command",
+                "Unmatched response",
+                response=repr(response),
+                unmatched=self.unmatched_responses,
+            )
+        else:
+            future.set_result(response)
+
+    def _fail_pending(self, error: Exception) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,150 @@
+import json
+import time
+from asyncio import Queue, QueueEmpty, StreamWriter
+from collections import deque
+from dataclasses import dataclass, field
+
+from myasync.codec import JSON_LINES, BinaryCodec, JsonLinesCodec
+from myasync.eventlog import LOG
+from myasync.metrics import PipelineMetrics
+
+
+def command_key(payload: str) -> str | None:
+    """
+    Key under which newer commands supersede older ones, or None if the
+    command must always be sent: every LED_* command sets the same LED state
+    and every `<temp>` frame or {"target-temp": ...} sets the same setpoint.
+    """
+    if payload.startswith("LED_"):
+        return "LED"
+    if payload.startswith("<") and payload.endswith(">"):
+        return "target-temp"
+    if payload.startswith("{"):
+        try:
+            decoded = json.loads(payload)
+        except ValueError:
+            return None
+        if isinstance(decoded, dict) and "target-temp" in decoded:
+            return "target-temp"
+    return None
+
+
+@dataclass
+class Command:
+    payload: str
+    key: str | None = None
+    # False to always send, even if a newer command has the same key
+    coalesce: bool = True
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+    @classmethod
+    def from_payload(cls, payload: str, coalesce: bool = True) -> "Command":
+        return cls(payload, command_key(payload), coalesce)
+
+
+class CommandQueue(Queue):
+    """
+    Command queue that wraps plain str payloads in Commands as they are
+    put, so their queue-to-wire latency includes the time spent queued
+    """
+
+    def put_nowait(self, item: Command | str) -> None:
+        # Queue.put() ends in put_nowait(), so both stamp here
+        super().put_nowait(
+            Command.from_payload(item) if isinstance(item, str) else item
+        )
+
+
+@dataclass
+class CommandWriterStats:
+    queued: int = 0
+    sent: int = 0
+    coalesced: int = 0
+    writes: int = 0  # write()+drain() round trips, one per drained burst
+    errors: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=10_000))
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        """Queue-to-wire latency in seconds at the given percentile (0-100)"""
+        if not self.latencies:
+            return None
+        ordered: list[float] = sorted(self.latencies)
+        index: int = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+def coalesce_commands(commands: list[Command]) -> list[Command]:
+    """Drop every coalescable command superseded by a later one with the same key"""
+    seen: set[str] = set()
+    kept: list[Command] = []
+    for command in reversed(commands):
+        if command.coalesce and command.key is not None:
+            if command.key in seen:
+                continue
+            seen.add(command.key)
+        kept.append(command)
+    kept.reverse()
+    return kept
+
+
+async def write_commands(
+    writer: StreamWriter,
+    command_queue: Queue,
+    stats: CommandWriterStats | None = None,
+    codec: JsonLinesCodec | BinaryCodec = JSON_LINES,
+    metrics: PipelineMetrics | None = None,
+) -> None:
+    """
+    Send everything queued in command_queue with a single write and drain
+    per burst, keeping only the latest command per key. Items may be
+    Commands or plain str payloads; they are framed with the connection's codec.
+    A str put on a plain Queue is only stamped when dequeued, so use a
+    CommandQueue for latencies that include queueing.
+    """
+    stats = CommandWriterStats() if stats is None else stats
+    while True:
+        pending: list[Command | str] = [await command_queue.get()]
+        while True:
+            try:
+                pending.append(command_queue.get_nowait())
+            except QueueEmpty:
+                break
+
+        commands: list[Command] = [
+            item if isinstance(item, Command) else Command.from_payload(item)
+            for item in pending
+        ]
+        to_send: list[Command] = coalesce_commands(commands)
+        stats.queued += len(commands)
+        stats.coalesced += len(commands) - len(to_send)
+        if metrics is not None:
+            metrics.commands_coalesced.inc(len(commands) - len(to_send))
+        try:
+            writer.write(
+                b"".join(codec.encode_command(command.payload) for command in to_send)
+            )
+            await writer.drain()
+            stats.writes += 1
+            if metrics is not None:
+                metrics.commands_sent.inc(len(to_send))
+            sent_at: float = time.perf_counter()
+            for command in to_send:
+                latency: float = sent_at - command.enqueued_at
+                stats.latencies.append(latency)
+                stats.sent += 1
+                if metrics is not None:
+                    metrics.command_latency.observe(latency)
+                LOG.log(
+                    "command",
+                    "Sent arduino command",
+                    payload=command.payload,
+                    latency_ms=round(latency * 1000, 2),
+                )
+        except Exception as e:
+            stats.errors += 1
+            if metrics is not None:
+                metrics.command_errors.inc()
+            LOG.error("command", "Error writing to Arduino", error=e)
+        finally:
+            for _ in pending:
+                command_queue.task_done()
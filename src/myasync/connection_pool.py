@@ -0,0 +1,145 @@
+import asyncio
+from asyncio import StreamReader, StreamWriter, Task
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+PoolKey = tuple[str, int]  # (port, baudrate)
+
+# Errors after which the stream may hold half a response, so it is not reused
+DISCARD_ON: tuple[type[BaseException], ...] = (
+    OSError,
+    EOFError,
+    TimeoutError,
+    asyncio.CancelledError,
+)
+
+
+@dataclass
+class PooledConnection:
+    reader: StreamReader
+    writer: StreamWriter
+    last_used: float
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    uses: int = 0
+
+    def is_healthy(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class SerialConnectionPool:
+    """
+    Keeps serial connections open per (port, baudrate) so callers do not pay
+    for an open - and the Arduino reset that DTR triggers - on every request.
+
+    Access is serialized per connection: a caller holds the connection for a
+    whole write/response exchange. Idle connections are health-checked and
+    closed once unused for idle_ttl seconds; a connection that failed mid
+    exchange is closed instead of being returned to the pool.
+    """
+
+    def __init__(self, idle_ttl: float = 60.0, check_interval: float = 5.0) -> None:
+        self.idle_ttl: float = idle_ttl
+        self.check_interval: float = check_interval
+        self.opens: int = 0
+        self.evictions: int = 0
+        self._connections: dict[PoolKey, PooledConnection] = {}
+        self._open_locks: dict[PoolKey, asyncio.Lock] = {}
+        self._reaper: Task | None = None
+
+    async def __aenter__(self) -> "SerialConnectionPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    @asynccontextmanager
+    async def connection(
+        self, port: str, baudrate: int = 115200
+    ) -> AsyncIterator[tuple[StreamReader, StreamWriter]]:
+        """Borrow the (reader, writer) pair for port, opening it if needed"""
+        key: PoolKey = (port, baudrate)
+        loop = asyncio.get_running_loop()
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+        for _ in range(3):
+            conn: PooledConnection = await self._get(key)
+            await conn.lock.acquire()
+            # It may have been closed while this caller waited for the lock
+            if self._connections.get(key) is conn and conn.is_healthy():
+                break
+            conn.lock.release()
+            self._discard(key, conn)
+        else:
+            raise ConnectionError(f"Could not get a healthy connection to {port}")
+
+        try:
+            conn.uses += 1
+            yield conn.reader, conn.writer
+        except DISCARD_ON:
+            self._discard(key, conn)
+            raise
+        finally:
+            conn.last_used = loop.time()
+            conn.lock.release()
+
+    async def _get(self, key: PoolKey) -> PooledConnection:
+        conn: PooledConnection | None = self._connections.get(key)
+        if conn is not None and conn.is_healthy():
+            return conn
+
+        # One open per key even when many callers arrive at once
+        async with self._open_locks.setdefault(key, asyncio.Lock()):
+            conn = self._connections.get(key)
+            if conn is not None and conn.is_healthy():
+                return conn
+            if conn is not None:
+                self._discard(key, conn)
+            port, baudrate = key
+            import serial_asyncio
+
+            reader, writer = await serial_asyncio.open_serial_connection(
+                url=port, baudrate=baudrate
+            )
+            self.opens += 1
+            conn = PooledConnection(reader, writer, asyncio.get_running_loop().time())
+            self._connections[key] = conn
+            return conn
+
+    def _discard(self, key: PoolKey, conn: PooledConnection) -> None:
+        if self._connections.get(key) is conn:
+            del self._connections[key]
+            self.evictions += 1
+        conn.close()
+
+    def evict_idle(self) -> int:
+        """Close connections that are unhealthy or unused for idle_ttl; returns how many"""
+        now: float = asyncio.get_running_loop().time()
+        evicted: int = 0
+        for key, conn in list(self._connections.items()):
+            if conn.lock.locked():
+                continue
+            if not conn.is_healthy() or now - conn.last_used >= self.idle_ttl:
+                self._discard(key, conn)
+                evicted += 1
+        return evicted
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self.evict_idle()
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for key, conn in list(self._connections.items()):
+            self._discard(key, conn)
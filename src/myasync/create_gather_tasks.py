@@ -26,4 +26,5 @@ async def main():
     print(f"finished at {time.strftime('%X')}")
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,260 @@
+import asyncio
+import sqlite3
+from asyncio import Queue, QueueEmpty, QueueFull
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+from typing import Any, Callable, Iterable
+
+from myasync.aggregate import WindowBatch
+from myasync.metrics import PipelineMetrics
+from myasync.records import SampleBatch
+from myasync.watermark_queue import WatermarkQueue
+
+# Errors worth retrying: SQLite raises OperationalError for "database is locked/busy"
+TRANSIENT_DB_ERRORS: tuple[type[Exception], ...] = (sqlite3.OperationalError,)
+
+
+class SQLiteSink:
+    """
+    Writes SampleBatches to a local SQLite database, and the WindowBatches of
+    a WindowAggregator to its sample_windows table.
+    Each write is one executemany inside one transaction, run on a dedicated
+    worker thread so the sqlite3 connection is only ever used from that thread.
+    """
+
+    def __init__(self, path: str = "readings.db", timeout: float = 5.0) -> None:
+        self.path: str = path
+        self.timeout: float = timeout
+        self._connection: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite-sink"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS samples ("
+            " id INTEGER PRIMARY KEY,"
+            " device TEXT NOT NULL,"
+            " timestamp REAL NOT NULL,"
+            " interval INTEGER NOT NULL,"
+            " value REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sample_windows ("
+            " id INTEGER PRIMARY KEY,"
+            " device TEXT NOT NULL,"
+            " window_start REAL NOT NULL,"
+            " window_end REAL NOT NULL,"
+            " count INTEGER NOT NULL,"
+            " min REAL NOT NULL,"
+            " max REAL NOT NULL,"
+            " mean REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS spool_offsets ("
+            " spool TEXT PRIMARY KEY,"
+            " segment INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL)"
+        )
+        return connection
+
+    def _write(self, batches: list[SampleBatch | WindowBatch]) -> None:
+        if self._connection is None:
+            self._connection = self._connect()
+        rows = chain.from_iterable(
+            zip(repeat(batch.device), batch.timestamps, batch.intervals, batch.values)
+            for batch in batches
+            if not isinstance(batch, WindowBatch)
+        )
+        windows = chain.from_iterable(
+            ((batch.device, *row) for row in batch.rows())
+            for batch in batches
+            if isinstance(batch, WindowBatch)
+        )
+        # Where each spool is up to, committed atomically with the rows so a
+        # restart neither replays nor skips spooled batches
+        positions: dict[str, tuple[str, int, int]] = {
+            batch.spool_position[0]: batch.spool_position
+            for batch in batches
+            if batch.spool_position is not None
+        }
+        # The connection context manager commits on success and rolls back on error
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO samples (device, timestamp, interval, value) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.executemany(
+                "INSERT INTO sample_windows"
+                " (device, window_start, window_end, count, min, max, mean)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                windows,
+            )
+            self._connection.executemany(
+                "INSERT INTO spool_offsets (spool, segment, offset) VALUES (?, ?, ?)"
+                " ON CONFLICT (spool) DO UPDATE"
+                " SET segment = excluded.segment, offset = excluded.offset",
+                positions.values(),
+            )
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def write_batch(self, batches: list[SampleBatch | WindowBatch]) -> None:
+        """Commit the samples of all batches in a single transaction"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write, batches)
+
+    def _spool_position(self, spool: str) -> tuple[str, int, int] | None:
+        if self._connection is None:
+            self._connection = self._connect()
+        row = self._connection.execute(
+            "SELECT spool, segment, offset FROM spool_offsets WHERE spool = ?", (spool,)
+        ).fetchone()
+        return None if row is None else tuple(row)
+
+    async def spool_position(self, spool: str) -> tuple[str, int, int] | None:
+        """The last committed position of a SpoolQueue, to resume it after a restart"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._spool_position, spool)
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=True)
+
+
+def count_items(item: Any) -> int:
+    return 1
+
+
+async def collect_batch(
+    db_queue: Queue,
+    max_batch_size: int,
+    max_linger: float,
+    size: Callable[[Any], int] = count_items,
+    into: list[Any] | None = None,
+) -> list[Any]:
+    """
+    Wait for one item, then keep taking items until the batch holds
+    max_batch_size units (as measured by `size`) or max_linger seconds have
+    passed since the first one arrived. Items are appended to `into` if
+    given, so a caller that is cancelled mid-batch still holds them.
+    """
+    loop = asyncio.get_running_loop()
+    batch: list[Any] = [] if into is None else into
+    batch.append(await db_queue.get())
+    total: int = sum(map(size, batch))
+    deadline: float = loop.time() + max_linger
+
+    while total < max_batch_size:
+        try:
+            item: Any = db_queue.get_nowait()
+        except QueueEmpty:
+            remaining: float = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(db_queue.get(), remaining)
+            except TimeoutError:
+                break
+        batch.append(item)
+        total += size(item)
+
+    return batch
+
+
+async def write_batch_with_retry(
+    sink: SQLiteSink,
+    batch: list[Any],
+    max_retries: int | None = 3,
+    retry_delay: float = 0.1,
+    transient_errors: Iterable[type[Exception]] = TRANSIENT_DB_ERRORS,
+    max_retry_delay: float = 5.0,
+) -> None:
+    """
+    Write a batch, retrying transient failures with exponential backoff.
+    With max_retries=None it retries until the database comes back, which is
+    what a SpoolQueue in front of it wants: the backlog goes to disk meanwhile.
+    """
+    transient: tuple[type[Exception], ...] = tuple(transient_errors)
+    attempt: int = 0
+    while True:
+        try:
+            await sink.write_batch(batch)
+            return
+        except transient as e:
+            if max_retries is not None and attempt >= max_retries:
+                raise
+            delay: float = min(max_retry_delay, retry_delay * 2 ** min(attempt, 32))
+            attempt += 1
+            print(f"Transient database error ({e}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def write_batches_to_database(
+    db_queue: Queue,
+    sink: SQLiteSink,
+    max_batch_size: int = 500,
+    max_linger: float = 0.05,
+    max_retries: int | None = 3,
+    retry_delay: float = 0.1,
+    metrics: PipelineMetrics | None = None,
+    catchup_batch_size: int | None = None,
+) -> None:
+    """
+    Drain SampleBatches from db_queue and commit up to max_batch_size samples
+    at a time in one transaction. While a backlog is waiting (e.g. a
+    SpoolQueue draining after an outage) transactions grow to
+    catchup_batch_size samples, so catching up runs faster than live.
+    """
+    while True:
+        batch: list[SampleBatch] = await collect_batch(
+            db_queue, max_batch_size, max_linger, size=len
+        )
+        if catchup_batch_size is not None:
+            total: int = sum(len(item) for item in batch)
+            while total < catchup_batch_size and not db_queue.empty():
+                item: SampleBatch = db_queue.get_nowait()
+                batch.append(item)
+                total += len(item)
+        try:
+            await write_batch_with_retry(sink, batch, max_retries, retry_delay)
+        except Exception as e:
+            if metrics is not None:
+                metrics.db_errors.inc()
+            rows: int = sum(len(item) for item in batch)
+            if isinstance(e, TRANSIENT_DB_ERRORS):
+                # The database is still down: keep the samples for a later round
+                kept: int = requeue(db_queue, batch)
+                print(
+                    f"Error writing batch of {rows} rows to database, "
+                    f"re-queued {kept} of {len(batch)} batches: {e}"
+                )
+            else:
+                print(f"Error writing batch of {rows} rows to database: {e}")
+        else:
+            if metrics is not None:
+                metrics.batches_committed(batch)
+        # Committed, re-queued or dropped: only now may a SpoolQueue remove them
+        for _ in batch:
+            db_queue.task_done()
+
+
+def requeue(db_queue: Queue, batch: list[SampleBatch]) -> int:
+    """Put batches that failed to commit back on db_queue; returns how many fit"""
+    if isinstance(db_queue, WatermarkQueue):
+        # Back at the head and past the overflow policy, which would otherwise
+        # treat a retry as new data and may discard it
+        db_queue.requeue_nowait(batch)
+        return len(batch)
+    for kept, item in enumerate(batch):
+        try:
+            db_queue.put_nowait(item)
+        except QueueFull:
+            return kept
+    return len(batch)
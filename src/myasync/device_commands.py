@@ -0,0 +1,118 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from myasync.codec import JSON_LINES, Message
+from myasync.command_client import CommandClient
+from myasync.connection_pool import SerialConnectionPool
+from myasync.records import SampleBatch
+
+
+@asynccontextmanager
+async def device_connection(port, baudrate, pool=None):
+    """Borrow a connection from pool, or open one just for this call and close it after."""
+    if pool is not None:
+        async with pool.connection(port, baudrate) as (reader, writer):
+            yield reader, writer
+        return
+
+    import serial_asyncio
+
+    reader, writer = await serial_asyncio.open_serial_connection(
+        url=port, baudrate=baudrate
+    )
+    try:
+        yield reader, writer
+    finally:
+        writer.close()
+
+
+async def read_response(reader, timeout: float | None = 1.0) -> dict:
+    """Read the device's next response, skipping the sample lines it streams meanwhile."""
+    decoder = JSON_LINES.decoder()
+    samples = SampleBatch()
+    async with asyncio.timeout(timeout):
+        while True:
+            response_line = await reader.readline()
+            if not response_line:
+                raise ConnectionError("device closed the connection")
+            messages: list[Message] = decoder.decode(response_line, samples, 0.0)
+            if messages:
+                if isinstance(messages[0], str):
+                    raise ValueError(f"Non-JSON response from device: {messages[0]!r}")
+                return messages[0]
+            # A buffered stream returns lines without yielding; let the timeout fire
+            await asyncio.sleep(0)
+
+
+async def send_command_to_device(
+    command, port="/dev/ttyACM0", baudrate=115200, pool: SerialConnectionPool | None = None
+):
+    """Send a single command to the device and return the response."""
+    async with device_connection(port, baudrate, pool) as (reader, writer):
+        # Send the command
+        command_bytes = JSON_LINES.encode_command(command)
+        writer.write(command_bytes)
+        await writer.drain()  # Wait for data to be sent
+
+        # Read the response
+        return await read_response(reader)
+
+
+async def send_multiple_commands(
+    commands, port="/dev/ttyACM0", baudrate=115200, pool: SerialConnectionPool | None = None
+):
+    """Send multiple commands and collect all responses."""
+    responses = []
+    async with device_connection(port, baudrate, pool) as (reader, writer):
+        for cmd in commands:
+            # Send command
+            command_bytes = JSON_LINES.encode_command(cmd)
+            writer.write(command_bytes)
+            await writer.drain()
+
+            # Read response
+            responses.append(await read_response(reader))
+
+            # Small delay between commands
+            await asyncio.sleep(0.1)
+
+        return responses
+
+
+async def configure_device_settings(
+    settings, port="/dev/ttyACM0", baudrate=115200, pool: SerialConnectionPool | None = None
+):
+    """Send configuration settings to device and verify they were applied."""
+    async with device_connection(port, baudrate, pool) as (reader, writer):
+        # Send configuration command
+        config_command = {"action": "configure", "settings": settings}
+
+        command_bytes = JSON_LINES.encode_command(config_command)
+        writer.write(command_bytes)
+        await writer.drain()
+
+        # Read acknowledgment
+        response = await read_response(reader)
+
+        if response.get("status") != "ok":
+            raise ValueError(f"Configuration failed: {response}")
+
+        return response
+
+
+async def send_pipelined_commands(
+    commands,
+    port="/dev/ttyACM0",
+    baudrate=115200,
+    window=8,
+    timeout=1.0,
+    pool: SerialConnectionPool | None = None,
+):
+    """
+    Send multiple commands with up to `window` of them in flight at once and
+    return the responses in command order. Unlike send_multiple_commands this
+    does not wait a round trip (plus a delay) per command.
+    """
+    async with device_connection(port, baudrate, pool) as (reader, writer):
+        async with CommandClient(reader, writer, window=window, timeout=timeout) as client:
+            return await client.send_many(commands)
@@ -0,0 +1,197 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, TextIO
+
+
+@dataclass
+class Sampling:
+    """Keep 1 in `every` records of a category, and at most per_second of those"""
+
+    every: int = 1
+    per_second: float | None = None
+
+
+@dataclass
+class EventLogStats:
+    logged: int = 0
+    sampled_out: int = 0
+    rate_limited: int = 0
+    dropped: int = 0  # the writer thread was more than maxsize records behind
+    written: int = 0
+
+
+class _Category:
+    __slots__ = ("every", "per_second", "seen", "tokens", "refilled_at")
+
+    def __init__(self, sampling: Sampling) -> None:
+        self.every: int = max(1, sampling.every)
+        self.per_second: float | None = sampling.per_second
+        self.seen: int = 0
+        self.tokens: float = sampling.per_second or 0.0
+        self.refilled_at: float = time.monotonic()
+
+    def take_token(self) -> bool:
+        now: float = time.monotonic()
+        self.tokens = min(
+            self.per_second, self.tokens + (now - self.refilled_at) * self.per_second
+        )
+        self.refilled_at = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+# What the pipeline's per-sample and per-command paths log by default
+DEFAULT_SAMPLING: dict[str, Sampling] = {
+    "db": Sampling(every=100),
+    "serial": Sampling(per_second=50),
+    "reader": Sampling(per_second=10),
+    "command": Sampling(every=10, per_second=50),
+    "publish": Sampling(per_second=10),
+}
+
+
+def format_value(value: Any) -> str:
+    text: str = value if isinstance(value, str) else repr(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+
+def format_record(
+    timestamp: float, level: str, category: str, message: str, fields: dict
+) -> str:
+    """One logfmt line: ts=... level=... cat=... msg=... key=value ..."""
+    parts: list[str] = [
+        "ts="
+        + time.strftime("%H:%M:%S", time.localtime(timestamp))
+        + f".{int(timestamp % 1 * 1000):03d}",
+        "level=" + level,
+        "cat=" + category,
+        "msg=" + format_value(message),
+    ]
+    parts.extend(f"{key}={format_value(value)}" for key, value in fields.items())
+    return " ".join(parts)
+
+
+class EventLog:
+    """
+    Structured logging for the hot paths without blocking the event loop.
+
+    log() decides whether to keep a record (per-category 1-in-N sampling and
+    a token-bucket rate limit, see Sampling), then appends it unformatted to a
+    bounded deque; a writer thread formats and writes records in bursts. A
+    slow or blocked stream only makes the deque fill up, after which records
+    are dropped and counted, so the caller pays the same small cost whatever
+    the sink. error() bypasses sampling and rate limits. Fields are formatted
+    on the writer thread, so pass values that are not mutated afterwards.
+
+    Writes go to `stream`, or to sys.stdout as it is at write time.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        sampling: dict[str, Sampling] | None = None,
+        maxsize: int = 10_000,
+        flush_interval: float = 0.1,
+    ) -> None:
+        self.stream: TextIO | None = stream
+        self.maxsize: int = maxsize
+        self.flush_interval: float = flush_interval
+        self.stats: EventLogStats = EventLogStats()
+        self._categories: dict[str, _Category] = {
+            name: _Category(rule)
+            for name, rule in (
+                DEFAULT_SAMPLING if sampling is None else sampling
+            ).items()
+        }
+        self._pending: deque[tuple] = deque()
+        self._wake: threading.Event = threading.Event()
+        self._idle: bool = False
+        self._closed: bool = False
+        self._thread: threading.Thread | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _enqueue(self, level: str, category: str, message: str, fields: dict) -> None:
+        if len(self._pending) >= self.maxsize or self._closed:
+            self.stats.dropped += 1
+            return
+        self._pending.append((time.time(), level, category, message, fields))
+        self.stats.logged += 1
+        if self._thread is None:
+            self._start()
+        elif self._idle:
+            # At most one wake-up per writer pass, not one per record
+            self._idle = False
+            self._wake.set()
+
+    def log(self, category: str, message: str, **fields: Any) -> None:
+        state: _Category | None = self._categories.get(category)
+        if state is not None:
+            skip: int = state.seen % state.every  # keeps the 1st, N+1th, ...
+            state.seen += 1
+            if skip:
+                self.stats.sampled_out += 1
+                return
+            if state.per_second is not None and not state.take_token():
+                self.stats.rate_limited += 1
+                return
+        self._enqueue("info", category, message, fields)
+
+    def error(self, category: str, message: str, **fields: Any) -> None:
+        self._enqueue("error", category, message, fields)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="myasync-eventlog", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._idle = True
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._idle = False
+            self.flush()
+        self.flush()  # what was logged while the last flush was writing
+
+    def flush(self) -> None:
+        """Write out everything pending; called by the writer thread"""
+        pending: deque[tuple] = self._pending
+        lines: list[str] = []
+        while pending:
+            lines.append(format_record(*pending.popleft()))
+        if not lines:
+            return
+        stream: TextIO = sys.stdout if self.stream is None else self.stream
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            pass  # closed or broken stream; there is nowhere to report it
+        self.stats.written += len(lines)
+
+    def close(self, timeout: float = 1.0) -> None:
+        """Stop the writer thread once it has written what is pending"""
+        self._closed = True
+        thread: threading.Thread | None = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            self._wake.set()
+            thread.join(timeout)
+        else:
+            self.flush()
+
+
+# Shared by the pipeline modules; its thread starts with the first record
+LOG: EventLog = EventLog()
@@ -0,0 +1,201 @@
+import asyncio
+from asyncio import BaseTransport, StreamWriter
+from asyncio.streams import FlowControlMixin
+from dataclasses import dataclass
+from functools import partial
+
+from myasync import clock
+from myasync.capture import CaptureWriter, capturing
+
+NEWLINE: int = ord("\n")
+CARRIAGE_RETURN: int = ord("\r")
+
+
+@dataclass
+class FramingStats:
+    chunks: int = 0
+    bytes: int = 0
+    lines: int = 0
+    batches: int = 0
+    overruns: int = 0  # lines discarded for exceeding max_line_length
+    pauses: int = 0  # times reading paused because read_batch() fell behind
+    # Inside an overrun line: its bytes are dropped up to the next newline
+    discarding: bool = False
+
+
+def split_lines(
+    buffer: bytearray, max_line_length: int, stats: FramingStats
+) -> list[bytes]:
+    """
+    Remove and return all complete lines in buffer, without their line
+    endings, leaving the partial tail. Lines longer than max_line_length
+    are discarded as overruns, including the rest of one whose start was
+    already dropped when it arrives with its newline.
+    """
+    end: int = buffer.rfind(b"\n")
+    if end < 0:
+        _check_overrun(buffer, max_line_length, stats)
+        return []
+
+    lines: list[bytes] = []
+    start: int = 0
+    if stats.discarding:
+        start = buffer.find(b"\n") + 1
+        stats.discarding = False
+    with memoryview(buffer) as view:
+        while start <= end:
+            newline: int = buffer.find(b"\n", start, end + 1)
+            stop: int = newline
+            if stop > start and buffer[stop - 1] == CARRIAGE_RETURN:
+                stop -= 1
+            if stop - start > max_line_length:
+                stats.overruns += 1
+            elif stop > start:
+                lines.append(bytes(view[start:stop]))
+            start = newline + 1
+    # Keep the partial tail; deleting from the front does not reallocate
+    del buffer[: end + 1]
+    _check_overrun(buffer, max_line_length, stats)
+
+    if lines:
+        stats.lines += len(lines)
+        stats.batches += 1
+    return lines
+
+
+def _check_overrun(
+    buffer: bytearray, max_line_length: int, stats: FramingStats
+) -> None:
+    """Drop a partial line that is already too long, and the rest of it to come"""
+    if len(buffer) > max_line_length:
+        buffer.clear()
+        if not stats.discarding:
+            stats.overruns += 1
+        stats.discarding = True
+
+
+class LineFramingProtocol(FlowControlMixin, asyncio.Protocol):
+    """
+    Production version of InputChunkProtocol for newline-terminated devices.
+
+    Every chunk from the transport is appended to one reusable bytearray and
+    all complete lines in it are split out in a single data_received call,
+    slicing through a memoryview so the only copy is the line itself.
+    Lines are handed downstream as one list per chunk via lines_received,
+    which by default queues them, stamped with their receive time, for
+    read_batch() and read_timed_batch().
+
+    Reading is paused once high_watermark lines are queued and resumed when
+    read_batch() has drained them to low_watermark, so a slow consumer
+    pushes back on the port instead of growing the queue.
+    """
+
+    def __init__(
+        self,
+        max_line_length: int = 4096,
+        high_watermark: int = 10_000,
+        low_watermark: int | None = None,
+    ) -> None:
+        super().__init__()
+        self.max_line_length: int = max_line_length
+        self.high_watermark: int = high_watermark
+        self.low_watermark: int = (
+            high_watermark // 4 if low_watermark is None else low_watermark
+        )
+        if not 0 <= self.low_watermark < self.high_watermark:
+            raise ValueError(
+                "Watermarks must satisfy 0 <= low < high, "
+                f"got low={self.low_watermark} high={self.high_watermark}"
+            )
+        self.stats: FramingStats = FramingStats()
+        self.transport: BaseTransport | None = None
+        self.queued: int = 0  # lines received but not yet read
+        self._reading_paused: bool = False
+        self._buffer: bytearray = bytearray()
+        self._batches: asyncio.Queue[tuple[float, list[bytes]]] = asyncio.Queue()
+        self._closed: bool = False
+        self._close_waiter: asyncio.Future = self._loop.create_future()
+
+    def connection_made(self, transport: BaseTransport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        received_at: float = clock.now()
+        self._buffer += data
+        self.stats.chunks += 1
+        self.stats.bytes += len(data)
+        lines: list[bytes] = split_lines(self._buffer, self.max_line_length, self.stats)
+        if lines:
+            self.lines_received(lines, received_at)
+
+    def lines_received(
+        self, lines: list[bytes], received_at: float | None = None
+    ) -> None:
+        """Hand one batch of complete lines downstream"""
+        self._batches.put_nowait(
+            (clock.now() if received_at is None else received_at, lines)
+        )
+        self.queued += len(lines)
+        if (
+            self.queued >= self.high_watermark
+            and not self._reading_paused
+            and self.transport is not None
+        ):
+            self._reading_paused = True
+            self.stats.pauses += 1
+            self.transport.pause_reading()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        super().connection_lost(exc)
+        self._closed = True
+        if not self._close_waiter.done():
+            self._close_waiter.set_result(None)
+        # An empty batch tells read_batch() callers the port has gone
+        self._batches.put_nowait((clock.now(), []))
+
+    def _get_close_waiter(self, stream: StreamWriter) -> asyncio.Future:
+        # Lets StreamWriter.wait_closed() work on top of this protocol
+        return self._close_waiter
+
+    async def read_batch(self) -> list[bytes]:
+        """Wait for the next batch of lines; an empty list means the port closed"""
+        return (await self.read_timed_batch())[1]
+
+    async def read_timed_batch(self) -> tuple[float, list[bytes]]:
+        """Like read_batch, with the time the lines were received at, see clock.now()"""
+        if self._closed and self._batches.empty():
+            return clock.now(), []
+        received_at, lines = await self._batches.get()
+        self.queued -= len(lines)
+        if self._reading_paused and self.queued <= self.low_watermark:
+            self._reading_paused = False
+            if not self._closed:
+                self.transport.resume_reading()
+        return received_at, lines
+
+
+async def open_framed_serial_connection(
+    url: str,
+    baudrate: int = 115200,
+    max_line_length: int = 4096,
+    capture: CaptureWriter | None = None,
+    **kwargs,
+) -> tuple[LineFramingProtocol, StreamWriter]:
+    """
+    Like serial_asyncio.open_serial_connection, but reads through a
+    LineFramingProtocol instead of a StreamReader. With a capture, every
+    chunk read is also recorded to it (see myasync.capture).
+    """
+    import serial_asyncio
+
+    loop = asyncio.get_running_loop()
+    factory = partial(LineFramingProtocol, max_line_length)
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop,
+        factory if capture is None else capturing(factory, capture),
+        url,
+        baudrate=baudrate,
+        **kwargs,
+    )
+    writer: StreamWriter = StreamWriter(transport, protocol, None, loop)
+    return protocol, writer
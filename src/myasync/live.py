@@ -0,0 +1,167 @@
+import asyncio
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Callable
+
+from myasync import clock
+from myasync.records import Sample, SampleBatch
+
+
+@dataclass
+class WindowStats:
+    count: int
+    min: float
+    max: float
+    mean: float
+
+
+class SampleRing:
+    """
+    Fixed-size ring of the most recent samples of one channel, in
+    preallocated timestamp/interval/value arrays. extend() copies a whole
+    SampleBatch in at most two slice assignments per column; queries copy
+    out the same way, so nothing is allocated per sample.
+    """
+
+    def __init__(self, capacity: int = 4096) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity: int = capacity
+        self.timestamps: array = array("d", bytes(8 * capacity))
+        self.intervals: array = array("q", bytes(8 * capacity))
+        self.values: array = array("d", bytes(8 * capacity))
+        self.total: int = 0  # samples ever appended; the newest is total - 1
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def _segments(self, n: int) -> list[tuple[int, int]]:
+        """Physical [start, stop) ranges holding the newest n samples, oldest first"""
+        end: int = self.total % self.capacity
+        start: int = end - n
+        if start >= 0:
+            return [(start, end)]
+        return [(start + self.capacity, self.capacity), (0, end)]
+
+    def extend(self, batch: SampleBatch) -> None:
+        count: int = len(batch)
+        skip: int = max(0, count - self.capacity)  # only the newest fit
+        pos: int = (self.total + skip) % self.capacity
+        offset: int = skip
+        while offset < count:
+            run: int = min(count - offset, self.capacity - pos)
+            for ring, column in (
+                (self.timestamps, batch.timestamps),
+                (self.intervals, batch.intervals),
+                (self.values, batch.values),
+            ):
+                ring[pos : pos + run] = column[offset : offset + run]
+            offset += run
+            pos = 0
+        self.total += count
+
+    def last(self) -> Sample | None:
+        if not self.total:
+            return None
+        i: int = (self.total - 1) % self.capacity
+        return Sample(self.timestamps[i], self.intervals[i], self.values[i])
+
+    def last_n(self, n: int, device: str = "") -> SampleBatch:
+        """The newest n samples (fewer if the ring holds fewer), oldest first"""
+        batch = SampleBatch(device)
+        for start, stop in self._segments(max(0, min(n, len(self)))):
+            batch.timestamps.extend(self.timestamps[start:stop])
+            batch.intervals.extend(self.intervals[start:stop])
+            batch.values.extend(self.values[start:stop])
+        return batch
+
+    def since(self, timestamp: float) -> int:
+        """How many of the held samples have timestamp >= `timestamp`"""
+        held: int = len(self)
+        first: int = (self.total - held) % self.capacity
+        timestamps, capacity = self.timestamps, self.capacity
+        oldest: int = bisect_left(
+            range(held), timestamp, key=lambda i: timestamps[(first + i) % capacity]
+        )
+        return held - oldest
+
+    def window(self, oldest: float) -> WindowStats | None:
+        """min/max/mean over held samples stamped at or after `oldest`"""
+        n: int = self.since(oldest)
+        if not n:
+            return None
+        runs: list[array] = [
+            self.values[start:stop] for start, stop in self._segments(n)
+        ]
+        return WindowStats(
+            count=n,
+            min=min(min(run) for run in runs),
+            max=max(max(run) for run in runs),
+            mean=sum(sum(run) for run in runs) / n,
+        )
+
+
+class LiveStore:
+    """
+    The latest samples of every device and channel, for dashboards and
+    control loops that should not query the database. Readers call update()
+    with each SampleBatch they queue; queries are answered from a SampleRing
+    per (device, channel) and next() wakes as soon as a batch arrives.
+    Samples currently carry one channel, "value".
+
+    `now` must be the clock the samples are stamped with, clock.now() by
+    default, so window() measures its seconds back on the same scale.
+    """
+
+    def __init__(
+        self, capacity: int = 4096, now: Callable[[], float] = clock.now
+    ) -> None:
+        self.capacity: int = capacity
+        self.now: Callable[[], float] = now
+        self.rings: dict[tuple[str, str], SampleRing] = {}
+        self._waiters: dict[tuple[str, str], list[asyncio.Future]] = {}
+        # Answers queries about devices that have sent nothing; never extended
+        self._empty: SampleRing = SampleRing(1)
+
+    def ring(self, device: str, channel: str = "value") -> SampleRing:
+        """The device's ring, or an empty one if it has sent nothing yet"""
+        return self.rings.get((device, channel), self._empty)
+
+    def update(self, batch: SampleBatch, channel: str = "value") -> None:
+        if not batch:
+            return
+        key: tuple[str, str] = (batch.device, channel)
+        ring: SampleRing | None = self.rings.get(key)
+        if ring is None:
+            ring = self.rings[key] = SampleRing(self.capacity)
+        ring.extend(batch)
+        waiters: list[asyncio.Future] | None = self._waiters.pop(key, None)
+        if waiters:
+            sample: Sample = batch[0]
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(sample)
+
+    async def last(self, device: str, channel: str = "value") -> Sample | None:
+        return self.ring(device, channel).last()
+
+    async def last_n(self, device: str, n: int, channel: str = "value") -> SampleBatch:
+        return self.ring(device, channel).last_n(n, device)
+
+    async def window(
+        self,
+        device: str,
+        seconds: float,
+        channel: str = "value",
+        now: float | None = None,
+    ) -> WindowStats | None:
+        """min/max/mean/count over the last `seconds`, or None if there were no samples"""
+        now = self.now() if now is None else now
+        return self.ring(device, channel).window(now - seconds)
+
+    async def next(self, device: str, channel: str = "value") -> Sample:
+        """Wait for the next sample of a device's channel to arrive"""
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault((device, channel), []).append(waiter)
+        return await waiter
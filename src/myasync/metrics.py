@@ -0,0 +1,348 @@
+import asyncio
+from asyncio import Queue, StreamReader, StreamWriter
+from bisect import bisect_left
+from typing import Callable
+
+from myasync import clock
+from myasync.records import SampleBatch
+
+# Seconds; spans a single chunk through to a batch lingering behind a slow commit
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def format_labels(labels: dict[str, str], extra: str = "") -> str:
+    pairs: list[str] = [
+        key
+        + '="'
+        + value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        + '"'
+        for key, value in labels.items()
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic count. inc() is a plain attribute add, so callers on the hot
+    path count once per batch with n=len(batch) rather than once per sample.
+    With fn, the value is read from fn at scrape time instead.
+    """
+
+    kind: str = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: dict[str, str] | None = None,
+        fn: Callable[[], float] | None = None,
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: dict[str, str] = labels or {}
+        self.value: float = 0
+        self.fn: Callable[[], float] | None = fn
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+    def samples(self) -> list[str]:
+        value: float = self.value if self.fn is None else self.fn()
+        return [f"{self.name}{format_labels(self.labels)} {value}"]
+
+
+class Gauge(Counter):
+    """Value that can go down; queue depths are gauges read with fn at scrape time"""
+
+    kind: str = "gauge"
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """
+    Bucketed distribution. observe() is one bisect and two adds; pass
+    n to record one latency for every sample of a batch at once.
+    """
+
+    kind: str = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: dict[str, str] | None = None,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: dict[str, str] = labels or {}
+        self.buckets: tuple[float, ...] = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)  # last is +Inf
+        self.sum: float = 0.0
+
+    def observe(self, value: float, n: int = 1) -> None:
+        self.counts[bisect_left(self.buckets, value)] += n
+        self.sum += value * n
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self) -> list[str]:
+        lines: list[str] = []
+        cumulative: int = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            le: str = f'le="{bound}"'
+            lines.append(
+                f"{self.name}_bucket{format_labels(self.labels, le)} {cumulative}"
+            )
+        labels: str = format_labels(self.labels)
+        lines.append(f"{self.name}_sum{labels} {self.sum}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+Metric = Counter | Gauge | Histogram
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, list[Metric]] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        family: list[Metric] = self.metrics.setdefault(metric.name, [])
+        if family and family[0].kind != metric.kind:
+            raise ValueError(
+                f"{metric.name} is already registered as a {family[0].kind}"
+            )
+        family.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, **kwargs) -> Counter:
+        return self.register(Counter(name, help, **kwargs))
+
+    def gauge(self, name: str, help: str, **kwargs) -> Gauge:
+        return self.register(Gauge(name, help, **kwargs))
+
+    def histogram(self, name: str, help: str, **kwargs) -> Histogram:
+        return self.register(Histogram(name, help, **kwargs))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for name, family in self.metrics.items():
+            lines.append(f"# HELP {name} {family[0].help}")
+            lines.append(f"# TYPE {name} {family[0].kind}")
+            for metric in family:
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class PipelineMetrics:
+    """
+    The metrics of one arduino_serial_loop pipeline. Stages take an optional
+    PipelineMetrics and record into it; queue depths are registered with
+    watch_queue and read only when scraped.
+    """
+
+    def __init__(
+        self, registry: Registry | None = None, labels: dict[str, str] | None = None
+    ) -> None:
+        self.registry: Registry = Registry() if registry is None else registry
+        self.labels: dict[str, str] = labels or {}
+        r, labels = self.registry, self.labels
+
+        self.samples_read = r.counter(
+            "myasync_samples_read_total", "Samples decoded by the reader", labels=labels
+        )
+        self.lines_rejected = r.counter(
+            "myasync_lines_rejected_total",
+            "Lines from the device that were not samples",
+            labels=labels,
+        )
+        self.read_errors = r.counter(
+            "myasync_read_errors_total", "Errors in the reader", labels=labels
+        )
+        self.read_to_enqueue = r.histogram(
+            "myasync_read_to_enqueue_seconds",
+            "Receive time to db_queue put, per sample",
+            labels=labels,
+        )
+        self.rows_committed = r.counter(
+            "myasync_rows_committed_total",
+            "Rows committed to the database",
+            labels=labels,
+        )
+        self.db_transactions = r.counter(
+            "myasync_db_transactions_total",
+            "Database transactions committed",
+            labels=labels,
+        )
+        self.db_errors = r.counter(
+            "myasync_db_errors_total",
+            "Batches that failed to commit after retries",
+            labels=labels,
+        )
+        self.enqueue_to_commit = r.histogram(
+            "myasync_enqueue_to_commit_seconds",
+            "db_queue put to database commit, per sample",
+            labels=labels,
+        )
+        self.sample_to_commit = r.histogram(
+            "myasync_sample_to_commit_seconds",
+            "Sample timestamp (acquisition time with a ClockAligner) to database "
+            "commit, per sample at its batch's mean timestamp",
+            labels=labels,
+        )
+        self.commands_sent = r.counter(
+            "myasync_commands_sent_total",
+            "Commands written to the device",
+            labels=labels,
+        )
+        self.commands_coalesced = r.counter(
+            "myasync_commands_coalesced_total",
+            "Commands dropped for a newer one with the same key",
+            labels=labels,
+        )
+        self.command_errors = r.counter(
+            "myasync_command_errors_total", "Failed command writes", labels=labels
+        )
+        self.loop_lag = r.histogram(
+            "myasync_loop_lag_seconds",
+            "How late the event loop woke a sleeping task, see LoopLagMonitor",
+            labels=labels,
+        )
+        self.command_latency = r.histogram(
+            "myasync_command_enqueue_to_drain_seconds",
+            "command_queue put to drained serial write, per command",
+            labels=labels,
+        )
+
+    def watch_queue(self, name: str, queue: Queue) -> None:
+        """Export queue depth (and WatermarkQueue/SpoolQueue counts) as read at scrape time"""
+        labels: dict[str, str] = {**self.labels, "queue": name}
+        self.registry.gauge(
+            "myasync_queue_depth",
+            "Items waiting in the queue",
+            labels=labels,
+            fn=queue.qsize,
+        )
+        stats = getattr(queue, "stats", None)
+        if stats is None:
+            return
+        for field, help in (
+            ("dropped_oldest", "Items dropped to make room for newer ones"),
+            ("dropped_newest", "New items dropped because the queue was full"),
+            ("blocked_puts", "Puts that waited for the queue to drain"),
+            ("spilled", "Batches spilled to disk"),
+            ("replayed", "Batches read back from disk"),
+        ):
+            if not hasattr(stats, field):
+                continue
+            self.registry.counter(
+                f"myasync_queue_{field}_total",
+                help,
+                labels=labels,
+                fn=lambda field=field: getattr(stats, field),
+            )
+
+    def batch_enqueued(self, batch: SampleBatch) -> None:
+        """Call right after db_queue.put(batch); stamps the batch for enqueue_to_commit"""
+        batch.enqueued_at = now = clock.now()
+        count: int = len(batch)
+        self.samples_read.inc(count)
+        if batch.rejected:
+            self.lines_rejected.inc(batch.rejected)
+        if count:
+            received_at: float = batch.received_at or batch.timestamps[0]
+            self.read_to_enqueue.observe(now - received_at, count)
+
+    def batches_committed(self, batches: list[SampleBatch]) -> None:
+        now: float = clock.now()
+        self.db_transactions.inc()
+        for batch in batches:
+            count: int = len(batch)
+            self.rows_committed.inc(count)
+            if batch.enqueued_at:
+                self.enqueue_to_commit.observe(now - batch.enqueued_at, count)
+            if count and isinstance(batch, SampleBatch):
+                mean_timestamp: float = sum(batch.timestamps) / count
+                self.sample_to_commit.observe(now - mean_timestamp, count)
+
+
+class LoopLagMonitor:
+    """
+    Sleeps interval seconds at a time and records how much later than asked
+    each wake-up came: time the event loop spent in other callbacks, GC or
+    blocking calls, which is also how long a reader on the loop was delayed.
+    """
+
+    def __init__(self, interval: float = 0.05, histogram: Histogram | None = None):
+        self.interval: float = interval
+        self.histogram: Histogram | None = histogram
+        self.last: float = 0.0
+        self.max: float = 0.0
+        self.count: int = 0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start: float = loop.time()
+            await asyncio.sleep(self.interval)
+            lag: float = max(0.0, loop.time() - start - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.count += 1
+            if self.histogram is not None:
+                self.histogram.observe(lag)
+
+
+async def serve_metrics(
+    registry: Registry, host: str = "127.0.0.1", port: int = 9108
+) -> asyncio.Server:
+    """Serve registry.render() over HTTP on /metrics for Prometheus to scrape"""
+
+    async def handle(reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            request: bytes = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts: list[str] = request.decode("latin-1").split()
+            path: str = parts[1].split("?")[0] if len(parts) > 1 else ""
+            if path in ("/metrics", "/"):
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,194 @@
+import struct
+from array import array
+from dataclasses import dataclass
+
+import zmq
+from zmq.asyncio import Context, Socket
+
+from myasync.eventlog import LOG
+from myasync.records import Sample, SampleBatch
+
+TOPIC_PREFIX: bytes = b"samples/"
+# Header frame: samples in the batch (uint32 LE); columns follow in native byte order
+HEADER: struct.Struct = struct.Struct("<I")
+
+
+def topic(device: str, channel: str = "value") -> bytes:
+    """One topic per device and channel, e.g. b"samples/uno/value" """
+    return TOPIC_PREFIX + f"{device}/{channel}".encode("utf-8")
+
+
+def parse_topic(frame: bytes) -> tuple[str, str]:
+    device, _, channel = frame[len(TOPIC_PREFIX) :].decode("utf-8").rpartition("/")
+    return device, channel
+
+
+def unpack_published(frames: list[bytes]) -> SampleBatch:
+    """Rebuild the SampleBatch of one published message"""
+    device, _ = parse_topic(frames[0])
+    (count,) = HEADER.unpack(frames[1])
+    batch = SampleBatch(device)
+    columns: tuple[array, ...] = (batch.timestamps, batch.intervals, batch.values)
+    for column, frame in zip(columns, frames[2:5]):
+        column.frombytes(frame)
+    lengths: set[int] = {len(column) for column in columns}
+    if lengths != {count}:
+        raise ValueError(f"published batch claims {count} samples, has {lengths}")
+    return batch
+
+
+@dataclass
+class PublisherStats:
+    messages: int = 0
+    samples: int = 0
+    errors: int = 0
+
+
+class SamplePublisher:
+    """
+    Publishes every SampleBatch the readers queue on a PUB socket, one
+    multipart message per batch: topic, sample count, then the timestamp,
+    interval and value arrays as they are, sent with copy=False so large
+    batches go out without copying (pyzmq still copies frames under its
+    copy_threshold, where that is cheaper). The arrays must not be resized
+    after publishing, which SampleBatches on their way to the database are not.
+
+    Sends are NOBLOCK on a plain (not asyncio) PUB socket: ZMQ drops
+    messages for a subscriber whose send_hwm queue is full, so a slow
+    subscriber loses messages instead of slowing the serial reader down.
+    """
+
+    def __init__(self, socket: zmq.Socket, channel: str = "value") -> None:
+        self.socket: zmq.Socket = socket
+        self.channel: str = channel
+        self.stats: PublisherStats = PublisherStats()
+        self._topics: dict[str, bytes] = {}
+
+    @classmethod
+    def bind(
+        cls,
+        endpoint: str,
+        context: zmq.Context | None = None,
+        send_hwm: int = 1000,
+    ) -> "SamplePublisher":
+        context = zmq.Context.instance() if context is None else context
+        socket: zmq.Socket = context.socket(zmq.PUB)
+        socket.setsockopt(zmq.SNDHWM, send_hwm)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(endpoint)
+        return cls(socket)
+
+    def update(self, batch: SampleBatch) -> None:
+        if not batch:
+            return
+        name: bytes | None = self._topics.get(batch.device)
+        if name is None:
+            name = self._topics[batch.device] = topic(batch.device, self.channel)
+        try:
+            self.socket.send_multipart(
+                [
+                    name,
+                    HEADER.pack(len(batch)),
+                    batch.timestamps,
+                    batch.intervals,
+                    batch.values,
+                ],
+                flags=zmq.NOBLOCK,
+                copy=False,
+            )
+        except zmq.ZMQError as e:
+            self.stats.errors += 1
+            LOG.log(
+                "publish", "Error publishing samples", error=e, errors=self.stats.errors
+            )
+            return
+        self.stats.messages += 1
+        self.stats.samples += len(batch)
+
+    def close(self) -> None:
+        self.socket.close(linger=0)
+
+
+@dataclass
+class SubscriberStats:
+    wakeups: int = 0
+    received: int = 0  # messages
+    conflated: int = 0  # messages superseded by a newer one for the same topic
+    malformed: int = 0
+
+
+class SampleSubscriber:
+    """
+    Receives published batches from a SUB socket. Each receive() drains
+    every message already queued (NOBLOCK until zmq.Again), like
+    ZmqSerialBridge; with conflate=True only the newest sample per topic
+    is kept, so a consumer that wants the current value stays current no
+    matter how far behind it fell. (ZMQ's own CONFLATE option cannot be
+    used: it does not support multipart messages and is not per topic.)
+    """
+
+    def __init__(
+        self, socket: Socket, conflate: bool = False, max_messages: int = 10_000
+    ) -> None:
+        self.socket: Socket = socket
+        self.conflate: bool = conflate
+        # Per receive(), so a backlog cannot starve the event loop
+        self.max_messages: int = max_messages
+        self.stats: SubscriberStats = SubscriberStats()
+
+    @classmethod
+    def connect(
+        cls,
+        endpoint: str,
+        context: Context,
+        devices: list[str] | None = None,
+        conflate: bool = False,
+    ) -> "SampleSubscriber":
+        """Subscribe to the given devices' samples, or to every device"""
+        socket: Socket = context.socket(zmq.SUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(endpoint)
+        for prefix in (
+            [TOPIC_PREFIX]
+            if devices is None
+            else [TOPIC_PREFIX + f"{device}/".encode("utf-8") for device in devices]
+        ):
+            socket.setsockopt(zmq.SUBSCRIBE, prefix)
+        return cls(socket, conflate)
+
+    async def receive(self) -> list[SampleBatch]:
+        """
+        Wait for messages and return their batches in arrival order; with
+        conflate, one single-sample batch per topic holding its newest sample
+        """
+        messages: list[list[bytes]] = [await self.socket.recv_multipart()]
+        while len(messages) < self.max_messages:
+            try:
+                messages.append(await self.socket.recv_multipart(flags=zmq.NOBLOCK))
+            except zmq.Again:
+                break
+        self.stats.wakeups += 1
+        self.stats.received += len(messages)
+
+        batches: list[SampleBatch] = []
+        for frames in messages:
+            try:
+                batches.append(unpack_published(frames))
+            except (ValueError, struct.error, IndexError):
+                self.stats.malformed += 1
+        if not self.conflate:
+            return batches
+
+        latest: dict[str, Sample] = {}
+        for batch in batches:
+            latest[batch.device] = batch[-1]
+        self.stats.conflated += len(batches) - len(latest)
+        conflated: list[SampleBatch] = []
+        for device, sample in latest.items():
+            batch = SampleBatch(device)
+            batch.append(sample.timestamp, sample.interval, sample.value)
+            conflated.append(batch)
+        return conflated
+
+    def close(self) -> None:
+        self.socket.close(linger=0)
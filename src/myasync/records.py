@@ -0,0 +1,127 @@
+import json
+from array import array
+from typing import Iterable, Iterator
+
+from myasync import clock
+
+
+class Sample:
+    """One decoded sensor reading"""
+
+    __slots__ = ("timestamp", "interval", "value")
+
+    def __init__(self, timestamp: float, interval: int, value: float) -> None:
+        self.timestamp: float = timestamp
+        self.interval: int = interval
+        self.value: float = value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sample):
+            return NotImplemented
+        return (self.timestamp, self.interval, self.value) == (
+            other.timestamp,
+            other.interval,
+            other.value,
+        )
+
+    def __repr__(self) -> str:
+        return f"Sample(timestamp={self.timestamp!r}, interval={self.interval!r}, value={self.value!r})"
+
+
+def parse_sample_line(line: bytes | str) -> tuple[int, float] | None:
+    """Decode one `{"interval": ..., "value": ...}` line, or None if it is not a sample"""
+    try:
+        response = json.loads(line)
+        return int(response["interval"]), float(response["value"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class SampleBatch:
+    """
+    Columnar batch of samples from one device.
+    Timestamps, intervals and values live in typed array buffers, so a
+    buffered sample costs 24 bytes instead of a str or dict plus its boxed
+    numbers. Queues and sinks move whole batches.
+    """
+
+    __slots__ = (
+        "device",
+        "timestamps",
+        "intervals",
+        "values",
+        "rejected",
+        "enqueued_at",
+        "received_at",
+        "spool_position",
+    )
+
+    def __init__(self, device: str = "") -> None:
+        self.device: str = device
+        self.timestamps: array = array("d")
+        self.intervals: array = array("q")
+        self.values: array = array("d")
+        self.rejected: int = 0  # lines that did not decode to a sample
+        self.enqueued_at: float = 0.0  # set when metrics are on, see PipelineMetrics
+        # First receive time once timestamps are acquisition times, see ClockAligner
+        self.received_at: float = 0.0
+        # Set on batches read back from disk, see myasync.spool.SpoolQueue
+        self.spool_position: tuple[str, int, int] | None = None
+
+    @classmethod
+    def from_lines(
+        cls,
+        lines: Iterable[bytes | str],
+        timestamp: float | None = None,
+        device: str = "",
+    ) -> "SampleBatch":
+        """Decode device lines received together, stamping them all with one time"""
+        batch = cls(device)
+        received_at: float = clock.now() if timestamp is None else timestamp
+        for line in lines:
+            batch.append_line(line, received_at)
+        return batch
+
+    def append(self, timestamp: float, interval: int, value: float) -> None:
+        self.timestamps.append(timestamp)
+        self.intervals.append(interval)
+        self.values.append(value)
+
+    def append_line(self, line: bytes | str, timestamp: float) -> bool:
+        """Decode and append one line; returns False (and counts it) if it is not a sample"""
+        sample = parse_sample_line(line)
+        if sample is None:
+            self.rejected += 1
+            return False
+        self.append(timestamp, sample[0], sample[1])
+        return True
+
+    def extend(self, other: "SampleBatch") -> None:
+        self.timestamps.extend(other.timestamps)
+        self.intervals.extend(other.intervals)
+        self.values.extend(other.values)
+        self.rejected += other.rejected
+
+    def rows(self) -> Iterator[tuple[float, int, float]]:
+        return zip(self.timestamps, self.intervals, self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the array buffers"""
+        return sum(
+            column.buffer_info()[1] * column.itemsize
+            for column in (self.timestamps, self.intervals, self.values)
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> Sample:
+        return Sample(self.timestamps[index], self.intervals[index], self.values[index])
+
+    def __iter__(self) -> Iterator[Sample]:
+        for timestamp, interval, value in self.rows():
+            yield Sample(timestamp, interval, value)
+
+    def __repr__(self) -> str:
+        return f"SampleBatch(device={self.device!r}, samples={len(self)})"
@@ -0,0 +1,23 @@
+import json
+import math
+from typing import Iterator
+
+
+def sine_wave_value(interval: int, intervals: int = 20) -> float:
+    """
+    Return floats between 19.0 and 21.0 using a sine function.
+    Full cycle is split into `intervals` intervals.
+    """
+    angle: float = (2 * math.pi * (interval % intervals)) / intervals
+    return 20.0 + math.sin(angle)
+
+
+def sample_line(interval: int) -> bytes:
+    """One device sample encoded the way the Arduino sends it"""
+    response = {"interval": interval, "value": sine_wave_value(interval)}
+    return (json.dumps(response) + "\r\n").encode()
+
+
+def sample_lines(count: int, start: int = 0) -> Iterator[bytes]:
+    for interval in range(start, start + count):
+        yield sample_line(interval)
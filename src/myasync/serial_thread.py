@@ -0,0 +1,276 @@
+import asyncio
+import contextlib
+import queue
+import threading
+from asyncio import AbstractEventLoop, StreamWriter
+from typing import TYPE_CHECKING
+
+from myasync import clock
+from myasync.capture import CaptureWriter
+from myasync.framing import FramingStats, LineFramingProtocol, split_lines
+
+if TYPE_CHECKING:
+    import serial
+
+
+class SerialThreadTransport(asyncio.Transport):
+    """
+    Serial transport whose reads happen on a dedicated thread, so a busy or
+    stalled event loop cannot delay them. The reader thread blocks in large
+    pyserial reads, splits complete lines off with split_lines and stamps
+    them with the time they were read. Finished lines are handed to the
+    protocol's lines_received on the loop with call_soon_threadsafe, one
+    wake-up for everything read since the loop last caught up. The reader
+    counts into its own FramingStats and the counts travel with the lines,
+    so the protocol's stats are only ever touched on the loop.
+
+    Writes are queued to a second thread; get_write_buffer_size() and the
+    protocol's pause_writing/resume_writing work as for any transport, so
+    StreamWriter.drain() applies backpressure.
+    """
+
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        protocol: LineFramingProtocol,
+        port: "serial.SerialBase",
+        read_size: int = 1 << 16,
+        capture: CaptureWriter | None = None,
+    ) -> None:
+        super().__init__()
+        self._loop: AbstractEventLoop = loop
+        self._protocol: LineFramingProtocol = protocol
+        self._serial: "serial.SerialBase" = port
+        self._read_size: int = read_size
+        self._capture: CaptureWriter | None = capture
+        self._closing: bool = False
+        self._reading: threading.Event = threading.Event()
+        self._reading.set()
+
+        # Lines read but not yet delivered, and whether a delivery is scheduled
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: list[tuple[float, list[bytes], FramingStats]] = []
+        self._scheduled: bool = False
+
+        self._writes: queue.SimpleQueue[bytes | None] = queue.SimpleQueue()
+        self._write_buffered: int = 0
+        self._high_water: int = 1 << 16
+        self._low_water: int = 1 << 14
+        self._protocol_paused: bool = False
+
+        name: str = port.name or port.port or "serial"
+        self._reader: threading.Thread = threading.Thread(
+            target=self._read_loop, name=f"serial-reader {name}", daemon=True
+        )
+        self._writer: threading.Thread = threading.Thread(
+            target=self._write_loop, name=f"serial-writer {name}", daemon=True
+        )
+
+    def start(self) -> None:
+        self._protocol.connection_made(self)
+        self._writer.start()
+        self._reader.start()
+
+    # Reader thread
+
+    def _read_loop(self) -> None:
+        import serial
+
+        port: serial.SerialBase = self._serial
+        buffer: bytearray = bytearray()
+        # Counted since the last hand-over; also holds split_lines' overrun state
+        counts: FramingStats = FramingStats()
+        max_line_length: int = self._protocol.max_line_length
+        exc: Exception | None = None
+        try:
+            while not self._closing:
+                if not self._reading.is_set():
+                    self._reading.wait(0.1)
+                    continue
+                # Block for the first byte, then take everything already waiting
+                data: bytes = port.read(max(1, min(port.in_waiting, self._read_size)))
+                if not data:
+                    continue
+                received_at: float = clock.now()
+                if self._capture is not None:
+                    self._capture.record(data)
+                counts.chunks += 1
+                counts.bytes += len(data)
+                buffer += data
+                lines: list[bytes] = split_lines(buffer, max_line_length, counts)
+                if lines:
+                    self._hand_over(received_at, lines, counts)
+                    counts = FramingStats(discarding=counts.discarding)
+        except (serial.SerialException, OSError) as e:
+            if not self._closing:
+                exc = e
+        finally:
+            self._closing = True
+            self._writes.put(None)
+            self._writer.join()
+            port.close()
+            # Counts of a trailing partial line go out with connection_lost
+            with self._lock:
+                self._pending.append((clock.now(), [], counts))
+            # The loop may already be gone if it was closed before the port
+            with contextlib.suppress(RuntimeError):
+                self._loop.call_soon_threadsafe(self._connection_lost, exc)
+
+    def _hand_over(
+        self, received_at: float, lines: list[bytes], counts: FramingStats
+    ) -> None:
+        with self._lock:
+            self._pending.append((received_at, lines, counts))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._deliver)
+
+    # Writer thread
+
+    def _write_loop(self) -> None:
+        import serial
+
+        while (data := self._writes.get()) is not None:
+            try:
+                self._serial.write(data)
+            except (serial.SerialException, OSError) as e:
+                with contextlib.suppress(RuntimeError):
+                    self._loop.call_soon_threadsafe(self._fatal_error, e)
+                return
+            finally:
+                with self._lock:
+                    self._write_buffered -= len(data)
+                    drained: bool = self._write_buffered <= self._low_water
+            if drained and self._protocol_paused:
+                with contextlib.suppress(RuntimeError):
+                    self._loop.call_soon_threadsafe(self._maybe_resume_protocol)
+
+    # Event loop thread
+
+    def _deliver(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._scheduled = False
+        stats: FramingStats = self._protocol.stats
+        for received_at, lines, counts in pending:
+            stats.chunks += counts.chunks
+            stats.bytes += counts.bytes
+            stats.lines += counts.lines
+            stats.batches += counts.batches
+            stats.overruns += counts.overruns
+            if lines:
+                self._protocol.lines_received(lines, received_at)
+
+    def _connection_lost(self, exc: Exception | None) -> None:
+        self._deliver()
+        self._protocol.connection_lost(exc)
+
+    def _fatal_error(self, exc: Exception) -> None:
+        print(f"Serial write failed: {exc}")
+        self.close()
+
+    def _maybe_resume_protocol(self) -> None:
+        if self._protocol_paused and self.get_write_buffer_size() <= self._low_water:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+
+    def write(self, data: bytes | bytearray | memoryview) -> None:
+        if self._closing:
+            return
+        data = bytes(data)
+        if not data:
+            return
+        with self._lock:
+            self._write_buffered += len(data)
+        self._writes.put(data)
+        if (
+            not self._protocol_paused
+            and self.get_write_buffer_size() > self._high_water
+        ):
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def get_write_buffer_size(self) -> int:
+        return self._write_buffered
+
+    def get_write_buffer_limits(self) -> tuple[int, int]:
+        return self._low_water, self._high_water
+
+    def set_write_buffer_limits(
+        self, high: int | None = None, low: int | None = None
+    ) -> None:
+        self._high_water = 1 << 16 if high is None else high
+        self._low_water = self._high_water // 4 if low is None else low
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def pause_reading(self) -> None:
+        self._reading.clear()
+
+    def resume_reading(self) -> None:
+        self._reading.set()
+
+    def is_reading(self) -> bool:
+        return self._reading.is_set()
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self) -> None:
+        """Stop both threads; queued writes are sent first, then the port closes"""
+        if self._closing:
+            return
+        self._closing = True
+        self._reading.set()
+        with contextlib.suppress(Exception):
+            self._serial.cancel_read()
+
+    def abort(self) -> None:
+        self.close()
+
+    def get_extra_info(self, name: str, default=None):
+        if name == "serial":
+            return self._serial
+        return super().get_extra_info(name, default)
+
+
+def _close_late_port(opening: asyncio.Future) -> None:
+    if not opening.cancelled() and opening.exception() is None:
+        opening.result().close()
+
+
+async def open_threaded_serial_connection(
+    url: str,
+    baudrate: int = 115200,
+    max_line_length: int = 4096,
+    capture: CaptureWriter | None = None,
+    read_size: int = 1 << 16,
+    **kwargs,
+) -> tuple[LineFramingProtocol, StreamWriter]:
+    """
+    Like open_framed_serial_connection, but the port is read and written by
+    its own threads through a SerialThreadTransport
+    """
+    import serial
+
+    loop = asyncio.get_running_loop()
+    # The read timeout only bounds how long close() can take without cancel_read
+    opening: asyncio.Future = asyncio.ensure_future(
+        asyncio.to_thread(
+            serial.serial_for_url, url, baudrate=baudrate, timeout=0.1, **kwargs
+        )
+    )
+    try:
+        port: serial.SerialBase = await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        # The opening thread cannot be stopped; close the port if it opens
+        # after all, or it stays busy for the next attempt
+        opening.add_done_callback(_close_late_port)
+        raise
+    protocol = LineFramingProtocol(max_line_length)
+    transport = SerialThreadTransport(loop, protocol, port, read_size, capture)
+    transport.start()
+    writer: StreamWriter = StreamWriter(transport, protocol, None, loop)
+    return protocol, writer
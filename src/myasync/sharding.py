@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from asyncio import AbstractEventLoop, Queue, QueueFull, Task
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.context import SpawnProcess
+from typing import Callable
+
+from myasync.arduino_serial_loop import backoff_delay
+from myasync.db_writer import SQLiteSink, collect_batch, write_batches_to_database
+from myasync.records import SampleBatch
+from myasync.spool import pack_batch, unpack_batch
+from myasync.supervisor import PortConfig, SerialSupervisor, load_port_configs
+
+# Workers are spawned rather than forked: the parent runs threads (the
+# SQLite writer, queue feeders) that a fork would copy mid-flight
+CONTEXT = multiprocessing.get_context("spawn")
+# Seconds a receiver waits for a worker's batches before checking it is alive
+LIVENESS_INTERVAL: float = 0.5
+
+
+def shard_ports(ports: list[PortConfig], workers: int) -> list[list[PortConfig]]:
+    """Deal ports round-robin onto at most `workers` non-empty shards"""
+    shards: list[list[PortConfig]] = [[] for _ in range(min(workers, len(ports)))]
+    for i, port in enumerate(ports):
+        shards[i % len(shards)].append(port)
+    return shards
+
+
+@dataclass
+class ShardStats:
+    batches: int = 0  # SampleBatches received from the worker
+    samples: int = 0
+    messages: int = 0  # multiprocessing queue items, each a list of packed batches
+    restarts: int = 0  # workers that died without stopping and were started again
+
+
+async def ship_batches(
+    db_queue: Queue,
+    batches: multiprocessing.Queue,
+    max_batch_size: int = 5000,
+    max_linger: float = 0.02,
+) -> None:
+    """
+    Worker side: send what the pipeline queues for the database to the writer
+    process, as one list of packed SampleBatches per queue put so pickling
+    and the queue's pipe write are paid per group, not per batch
+    """
+    while True:
+        group: list[SampleBatch] = []
+        try:
+            await collect_batch(
+                db_queue, max_batch_size, max_linger, size=len, into=group
+            )
+        except asyncio.CancelledError:
+            # Batches taken before the cancel go out ahead of _run_worker's leftovers
+            if group:
+                batches.put([pack_batch(batch, time.time()) for batch in group])
+                for _ in group:
+                    db_queue.task_done()
+            raise
+        now: float = time.time()
+        packed: list[bytes] = [pack_batch(batch, now) for batch in group]
+        try:
+            # Blocks while the writer is behind, which backs up into db_queue
+            await asyncio.to_thread(batches.put, packed)
+        finally:
+            for _ in group:
+                db_queue.task_done()
+
+
+def _forward_commands(
+    commands: multiprocessing.Queue,
+    loop: AbstractEventLoop,
+    command_queues: dict[str, Queue],
+    stopped: asyncio.Future,
+) -> None:
+    """Worker thread: hand (port name, command) pairs to the owning pipeline until None"""
+    while (item := commands.get()) is not None:
+        name, command = item
+        loop.call_soon_threadsafe(command_queues[name].put_nowait, command)
+    loop.call_soon_threadsafe(stopped.set_result, None)
+
+
+async def _run_worker(
+    ports: list[PortConfig],
+    batches: multiprocessing.Queue,
+    commands: multiprocessing.Queue,
+    threaded: bool,
+    queue_size: int,
+) -> None:
+    loop = asyncio.get_running_loop()
+    db_queue: Queue = Queue(maxsize=queue_size)
+    supervisor = SerialSupervisor(ports, db_queue, threaded=threaded)
+    stopped: asyncio.Future = loop.create_future()
+    threading.Thread(
+        target=_forward_commands,
+        args=(commands, loop, supervisor.command_queues, stopped),
+        name="shard-commands",
+        daemon=True,
+    ).start()
+
+    tasks: list[Task] = [
+        asyncio.create_task(supervisor.run()),
+        asyncio.create_task(ship_batches(db_queue, batches)),
+    ]
+    try:
+        await stopped
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Whatever the pipeline queued before stopping still goes to the writer
+        leftovers: list[bytes] = []
+        while not db_queue.empty():
+            leftovers.append(pack_batch(db_queue.get_nowait(), time.time()))
+        if leftovers:
+            batches.put(leftovers)
+        batches.put(None)
+
+
+def run_worker(
+    ports: list[PortConfig],
+    batches: multiprocessing.Queue,
+    commands: multiprocessing.Queue,
+    threaded: bool = False,
+    queue_size: int = 1000,
+) -> None:
+    """Entry point of one worker process: supervise its shard of ports"""
+    asyncio.run(_run_worker(ports, batches, commands, threaded, queue_size))
+
+
+class ShardedPipeline:
+    """
+    Runs the serial ports across several worker processes so JSON decoding
+    and per-port work use more than one core. Each worker runs a
+    SerialSupervisor over its shard of ports and ships packed SampleBatches
+    back over a multiprocessing queue; this process unpacks them into one
+    db_queue and is the only writer to the database. Commands for a port are
+    forwarded to the worker that owns it with send_command(). A worker
+    that dies without being stopped is started again after a backoff;
+    commands for its ports are held until the replacement is started, up to
+    max_pending_commands per shard.
+    """
+
+    def __init__(
+        self,
+        ports: list[PortConfig],
+        workers: int | None = None,
+        threaded: bool = False,
+        queue_size: int = 1000,
+        transfer_size: int = 64,
+        max_pending_commands: int = 100,
+        restart_delay: Callable[[int], float] = backoff_delay,
+    ) -> None:
+        self.shards: list[list[PortConfig]] = shard_ports(
+            ports, workers or os.cpu_count() or 1
+        )
+        self.threaded: bool = threaded
+        self.queue_size: int = queue_size
+        self.transfer_size: int = transfer_size
+        self.max_pending_commands: int = max_pending_commands
+        self.restart_delay: Callable[[int], float] = restart_delay
+        self.db_queue: Queue = Queue(maxsize=queue_size)
+        self.stats: list[ShardStats] = [ShardStats() for _ in self.shards]
+        # Bounded, so a slow database backs up into the workers' own db_queues
+        self._batches: list[multiprocessing.Queue] = [
+            CONTEXT.Queue(maxsize=transfer_size) for _ in self.shards
+        ]
+        self._commands: list[multiprocessing.Queue] = [
+            CONTEXT.Queue() for _ in self.shards
+        ]
+        self.owner: dict[str, int] = {
+            port.name: index
+            for index, shard in enumerate(self.shards)
+            for port in shard
+        }
+        # One slot per shard, filled as its worker starts
+        self.processes: list[SpawnProcess | None] = []
+        self._receivers: list[asyncio.Future | None] = []
+        # True while a shard's worker is dead and waiting to be started again
+        self.restarting: list[bool] = [False for _ in self.shards]
+        self._pending: list[deque[tuple[str, str | dict]]] = [
+            deque() for _ in self.shards
+        ]
+
+    def send_command(self, port: str, command: str | dict) -> None:
+        """
+        Queue a command for the named port in the worker that owns it. Raises
+        QueueFull if that worker is restarting and already holds
+        max_pending_commands.
+        """
+        index: int = self.owner[port]
+        process: SpawnProcess | None = self.processes[index] if self.processes else None
+        # A dead worker's queue is about to be replaced, so don't wait for
+        # _run_shard to notice: the command would be lost with it
+        if not self.restarting[index] and (process is None or process.is_alive()):
+            self._commands[index].put((port, command))
+            return
+        pending: deque[tuple[str, str | dict]] = self._pending[index]
+        if len(pending) >= self.max_pending_commands:
+            raise QueueFull(
+                f"shard-{index} is restarting and already holds {len(pending)} commands"
+            )
+        pending.append((port, command))
+
+    def _receive(
+        self,
+        index: int,
+        process: SpawnProcess,
+        loop: AbstractEventLoop,
+        done: asyncio.Future,
+    ) -> None:
+        """
+        Thread per worker: unpack its batches onto db_queue until it sends
+        None. Resolves done with True then, or with False once the worker
+        has died without it.
+        """
+        stats: ShardStats = self.stats[index]
+        stopped: bool = False
+        try:
+            while True:
+                alive: bool = process.is_alive()
+                try:
+                    packed = self._batches[index].get(timeout=LIVENESS_INTERVAL)
+                except queue.Empty:
+                    if alive:
+                        continue
+                    # Dead before the wait, so all it had sent has been read
+                    break
+                if packed is None:
+                    stopped = True
+                    break
+                stats.messages += 1
+                for payload in packed:
+                    batch: SampleBatch = unpack_batch(payload)
+                    stats.batches += 1
+                    stats.samples += len(batch)
+                    # Waits while db_queue is full, so backpressure reaches the worker
+                    asyncio.run_coroutine_threadsafe(
+                        self.db_queue.put(batch), loop
+                    ).result()
+        finally:
+            # The loop may be gone if run() was abandoned without _stop
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(done.set_result, stopped)
+
+    def _start_worker(self, index: int, loop: AbstractEventLoop) -> None:
+        process: SpawnProcess = CONTEXT.Process(
+            target=run_worker,
+            args=(
+                self.shards[index],
+                self._batches[index],
+                self._commands[index],
+                self.threaded,
+                self.queue_size,
+            ),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        # A plain daemon thread rather than the default executor, which
+        # asyncio.run would wait for if the worker hangs
+        done: asyncio.Future = loop.create_future()
+        threading.Thread(
+            target=self._receive,
+            args=(index, process, loop, done),
+            name=f"shard-{index}-receiver",
+            daemon=True,
+        ).start()
+        self.processes[index] = process
+        self._receivers[index] = done
+
+    async def _run_shard(self, index: int) -> None:
+        """Keep shard `index` running: restart its worker whenever it dies"""
+        loop = asyncio.get_running_loop()
+        stats: ShardStats = self.stats[index]
+        attempt: int = 0
+        while True:
+            messages: int = stats.messages
+            self._start_worker(index, loop)
+            # Shielded so cancelling run() leaves the future for _stop to await
+            if await asyncio.shield(self._receivers[index]):
+                return
+            self.restarting[index] = True
+            process: SpawnProcess = self.processes[index]
+            if process.is_alive():
+                # The receiver failed rather than the worker; don't run two
+                process.terminate()
+                await asyncio.to_thread(process.join, 1.0)
+            if stats.messages > messages:
+                attempt = 0
+            delay: float = self.restart_delay(attempt)
+            attempt += 1
+            stats.restarts += 1
+            print(
+                f"shard-{index} worker died (exit code {process.exitcode}), "
+                f"restarting in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+            # A worker killed mid-put can leave its queues locked or torn
+            self._batches[index] = CONTEXT.Queue(maxsize=self.transfer_size)
+            self._commands[index] = CONTEXT.Queue()
+            while self._pending[index]:
+                self._commands[index].put(self._pending[index].popleft())
+            self.restarting[index] = False
+
+    async def run(self) -> None:
+        """Start the workers and feed db_queue from them until cancelled"""
+        self.processes = [None] * len(self.shards)
+        self._receivers = [None] * len(self.shards)
+        shards: list[Task] = [
+            asyncio.create_task(self._run_shard(index))
+            for index in range(len(self.shards))
+        ]
+        try:
+            await asyncio.gather(*shards)
+        finally:
+            for shard in shards:
+                shard.cancel()
+            await asyncio.gather(*shards, return_exceptions=True)
+            await self._stop()
+
+    async def _stop(self) -> None:
+        for commands in self._commands:
+            commands.put(None)
+        # Workers flush and send None; keep receiving until they have
+        # Shards cancelled before they started have neither
+        receivers: list[asyncio.Future] = [r for r in self._receivers if r is not None]
+        try:
+            async with asyncio.timeout(5.0):
+                await asyncio.gather(*receivers, return_exceptions=True)
+        except TimeoutError:
+            print("Shard workers did not stop in time, terminating them")
+        for process in filter(None, self.processes):
+            await asyncio.to_thread(process.join, 1.0)
+            if process.is_alive():
+                process.terminate()
+
+    def format_stats(self) -> str:
+        return "\n".join(
+            f"shard-{index} ({len(shard)} ports): samples={stats.samples} "
+            f"batches={stats.batches} messages={stats.messages} restarts={stats.restarts}"
+            for index, (shard, stats) in enumerate(zip(self.shards, self.stats))
+        )
+
+
+async def main(
+    config_path: str, workers: int | None = None, db_path: str = "readings.db"
+) -> None:
+    pipeline = ShardedPipeline(load_port_configs(config_path), workers)
+    sink: SQLiteSink = SQLiteSink(db_path)
+    tasks: list[Task] = [
+        asyncio.create_task(pipeline.run()),
+        asyncio.create_task(write_batches_to_database(pipeline.db_queue, sink)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await sink.close()
+        print(pipeline.format_stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Supervise many Arduinos across several worker processes"
+    )
+    parser.add_argument(
+        "config", help='JSON file: {"ports": [{"url": "/dev/ttyACM0"}]}'
+    )
+    parser.add_argument("--workers", type=int, default=None, help="default: CPU count")
+    parser.add_argument("--db", default="readings.db")
+    args = parser.parse_args()
+    asyncio.run(main(args.config, args.workers, args.db))
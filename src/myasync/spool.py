@@ -0,0 +1,255 @@
+import os
+import struct
+import time
+import zlib
+from asyncio import Queue
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple
+
+from myasync.records import SampleBatch
+
+SEGMENT_SUFFIX: str = ".seg"
+# Record: payload length (uint32) | CRC-32 of payload (uint32) | payload
+RECORD: struct.Struct = struct.Struct("<II")
+# Payload: device name length (uint16) | samples (uint32) | spilled at (float64)
+# | device name | timestamps | intervals | values, arrays in native byte order
+BATCH: struct.Struct = struct.Struct("<HId")
+
+
+class SpoolPosition(NamedTuple):
+    """Where a spooled batch ends; committing it means everything before it is done"""
+
+    spool: str
+    segment: int
+    offset: int
+
+
+def pack_batch(batch: SampleBatch, spilled_at: float) -> bytes:
+    device: bytes = batch.device.encode("utf-8")
+    return b"".join(
+        (
+            BATCH.pack(len(device), len(batch), spilled_at),
+            device,
+            batch.timestamps.tobytes(),
+            batch.intervals.tobytes(),
+            batch.values.tobytes(),
+        )
+    )
+
+
+def unpack_batch(payload: bytes) -> SampleBatch:
+    device_length, count, spilled_at = BATCH.unpack_from(payload)
+    offset: int = BATCH.size
+    batch = SampleBatch(payload[offset : offset + device_length].decode("utf-8"))
+    offset += device_length
+    for column in (batch.timestamps, batch.intervals, batch.values):
+        end: int = offset + count * column.itemsize
+        column.frombytes(payload[offset:end])
+        offset = end
+    batch.enqueued_at = spilled_at
+    return batch
+
+
+def read_records(path: Path, offset: int) -> Iterator[tuple[bytes, int]]:
+    """(payload, offset after it) for each intact record; stops at a torn or corrupt one"""
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while True:
+            header: bytes = file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            length, crc = RECORD.unpack(header)
+            payload: bytes = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset += RECORD.size + length
+            yield payload, offset
+
+
+@dataclass
+class SpoolStats:
+    spilled: int = 0  # batches written to disk
+    spilled_bytes: int = 0
+    replayed: int = 0  # batches read back from disk
+    segments_created: int = 0
+    segments_removed: int = 0
+
+
+class SpoolQueue(Queue):
+    """
+    Unbounded db_queue that keeps at most memory_size batches in memory and
+    spills the rest to append-only segment files in `directory`.
+
+    Once anything is spilled, later batches are spilled too until the disk
+    backlog drains, so batches still come out in the order they went in.
+    put() never blocks and nothing is dropped; a stalled database costs disk
+    space instead. Batches read back from disk carry a SpoolPosition that
+    SQLiteSink commits in the same transaction as their rows, so restarting
+    with start=await sink.spool_position(name) resumes exactly after the
+    last committed batch. Segments are deleted once everything in them has
+    been committed (task_done). Batches only ever held in memory are lost on
+    a crash, as with any asyncio.Queue.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        memory_size: int = 1000,
+        name: str = "db",
+        start: SpoolPosition | tuple[str, int, int] | None = None,
+        segment_bytes: int = 16 * 1024 * 1024,
+        fsync: bool = False,
+    ) -> None:
+        super().__init__()  # unbounded: only the in-memory part is limited
+        self.directory: Path = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_size: int = memory_size
+        self.name: str = name
+        self.segment_bytes: int = segment_bytes
+        self.fsync: bool = fsync
+        self.stats: SpoolStats = SpoolStats()
+
+        segments: list[int] = self._segments()
+        self._read_segment: int = segments[0] if segments else 1
+        self._read_offset: int = 0
+        if start is not None:
+            _, segment, offset = start
+            if segment in segments:
+                self._read_segment, self._read_offset = segment, offset
+            else:
+                later: list[int] = [s for s in segments if s > segment]
+                self._read_segment = later[0] if later else segment + 1
+        for segment in segments:
+            if segment < self._read_segment:
+                self._remove(segment)
+
+        # Count what the last run left behind; new records go to a new segment
+        self._spooled: int = sum(
+            1
+            for segment in self._segments()
+            for _ in read_records(
+                self._path(segment),
+                self._read_offset if segment == self._read_segment else 0,
+            )
+        )
+        if self._spooled:
+            # Leftovers are unfinished tasks too, so join() waits for them
+            self._unfinished_tasks += self._spooled
+            self._finished.clear()
+        self._oldest_segment: int = self._read_segment
+        self._reader: Iterator[tuple[bytes, int]] | None = None
+        self._write_segment: int = max(max(segments, default=0) + 1, self._read_segment)
+        self._write_offset: int = 0
+        self._writer: BinaryIO | None = None
+        self._in_flight: deque[SpoolPosition | None] = deque()
+
+    @property
+    def spooled(self) -> int:
+        """Batches waiting on disk"""
+        return self._spooled
+
+    def qsize(self) -> int:
+        return len(self._queue) + self._spooled
+
+    def empty(self) -> bool:
+        return not self._queue and not self._spooled
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / f"{segment:012d}{SEGMENT_SUFFIX}"
+
+    def _segments(self) -> list[int]:
+        return sorted(
+            int(path.stem)
+            for path in self.directory.glob(f"*{SEGMENT_SUFFIX}")
+            if path.stem.isdigit()
+        )
+
+    def _remove(self, segment: int) -> None:
+        try:
+            self._path(segment).unlink()
+            self.stats.segments_removed += 1
+        except FileNotFoundError:
+            pass
+
+    def _put(self, item: SampleBatch) -> None:
+        # A batch replayed from disk that failed to commit goes back to disk
+        if (
+            self._spooled
+            or item.spool_position is not None
+            or len(self._queue) >= self.memory_size
+        ):
+            self._spill(item)
+        else:
+            self._queue.append(item)
+
+    def _spill(self, batch: SampleBatch) -> None:
+        payload: bytes = pack_batch(batch, time.time())
+        record: bytes = RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+        if self._writer is not None and (
+            self._write_offset + len(record) > self.segment_bytes
+        ):
+            self._writer.close()
+            self._writer = None
+            self._write_segment += 1
+            self._write_offset = 0
+        if self._writer is None:
+            self._writer = open(self._path(self._write_segment), "ab")
+            self.stats.segments_created += 1
+        self._writer.write(record)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._write_offset += len(record)
+        self._spooled += 1
+        self.stats.spilled += 1
+        self.stats.spilled_bytes += len(record)
+
+    def _get(self) -> SampleBatch:
+        if self._queue:
+            self._in_flight.append(None)
+            return self._queue.popleft()
+        payload, position = self._read_next()
+        self._spooled -= 1
+        self.stats.replayed += 1
+        batch: SampleBatch = unpack_batch(payload)
+        batch.spool_position = position
+        self._in_flight.append(position)
+        return batch
+
+    def _read_next(self) -> tuple[bytes, SpoolPosition]:
+        while True:
+            if self._reader is None:
+                self._reader = read_records(
+                    self._path(self._read_segment), self._read_offset
+                )
+            try:
+                payload, self._read_offset = next(self._reader)
+                return payload, SpoolPosition(
+                    self.name, self._read_segment, self._read_offset
+                )
+            except (StopIteration, FileNotFoundError):
+                # End of this segment (or a torn tail left by a crash): move on
+                self._reader = None
+                if self._read_segment >= self._write_segment:
+                    raise RuntimeError(f"spool {self.directory} lost spooled batches")
+                self._read_segment += 1
+                self._read_offset = 0
+
+    def task_done(self) -> None:
+        super().task_done()
+        position: SpoolPosition | None = self._in_flight.popleft()
+        if position is not None:
+            # Everything before the committed batch's segment is done with
+            while self._oldest_segment < position.segment:
+                self._remove(self._oldest_segment)
+                self._oldest_segment += 1
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import contextlib
+import json
+from asyncio import Queue, StreamWriter, Task
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from myasync.arduino_serial_loop import backoff_delay, handle_arduino_commands
+from myasync import clock
+from myasync.clock import ClockAligner
+from myasync.command_writer import CommandQueue
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+from myasync.live import LiveStore
+from myasync.records import SampleBatch
+from myasync.serial_thread import open_threaded_serial_connection
+from myasync.watermark_queue import WatermarkQueue
+
+if TYPE_CHECKING:
+    from myasync.publisher import SamplePublisher
+
+
+@dataclass
+class PortConfig:
+    url: str
+    baudrate: int = 115200
+    name: str = ""  # device name stored with its samples, defaults to the url
+
+    def __post_init__(self) -> None:
+        if not self.name:
+            self.name = self.url
+
+
+def load_port_configs(path: str) -> list[PortConfig]:
+    """Read `{"ports": [{"url": ..., "baudrate": ..., "name": ...}, ...]}` from a JSON file"""
+    with open(path) as f:
+        config = json.load(f)
+    return [PortConfig(**port) for port in config["ports"]]
+
+
+class PortState(Enum):
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    BACKOFF = "backoff"
+    STOPPED = "stopped"
+
+
+@dataclass
+class PortHealth:
+    state: PortState = PortState.CONNECTING
+    connects: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    samples: int = 0
+    # Times here are on the clock.now() scale that samples are stamped with
+    last_sample_at: float | None = None
+    last_error: str | None = None
+    retry_at: float | None = None
+
+
+class SerialSupervisor:
+    """
+    Runs one reader/command pipeline per serial port, all feeding a shared
+    db_queue. Every port is supervised independently: when it fails to open,
+    closes, errors or goes quiet for longer than read_timeout it is
+    reconnected with jittered exponential backoff while the others carry on.
+    """
+
+    def __init__(
+        self,
+        ports: list[PortConfig],
+        db_queue: Queue,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float | None = None,
+        threaded: bool = False,
+        live: LiveStore | None = None,
+        publisher: "SamplePublisher | None" = None,
+        align_clock: bool = False,
+    ) -> None:
+        self.ports: list[PortConfig] = ports
+        self.db_queue: Queue = db_queue
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.connect_timeout: float = connect_timeout
+        self.read_timeout: float | None = read_timeout
+        # Read each port on its own thread, see myasync.serial_thread
+        self.threaded: bool = threaded
+        self.live: LiveStore | None = live  # latest samples per port, see myasync.live
+        # One topic per port, see myasync.publisher
+        self.publisher: "SamplePublisher | None" = publisher
+        # Acquisition times per port from its counter, see myasync.clock
+        self.aligners: dict[str, ClockAligner] = (
+            {port.name: ClockAligner() for port in ports} if align_clock else {}
+        )
+        self.health: dict[str, PortHealth] = {port.name: PortHealth() for port in ports}
+        self.command_queues: dict[str, CommandQueue] = {
+            port.name: CommandQueue() for port in ports
+        }
+
+    async def run(self) -> None:
+        """Supervise every port until cancelled"""
+        tasks: list[Task] = [
+            asyncio.create_task(self.supervise(port), name=f"supervise:{port.name}")
+            for port in self.ports
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for health in self.health.values():
+                health.state = PortState.STOPPED
+
+    async def supervise(self, port: PortConfig) -> None:
+        health: PortHealth = self.health[port.name]
+        while True:
+            health.state = PortState.CONNECTING
+            try:
+                async with asyncio.timeout(self.connect_timeout):
+                    protocol, writer = await (
+                        open_threaded_serial_connection
+                        if self.threaded
+                        else open_framed_serial_connection
+                    )(port.url, port.baudrate)
+            except Exception as e:
+                await self._backoff(port, f"connect failed: {e!r}")
+                continue
+
+            health.state = PortState.CONNECTED
+            health.connects += 1
+            health.consecutive_failures = 0
+            health.retry_at = None
+            print(f"Connected to {port.name}")
+            try:
+                await self._run_pipeline(port, protocol, writer)
+                error: str = "port closed"
+            except Exception as e:
+                error = repr(e)
+            finally:
+                writer.close()
+                with contextlib.suppress(Exception):
+                    await writer.wait_closed()
+            await self._backoff(port, error)
+
+    async def _backoff(self, port: PortConfig, error: str) -> None:
+        health: PortHealth = self.health[port.name]
+        delay: float = backoff_delay(
+            health.consecutive_failures, self.base_delay, self.max_delay
+        )
+        health.state = PortState.BACKOFF
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = error
+        health.retry_at = clock.now() + delay
+        print(f"{port.name}: {error}, reconnecting in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def _run_pipeline(
+        self, port: PortConfig, protocol: LineFramingProtocol, writer: StreamWriter
+    ) -> None:
+        """Run the port's reader and command writer until the reader stops"""
+        commands: Task = asyncio.create_task(
+            handle_arduino_commands(writer, self.command_queues[port.name])
+        )
+        try:
+            await self._read_port(port, protocol)
+        finally:
+            commands.cancel()
+            await asyncio.gather(commands, return_exceptions=True)
+
+    async def _read_port(self, port: PortConfig, protocol: LineFramingProtocol) -> None:
+        health: PortHealth = self.health[port.name]
+        while True:
+            try:
+                async with asyncio.timeout(self.read_timeout):
+                    received_at, lines = await protocol.read_timed_batch()
+            except TimeoutError:
+                raise TimeoutError(f"no data for {self.read_timeout}s") from None
+            if not lines:
+                return
+            batch: SampleBatch = SampleBatch.from_lines(
+                lines, received_at, device=port.name
+            )
+            if batch:
+                health.samples += len(batch)
+                health.last_sample_at = batch.timestamps[-1]
+                if port.name in self.aligners:
+                    self.aligners[port.name].align(batch)
+                if self.live is not None:
+                    self.live.update(batch)
+                if self.publisher is not None:
+                    self.publisher.update(batch)
+                await self.db_queue.put(batch)
+
+    def format_health(self) -> str:
+        # The clock samples are stamped with, so last_sample ages are exact
+        now: float = clock.now()
+        rows: list[str] = []
+        for name, health in self.health.items():
+            age: str = (
+                "-" if health.last_sample_at is None else f"{now - health.last_sample_at:.1f}s"
+            )
+            rows.append(
+                f"{name}: {health.state.value} samples={health.samples} "
+                f"last_sample={age} connects={health.connects} failures={health.failures}"
+                + (f" last_error={health.last_error}" if health.last_error else "")
+            )
+        return "\n".join(rows)
+
+
+async def report_health(supervisor: SerialSupervisor, interval: float = 10.0) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        print(supervisor.format_health())
+
+
+async def main(config_path: str, db_path: str = "readings.db", report_interval: float = 10.0) -> None:
+    db_queue: WatermarkQueue = WatermarkQueue(maxsize=1000)
+    sink: SQLiteSink = SQLiteSink(db_path)
+    supervisor = SerialSupervisor(load_port_configs(config_path), db_queue)
+
+    tasks: list[Task] = [
+        asyncio.create_task(supervisor.run()),
+        asyncio.create_task(write_batches_to_database(db_queue, sink)),
+        asyncio.create_task(report_health(supervisor, report_interval)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await sink.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supervise several Arduinos at once")
+    parser.add_argument("config", help='JSON file: {"ports": [{"url": "/dev/ttyACM0"}]}')
+    parser.add_argument("--db", default="readings.db")
+    args = parser.parse_args()
+    asyncio.run(main(args.config, args.db))
@@ -4,70 +4,61 @@ import random
 
 import serial_asyncio
 import zmq as zmq
-from zmq.asyncio import Context, Poller
+from zmq.asyncio import Context
 
+from myasync.bridge import ZmqSerialBridge, temp_frame
+from myasync.eventlog import LOG
 
-async def open_serial_connection():
-    return await serial_asyncio.open_serial_connection(url='/dev/ttyACM0', baudrate=115200)
 
+async def open_serial_connection(port: str = '/dev/ttyACM0', baudrate: int = 115200):
+    return await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
 
-async def zmq_receiver(ctx: Context, url: str) -> None:
-    """receive messages with polling"""
+
+async def zmq_receiver(ctx: Context, url: str, writer) -> None:
+    """receive setpoints and forward them to serial, conflating bursts"""
     pull = ctx.socket(zmq.PULL)
     pull.connect(url)
-    poller = Poller()
-    poller.register(pull, zmq.POLLIN)
-    while True:
-        events = await poller.poll()
-        if pull in dict(events):
-            # print("recving", events)
-            msg = await pull.recv_multipart()
-            dict_received = json.loads(msg[0].decode("utf-8"))
-            print('received via zmq', dict_received)
-
-            try:
-                target_temp = dict_received["target-temp"]
-                await write_serial_string(writer, target_temp)
-            except KeyError as err_info:
-                print(f"{err_info} not received")
+    bridge = ZmqSerialBridge(pull, writer)
+    try:
+        await bridge.run()
+    finally:
+        print(f"bridge stats: {bridge.stats}")
+        pull.close()
 
 
 async def read_serial_line(reader):
     while True:
         line = await reader.readline()
-        print(str(line, 'utf-8'))
+        LOG.log("serial", "Arduino", line=str(line, 'utf-8').strip())
 
 
 async def write_serial_string(writer, temp: float):
     # while True:
     # target_temp = random.randrange(10, 30)
-    string_to_write = '<' + str(temp) + '>'
-    print(f"writing {string_to_write} to serial")
-    writer.write(string_to_write.encode())
+    frame = temp_frame(temp)
+    LOG.log("command", "Writing to serial", frame=frame.decode().strip())
+    writer.write(frame)
     await asyncio.sleep(0)
 
 
-if __name__ == "__main__":
-
-    url = 'tcp://127.0.0.1:5555'
-
+async def main(
+    url: str = 'tcp://127.0.0.1:5555', port: str = '/dev/ttyACM0', baudrate: int = 115200
+) -> None:
+    """bridge setpoints from url to the Arduino on port, and log what it prints"""
     ctx = Context.instance()
-
-    loop = asyncio.get_event_loop()
-
+    reader, writer = await open_serial_connection(port, baudrate)
     try:
-        reader, writer = loop.run_until_complete(open_serial_connection())
-
-        receiver_task = loop.create_task(zmq_receiver(ctx, url))
+        # writer_task = asyncio.create_task(write_serial_string(writer))
+        await asyncio.gather(zmq_receiver(ctx, url, writer), read_serial_line(reader))
+    finally:
+        writer.close()
 
-        # writer_task = loop.create_task(write_serial_string(writer))
-        reader_task = loop.create_task(read_serial_line(reader))
 
-        loop.run_forever()
+if __name__ == "__main__":
 
+    try:
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("Stopping loop")
-        loop.stop()
     finally:
         print("Closing loop")
-        loop.close()
@@ -1,6 +1,11 @@
 import asyncio
+import time
+from asyncio import BaseTransport
+from dataclasses import dataclass
+
 import serial_asyncio
 
+from myasync.eventlog import LOG
 
 # class OutputProtocol(asyncio.Protocol):
 #     def connection_made(self, transport):
@@ -33,33 +38,103 @@ import serial_asyncio
 # loop.run_forever()
 # loop.close()
 
+
+@dataclass
+class ChunkFlowStats:
+    chunks: int = 0
+    bytes: int = 0
+    max_chunk: int = 0
+    pauses: int = 0
+    paused_seconds: float = 0.0
+    peak_buffered: int = 0  # bytes received but not yet read
+
+
 class InputChunkProtocol(asyncio.Protocol):
-    def connection_made(self, transport):
+    """
+    Queues every chunk for read(), pausing the transport only while the
+    consumer is behind: once high_watermark bytes are buffered, and resuming
+    as soon as read() drains them to low_watermark. An idle consumer gets
+    each chunk on the next loop iteration instead of the next poll.
+    """
+
+    def __init__(
+        self, high_watermark: int = 64 * 1024, low_watermark: int | None = None
+    ) -> None:
+        self.high_watermark: int = high_watermark
+        self.low_watermark: int = (
+            high_watermark // 4 if low_watermark is None else low_watermark
+        )
+        if not 0 <= self.low_watermark < self.high_watermark:
+            raise ValueError(
+                "Watermarks must satisfy 0 <= low < high, "
+                f"got low={self.low_watermark} high={self.high_watermark}"
+            )
+        self.stats: ChunkFlowStats = ChunkFlowStats()
+        self.transport: BaseTransport | None = None
+        self.buffered: int = 0
+        self._chunks: asyncio.Queue[bytes] = asyncio.Queue()
+        self._paused_at: float | None = None
+        self._closed: bool = False
+
+    def connection_made(self, transport: BaseTransport) -> None:
         self.transport = transport
 
-    def data_received(self, data):
-        print('data received', repr(data))
+    def data_received(self, data: bytes) -> None:
+        self._chunks.put_nowait(data)
+        self.buffered += len(data)
+        self.stats.chunks += 1
+        self.stats.bytes += len(data)
+        self.stats.max_chunk = max(self.stats.max_chunk, len(data))
+        self.stats.peak_buffered = max(self.stats.peak_buffered, self.buffered)
+        if self.buffered >= self.high_watermark:
+            self.pause_reading()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._closed = True
+        # An empty chunk tells read() callers the port has gone
+        self._chunks.put_nowait(b"")
 
-        # stop callbacks again immediately
-        self.pause_reading()
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
 
-    def pause_reading(self):
+    def pause_reading(self) -> None:
         # This will stop the callbacks to data_received
-        self.transport.pause_reading()
+        if self._paused_at is None:
+            self._paused_at = time.perf_counter()
+            self.stats.pauses += 1
+            self.transport.pause_reading()
 
-    def resume_reading(self):
+    def resume_reading(self) -> None:
         # This will start the callbacks to data_received again with all data that has been received in the meantime.
-        self.transport.resume_reading()
+        if self._paused_at is not None:
+            self.stats.paused_seconds += time.perf_counter() - self._paused_at
+            self._paused_at = None
+            self.transport.resume_reading()
 
+    async def read(self) -> bytes:
+        """Wait for the next chunk; an empty chunk means the port closed"""
+        if self._closed and self._chunks.empty():
+            return b""
+        chunk: bytes = await self._chunks.get()
+        self.buffered -= len(chunk)
+        if self.buffered <= self.low_watermark:
+            self.resume_reading()
+        return chunk
 
-async def reader():
-    transport, protocol = await serial_asyncio.create_serial_connection(loop, InputChunkProtocol, '/dev/ttyACM0', baudrate=115200)
 
-    while True:
-        await asyncio.sleep(0.1)
-        protocol.resume_reading()
+async def reader(url: str = "/dev/ttyACM0", baudrate: int = 115200) -> None:
+    loop = asyncio.get_running_loop()
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop, InputChunkProtocol, url, baudrate=baudrate
+    )
+    try:
+        while chunk := await protocol.read():
+            LOG.log("serial", "data received", chunk=chunk)
+    finally:
+        transport.close()
+        print(f"chunk flow stats: {protocol.stats}")
 
 
-loop = asyncio.get_event_loop()
-loop.run_until_complete(reader())
-loop.close()
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(reader())
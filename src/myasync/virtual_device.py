@@ -0,0 +1,260 @@
+import json
+import os
+import select
+import threading
+import time
+import tty
+
+from myasync.codec import CODECS, JSON_LINES, BinaryCodec, BinaryDecoder, JsonLinesCodec
+from myasync.records import SampleBatch
+from myasync.samples import sine_wave_value
+
+# 8N1 serial: a start and a stop bit around every data byte
+BITS_PER_BYTE: int = 10
+
+
+class VirtualArduino:
+    """
+    Stand-in Arduino on a pseudo-terminal pair: open `port` with
+    serial_asyncio exactly like /dev/ttyACM0.
+
+    It emits {"interval": n, "value": v} samples at `rate` per second
+    (None for as fast as the link allows, 0 for none) and paces its output
+    to `baudrate`, so buffering and link limits are real. It answers PING,
+    {"action": "ping"}, {"action": "configure"} and codec negotiation, and
+    applies `<temp>`, {"target-temp": t} and LED_ON/LED_OFF commands.
+
+    Like an Uno it only starts sending boot_delay seconds after a host opens
+    the port, and stops while no host has it open.
+
+    The device runs on its own thread so its timing does not depend on the
+    event loop under test; sent_at maps each sample's interval to the
+    perf_counter() time it was written, for end-to-end latency.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = 10.0,
+        baudrate: int | None = 115200,
+        count: int | None = None,
+        codec: JsonLinesCodec | BinaryCodec = JSON_LINES,
+        samples_per_write: int = 16,
+        boot_delay: float = 0.05,
+    ) -> None:
+        self.rate: float | None = rate
+        self.baudrate: int | None = baudrate
+        self.count: int | None = count  # stop emitting (not answering) after this many
+        self.codec: JsonLinesCodec | BinaryCodec = codec
+        self.samples_per_write: int = samples_per_write
+        self.boot_delay: float = boot_delay
+        self.connected: bool = False
+        self.samples_sent: int = 0
+        self.commands_received: list[dict | str] = []
+        self.settings: dict = {}
+        self.target_temp: float | None = None
+        self.led: bool = False
+        self.sent_at: dict[int, float] = {}
+        self.cpu_time: float = (
+            0.0  # device thread CPU seconds, to subtract in benchmarks
+        )
+
+        self._controller, device = os.openpty()
+        tty.setraw(device)
+        self.port: str = os.ttyname(device)
+        # Without our own handle on the device side, reads fail with EIO
+        # until a host opens the port, which is how connection is detected
+        os.close(device)
+        os.set_blocking(self._controller, False)
+        self._buffer: bytearray = bytearray()
+        self._decoder: BinaryDecoder | None = None
+        self._link_free_at: float = 0.0
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "VirtualArduino":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name=f"virtual-arduino {self.port}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the device and hang up; readers on `port` see the port close"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            os.close(self._controller)
+        except OSError:
+            pass
+
+    @property
+    def done(self) -> bool:
+        """True once `count` samples have been written"""
+        return self.count is not None and self.samples_sent >= self.count
+
+    def _run(self) -> None:
+        next_sample: float = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if not self.connected:
+                    self._receive()
+                    if not self.connected:
+                        self._stop.wait(0.01)
+                        continue
+                    self._stop.wait(self.boot_delay)
+                    next_sample = time.perf_counter()
+                emitting: bool = self.rate != 0 and not self.done
+                now: float = time.perf_counter()
+                timeout: float = (
+                    max(0.0, next_sample - now) if emitting and self.rate else 0.0
+                )
+                if not emitting:
+                    timeout = 0.05
+                readable, _, _ = select.select([self._controller], [], [], timeout)
+                if readable:
+                    self._receive()
+                if emitting and time.perf_counter() >= next_sample:
+                    due: int = self.samples_per_write
+                    if self.rate:
+                        due = min(
+                            due,
+                            int((time.perf_counter() - next_sample) * self.rate) + 1,
+                        )
+                        next_sample += due / self.rate
+                    self._emit(due)
+        finally:
+            self.cpu_time = time.thread_time()
+
+    def _emit(self, count: int) -> None:
+        if self.count is not None:
+            count = min(count, self.count - self.samples_sent)
+        first: int = self.samples_sent
+        data: bytes = b"".join(
+            self.codec.encode_sample(interval, sine_wave_value(interval))
+            for interval in range(first, first + count)
+        )
+        sent_at: float = time.perf_counter()
+        for interval in range(first, first + count):
+            self.sent_at[interval] = sent_at
+        self.samples_sent += count
+        self._write(data)
+
+    def _write(self, data: bytes) -> None:
+        """Write all of data, then wait as long as the serial link would take to send it"""
+        view = memoryview(data)
+        while view and not self._stop.is_set():
+            try:
+                written: int = os.write(self._controller, view)
+                view = view[written:]
+            except BlockingIOError:
+                # Host is not reading; wait for room without blocking stop()
+                select.select([], [self._controller], [], 0.05)
+        if self.baudrate:
+            now: float = time.perf_counter()
+            self._link_free_at = (
+                max(now, self._link_free_at) + len(data) * BITS_PER_BYTE / self.baudrate
+            )
+            self._stop.wait(self._link_free_at - now)
+
+    def _receive(self) -> None:
+        try:
+            data: bytes = os.read(self._controller, 4096)
+        except BlockingIOError:
+            self.connected = True
+            return
+        except OSError:
+            # EIO: no host has the port open
+            self.connected = False
+            return
+        self.connected = True
+        if self._decoder is not None:
+            commands: list[dict | str] = self._decoder.decode(
+                data, SampleBatch(), time.time()
+            )
+        else:
+            commands = self._parse_text_commands(data)
+        for command in commands:
+            self.commands_received.append(command)
+            self._handle(command)
+
+    def _parse_text_commands(self, data: bytes) -> list[dict | str]:
+        """Split newline-terminated lines and unterminated `<temp>` frames"""
+        buffer: bytearray = self._buffer
+        buffer += data
+        commands: list[dict | str] = []
+        while buffer:
+            if buffer[0] == ord("<"):
+                end: int = buffer.find(b">")
+                if end < 0:
+                    break
+                commands.append(buffer[: end + 1].decode("utf-8", "replace"))
+                del buffer[: end + 1]
+                continue
+            newline: int = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line: str = buffer[:newline].decode("utf-8", "replace").strip()
+            del buffer[: newline + 1]
+            if not line:
+                continue
+            try:
+                commands.append(json.loads(line))
+            except ValueError:
+                commands.append(line)
+        return commands
+
+    def _respond(self, response: dict) -> None:
+        self._write(self.codec.encode_command(response))
+
+    def _handle(self, command: dict | str) -> None:
+        if isinstance(command, str):
+            if command == "PING":
+                self._respond({"status": "ok", "response": "PONG"})
+            elif command in ("LED_ON", "LED_OFF"):
+                self.led = command == "LED_ON"
+            elif command.startswith("<") and command.endswith(">"):
+                try:
+                    self.target_temp = float(command[1:-1])
+                except ValueError:
+                    pass
+            return
+        if not isinstance(command, dict):
+            return
+
+        response: dict = {"status": "ok"}
+        if "id" in command:
+            response["id"] = command["id"]
+        action = command.get("action")
+        if "target-temp" in command:
+            try:
+                self.target_temp = float(command["target-temp"])
+            except (TypeError, ValueError):
+                response["status"] = "error"
+                response["error"] = f"bad target-temp: {command['target-temp']!r}"
+            else:
+                response["target-temp"] = self.target_temp
+        elif action == "ping":
+            response["response"] = "PONG"
+        elif action == "configure":
+            self.settings.update(command.get("settings", {}))
+            response["settings"] = self.settings
+        elif action == "codec" and command.get("codec") in CODECS:
+            response["codec"] = command["codec"]
+            # Acknowledge in the old codec, then switch
+            self._respond(response)
+            self.codec = CODECS[command["codec"]]
+            self._decoder = (
+                self.codec.decoder() if isinstance(self.codec, BinaryCodec) else None
+            )
+            return
+        else:
+            response = {"status": "error", "error": f"unknown command: {command}"}
+        self._respond(response)
@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import selectors
+from typing import Any, Awaitable, Callable
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    """Returns ready I/O as usual, but skips the wait for the next timer"""
+
+    loop: "VirtualTimeLoop"
+
+    def select(self, timeout: float | None = None) -> list:
+        ready: list = super().select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None or self.loop.executor_jobs:
+            # Nothing scheduled, or real work on a thread that will wake us
+            return super().select(None)
+        self.loop.advance(timeout)
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop for tests whose clock jumps straight to the next timer
+    whenever no callback is ready and no I/O is waiting, so asyncio.sleep,
+    call_later and asyncio.timeout cost no wall time and every run sees the
+    same timeline. Virtual time does not move while run_in_executor work is
+    in flight (SQLiteSink, asyncio.to_thread): that work takes zero virtual
+    seconds, however long it really takes.
+
+    Only loop.time() is virtual; time.time() and clock.now() still read
+    the real clocks.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        selector = _VirtualTimeSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_now: float = start
+        self.executor_jobs: int = 0
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    def advance(self, seconds: float) -> None:
+        self._virtual_now += seconds
+
+    def run_in_executor(self, executor: Any, func: Callable, *args: Any):
+        future: asyncio.Future = super().run_in_executor(executor, func, *args)
+        self.executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, future: asyncio.Future) -> None:
+        self.executor_jobs -= 1
+
+    def run_for(self, main: Awaitable, seconds: float) -> float:
+        """
+        Run `main` for `seconds` virtual seconds, or until it returns, then
+        cancel it; returns the virtual seconds that passed
+        """
+
+        async def elapsed(task: asyncio.Task) -> None:
+            await asyncio.wait({task}, timeout=seconds)
+
+        return self._supervise(main, elapsed)
+
+    def run_until(
+        self,
+        main: Awaitable,
+        condition: Callable[[], bool],
+        timeout: float = 3600.0,
+        poll: float = 0.01,
+    ) -> float:
+        """
+        Run `main` until condition() is true, checking every `poll` virtual
+        seconds, then cancel it; returns the virtual seconds that passed.
+        Raises TimeoutError after `timeout` virtual seconds, and
+        RuntimeError if main returns first.
+        """
+
+        async def holds(task: asyncio.Task) -> None:
+            start: float = self.time()
+            while not condition():
+                if task.done():
+                    task.result()
+                    raise RuntimeError("main returned before the condition held")
+                if self.time() - start >= timeout:
+                    raise TimeoutError(f"condition not met in {timeout} virtual s")
+                await asyncio.sleep(poll)
+
+        return self._supervise(main, holds)
+
+    def _supervise(
+        self, main: Awaitable, until: Callable[[asyncio.Task], Awaitable[None]]
+    ) -> float:
+        async def run() -> float:
+            start: float = self.time()
+            task: asyncio.Task = asyncio.ensure_future(main)
+            try:
+                await until(task)
+                if task.done():
+                    task.result()
+                return self.time() - start
+            finally:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+        return self.run_until_complete(run())
+
+    def shutdown(self) -> None:
+        """Cancel leftover tasks and close the loop, like asyncio.run does"""
+        tasks: set[asyncio.Task] = asyncio.all_tasks(self)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.run_until_complete(self.shutdown_asyncgens())
+        self.run_until_complete(self.shutdown_default_executor())
+        self.close()
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from asyncio import Queue
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Sequence
+
+
+class OverflowPolicy(Enum):
+    """What a WatermarkQueue does with a new item when it is over capacity"""
+
+    BLOCK = "block"  # make the producer wait until the queue drains to the low watermark
+    DROP_OLDEST = "drop_oldest"  # discard the item at the head to make room
+    DROP_NEWEST = "drop_newest"  # discard the incoming item
+
+
+@dataclass
+class QueueStats:
+    """Counters for sizing a WatermarkQueue against real sensor rates"""
+
+    enqueued: int = 0
+    dequeued: int = 0
+    dropped_oldest: int = 0
+    dropped_newest: int = 0
+    requeued: int = 0
+    blocked_puts: int = 0
+    blocked_seconds: float = 0.0
+    high_watermark_hits: int = 0
+    peak_depth: int = 0
+
+
+class WatermarkQueue(Queue):
+    """
+    Bounded asyncio.Queue with high/low watermarks and an overflow policy.
+
+    With OverflowPolicy.BLOCK producers are held once the depth reaches the
+    high watermark and released only when consumers drain it to the low
+    watermark, so the reader backs off in bursts instead of per item.
+    The drop policies never block: when the queue is full the oldest or the
+    newest item is discarded and counted in `stats`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        high_watermark: int | None = None,
+        low_watermark: int | None = None,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("WatermarkQueue must be bounded (maxsize > 0)")
+        super().__init__(maxsize)
+        self.high_watermark: int = maxsize if high_watermark is None else high_watermark
+        self.low_watermark: int = (
+            self.high_watermark // 2 if low_watermark is None else low_watermark
+        )
+        if not 0 <= self.low_watermark < self.high_watermark <= maxsize:
+            raise ValueError(
+                "Watermarks must satisfy 0 <= low < high <= maxsize, "
+                f"got low={self.low_watermark} high={self.high_watermark} maxsize={maxsize}"
+            )
+        self.policy: OverflowPolicy = policy
+        self.stats: QueueStats = QueueStats()
+        self._above_high: bool = False
+        self._below_low: asyncio.Event = asyncio.Event()
+        self._below_low.set()
+
+    @property
+    def above_high_watermark(self) -> bool:
+        """True from reaching the high watermark until draining to the low one"""
+        return self._above_high
+
+    async def put(self, item: Any) -> None:
+        if self.policy is not OverflowPolicy.BLOCK:
+            return self.put_nowait(item)
+
+        if self._above_high:
+            self.stats.blocked_puts += 1
+            start: float = time.perf_counter()
+            while self._above_high:
+                await self._below_low.wait()
+            self.stats.blocked_seconds += time.perf_counter() - start
+
+        # Several producers can be released at once, so still respect maxsize
+        await super().put(item)
+
+    def put_nowait(self, item: Any) -> None:
+        if self.full():
+            if self.policy is OverflowPolicy.DROP_NEWEST:
+                self.stats.dropped_newest += 1
+                return
+            if self.policy is OverflowPolicy.DROP_OLDEST:
+                super().get_nowait()
+                self.task_done()
+                self.stats.dropped_oldest += 1
+
+        super().put_nowait(item)
+        self.stats.enqueued += 1
+        self._grew()
+
+    def requeue_nowait(self, items: Sequence[Any]) -> None:
+        """
+        Put items a consumer took but could not process back at the head, in
+        order. They were already accepted once, so neither maxsize nor the
+        overflow policy applies: the queue may briefly hold one batch too many.
+        """
+        self._queue.extendleft(reversed(items))
+        self._unfinished_tasks += len(items)
+        self._finished.clear()
+        for _ in items:
+            self._wakeup_next(self._getters)
+        self.stats.requeued += len(items)
+        self._grew()
+
+    def _grew(self) -> None:
+        depth: int = self.qsize()
+        if depth > self.stats.peak_depth:
+            self.stats.peak_depth = depth
+        if not self._above_high and depth >= self.high_watermark:
+            self._above_high = True
+            self._below_low.clear()
+            self.stats.high_watermark_hits += 1
+
+    def get_nowait(self) -> Any:
+        item: Any = super().get_nowait()
+        self.stats.dequeued += 1
+        if self._above_high and self.qsize() <= self.low_watermark:
+            self._above_high = False
+            self._below_low.set()
+        return item
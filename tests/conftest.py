@@ -6,6 +6,8 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from myasync.virtual_time import VirtualTimeLoop
+
 
 def sine_wave_value(interval: int) -> float:
     """
@@ -39,13 +41,34 @@ def mock_serial_connection():
 
     # Mock the close method and other writer methods
     mock_writer.close = MagicMock()
+    mock_writer.is_closing = MagicMock(return_value=False)
     mock_writer.write = MagicMock()
     mock_writer.drain = (
         AsyncMock()
     )  # drain() is async and waits for write buffer to empty
+    mock_writer.wait_closed = AsyncMock()
+
+    # Like the device, answer each JSON command on the next line read and
+    # stream samples otherwise
+    expected_responses = [
+        {"status": "ok", "id": f"cmd_{i:03d}"} for i in range(1, 101)
+    ]
+    samples = response_generator()
+    answered = []
 
-    # Configure readline to return different responses
-    mock_reader.readline.side_effect = response_generator()
+    def readline():
+        commands = [
+            call
+            for call in mock_writer.write.call_args_list
+            if call.args and bytes(call.args[0]).startswith(b"{")
+        ]
+        if len(answered) < len(commands):
+            answered.append(expected_responses[len(answered)])
+            return (json.dumps(answered[-1]) + "\r\n").encode()
+        return next(samples)
+
+    mock_reader.readline.side_effect = readline
+    mock_reader.at_eof = MagicMock(return_value=False)
 
     # Patch the serial connection
     patcher = patch("serial_asyncio.open_serial_connection", new=AsyncMock())
@@ -56,7 +79,18 @@ def mock_serial_connection():
         "reader": mock_reader,
         "writer": mock_writer,
         "open_connection": mock_open,
-        # "expected_responses": json_responses,
+        "expected_responses": expected_responses,
     }
 
     patcher.stop()
+
+
+@pytest.fixture
+def virtual_loop():
+    """
+    A VirtualTimeLoop for sync tests: loop.run_for(coro, seconds) and
+    loop.run_until(coro, condition) run the pipeline in virtual time.
+    """
+    loop = VirtualTimeLoop()
+    yield loop
+    loop.shutdown()
@@ -0,0 +1,202 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from myasync.aggregate import (
+    DeadbandFilter,
+    SwingingDoorFilter,
+    WindowAggregator,
+    WindowBatch,
+    reduce_batches,
+)
+from myasync.db_writer import SQLiteSink
+from myasync.records import SampleBatch
+from myasync.samples import sine_wave_value
+
+
+def signal_batch(start, count, timestamp=0.0, period=400, step=0.0):
+    batch = SampleBatch("ttyACM0")
+    for interval in range(start, start + count):
+        batch.append(
+            timestamp + step * (interval - start),
+            interval,
+            sine_wave_value(interval, period),
+        )
+    return batch
+
+
+def step_hold_error(batch, kept):
+    """Largest error reconstructing batch by holding each kept value"""
+    held = dict(zip(kept.intervals, kept.values))
+    value, error = None, 0.0
+    for interval, actual in zip(batch.intervals, batch.values):
+        value = held.get(interval, value)
+        error = max(error, abs(actual - value))
+    return error
+
+
+def interpolation_error(batch, kept):
+    """Largest error reconstructing batch by joining kept samples with lines"""
+    points = list(zip(kept.intervals, kept.values))
+    error = 0.0
+    for interval, actual in zip(batch.intervals, batch.values):
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x0 <= interval <= x1:
+                estimate = y0 + (y1 - y0) * (interval - x0) / (x1 - x0)
+                error = max(error, abs(actual - estimate))
+                break
+    return error
+
+
+def test_deadband_keeps_error_bound_and_compresses():
+    batch = signal_batch(0, 2000)
+    deadband = DeadbandFilter(tolerance=0.1)
+
+    kept = SampleBatch("ttyACM0")
+    for start in range(0, 2000, 100):
+        kept.extend(deadband.process(signal_batch(start, 100)))
+
+    assert kept.intervals[0] == 0
+    assert step_hold_error(batch, kept) <= 0.1
+    assert len(batch) / len(kept) >= 10
+
+
+def test_deadband_drops_flat_batch_and_honours_max_gap():
+    deadband = DeadbandFilter(tolerance=0.5, max_gap=150)
+    flat = SampleBatch("ttyACM0")
+    for interval in range(200):
+        flat.append(0.0, interval, 20.0)
+
+    assert list(deadband.process(flat).intervals) == [0, 150]
+    second = SampleBatch("ttyACM0")
+    second.append(0.0, 201, 20.1)
+    assert not deadband.process(second)
+
+
+def test_swinging_door_keeps_error_bound_and_compresses():
+    batch = signal_batch(0, 2000)
+    door = SwingingDoorFilter(tolerance=0.02)
+
+    kept = SampleBatch("ttyACM0")
+    for start in range(0, 2000, 100):
+        kept.extend(door.process(signal_batch(start, 100)))
+    for held in door.flush():
+        kept.extend(held)
+
+    assert (kept.intervals[0], kept.intervals[-1]) == (0, 1999)
+    assert interpolation_error(batch, kept) <= 0.02 + 1e-9
+    assert len(batch) / len(kept) >= 10
+
+
+def test_swinging_door_passes_a_ramp_as_its_end_points():
+    ramp = SampleBatch("ttyACM0")
+    for interval in range(100):
+        ramp.append(0.0, interval, 19.0 + interval * 0.01)
+    door = SwingingDoorFilter(tolerance=0.001)
+
+    assert list(door.process(ramp).intervals) == [0]
+    assert [list(held.intervals) for held in door.flush()] == [[99]]
+
+
+def test_swinging_door_restarts_on_a_repeated_interval():
+    door = SwingingDoorFilter(tolerance=0.1)
+    batch = SampleBatch("ttyACM0")
+    # The sample at 2 is sent again with a value off the line, closing the door
+    for interval, value in [(0, 20.0), (1, 20.0), (2, 20.0), (2, 25.0), (3, 25.0)]:
+        batch.append(0.0, interval, value)
+
+    assert list(door.process(batch).intervals) == [0, 2, 2]
+    assert [list(held.intervals) for held in door.flush()] == [[3]]
+
+
+def test_tumbling_windows_per_device():
+    windows = WindowAggregator(width=1.0)
+    values = [sine_wave_value(i, 400) for i in range(10)]
+    first = windows.process(signal_batch(0, 20, timestamp=10.0, step=0.1))
+    # Timestamps 10.0-11.9: the 10s window is complete, the 11s one is not
+    assert list(first.rows()) == [
+        (
+            10.0,
+            11.0,
+            10,
+            min(values),
+            max(values),
+            pytest.approx(sum(values) / 10),
+        )
+    ]
+    other = windows.process(SampleBatch.from_lines([], device="ttyUSB0"))
+    assert not other
+
+    (rest,) = windows.flush()
+    assert list(rest.starts) == [11.0]
+    assert list(rest.counts) == [10]
+
+
+def test_sliding_windows_overlap():
+    windows = WindowAggregator(width=2.0, step=1.0)
+    emitted = windows.process(signal_batch(0, 40, timestamp=0.0, step=0.1))
+    (rest,) = windows.flush()
+
+    starts = list(emitted.starts) + list(rest.starts)
+    counts = list(emitted.counts) + list(rest.counts)
+    assert starts == [-1.0, 0.0, 1.0, 2.0, 3.0]
+    assert counts == [10, 20, 20, 20, 10]
+    assert not windows.process(signal_batch(40, 1, timestamp=10.0))
+
+
+def test_flush_with_now_only_emits_ended_windows():
+    windows = WindowAggregator(width=1.0)
+    windows.process(signal_batch(0, 5, timestamp=100.2, step=0.1))
+
+    assert windows.flush(now=100.9) == []
+    (batch,) = windows.flush(now=101.1)
+    assert list(batch.counts) == [5]
+
+
+def test_step_must_divide_width():
+    with pytest.raises(ValueError):
+        WindowAggregator(width=1.0, step=0.3)
+
+
+@pytest.mark.asyncio
+async def test_reduce_batches_feeds_sink(tmp_path):
+    in_queue, out_queue = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(
+        reduce_batches(
+            in_queue, out_queue, WindowAggregator(width=1.0), flush_interval=0.01
+        )
+    )
+    await in_queue.put(signal_batch(0, 10, timestamp=1.0, step=0.1))
+    batch = await asyncio.wait_for(out_queue.get(), 1)
+    task.cancel()
+
+    assert isinstance(batch, WindowBatch)
+    assert batch.enqueued_at > 0
+    sink = SQLiteSink(str(tmp_path / "readings.db"))
+    await sink.write_batch([batch, signal_batch(0, 3)])
+    await sink.close()
+    with sqlite3.connect(tmp_path / "readings.db") as connection:
+        assert connection.execute(
+            "SELECT device, window_start, window_end, count FROM sample_windows"
+        ).fetchall() == [("ttyACM0", 1.0, 2.0, 10)]
+        assert connection.execute("SELECT COUNT(*) FROM samples").fetchone() == (3,)
+
+
+@pytest.mark.asyncio
+async def test_reduce_batches_flushes_held_samples_when_cancelled():
+    in_queue, out_queue = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(
+        reduce_batches(
+            in_queue, out_queue, SwingingDoorFilter(tolerance=1.0), now=lambda: 42.0
+        )
+    )
+    await in_queue.put(signal_batch(0, 10))
+    first = await asyncio.wait_for(out_queue.get(), 1)
+    await in_queue.join()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    held = out_queue.get_nowait()
+    assert (list(first.intervals), list(held.intervals)) == ([0], [9])
+    assert held.enqueued_at == 42.0
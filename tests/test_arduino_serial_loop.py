@@ -1,34 +1,94 @@
 from myasync.arduino_serial_loop import main
-from conftest import sine_wave_value
+from conftest import response_generator, sine_wave_value
 import asyncio
+import contextlib
+import json
+import sqlite3
+import time
 import serial_asyncio
 import pytest
+from unittest.mock import AsyncMock, MagicMock
 
 
-@pytest.mark.asyncio
-async def test_main(mock_serial_connection):
-    await main()
-    pass
+def persisted(db_path) -> int:
+    """Rows committed so far, read from outside the writer thread"""
+    try:
+        with contextlib.closing(sqlite3.connect(db_path)) as connection:
+            return connection.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
 
 
-@pytest.mark.asyncio
-async def test_mock_serial_generator_function(mock_serial_connection):
-    # Open serial connection to Arduino
-    reader, writer = await serial_asyncio.open_serial_connection(
-        url="/dev/ttyACM0",  # Adjust for your Arduino port
-        baudrate=115200,
+def test_main(mock_serial_connection, virtual_loop, tmp_path):
+    db_path = str(tmp_path / "readings.db")
+    started = time.perf_counter()
+
+    # One line per line_delay (0.5 s): 1000 samples are 500 virtual seconds
+    elapsed = virtual_loop.run_until(
+        main(db_path=db_path), lambda: persisted(db_path) >= 1000, poll=1.0
+    )
+
+    assert 499 <= elapsed <= 501
+    assert time.perf_counter() - started < 30
+    mock_serial_connection["writer"].write.assert_called_once_with(b"LED_ON\n")
+
+
+def test_main_reconnects_after_port_fails(
+    mock_serial_connection, virtual_loop, tmp_path
+):
+    db_path = str(tmp_path / "readings.db")
+    lines = response_generator()
+
+    def unplugged_after_100():
+        for _ in range(100):
+            yield next(lines)
+        raise OSError("device reports readiness to read but returned no data")
+
+    mock_serial_connection["reader"].readline.side_effect = unplugged_after_100()
+    replugged = AsyncMock()
+    replugged.readline.side_effect = lines
+    replugged.at_eof = MagicMock(return_value=False)
+    writer = mock_serial_connection["writer"]
+    mock_serial_connection["open_connection"].side_effect = [
+        (mock_serial_connection["reader"], writer),
+        (replugged, writer),
+    ]
+
+    virtual_loop.run_until(
+        main(db_path=db_path), lambda: persisted(db_path) >= 150, poll=1.0
     )
 
-    while True:
-        try:
-            data = await reader.readline()
-            decoded_data = data.decode("utf-8").strip()
-            if decoded_data:
-                print(f"Received data: {decoded_data}")
+    assert mock_serial_connection["open_connection"].await_count == 2
+    writer.wait_closed.assert_awaited()
+
+
+def test_mock_serial_generator_function(mock_serial_connection, virtual_loop):
+    received = []
+
+    async def monitor():
+        # Open serial connection to Arduino
+        reader, writer = await serial_asyncio.open_serial_connection(
+            url="/dev/ttyACM0",  # Adjust for your Arduino port
+            baudrate=115200,
+        )
+
+        while True:
+            try:
+                data = await reader.readline()
+                decoded_data = data.decode("utf-8").strip()
+                if decoded_data:
+                    received.append(decoded_data)
+                    await asyncio.sleep(0.5)
+            except Exception as e:
+                print(f"Error reading from Arduino: {e}")
                 await asyncio.sleep(0.5)
-        except Exception as e:
-            print(f"Error reading from Arduino: {e}")
-            await asyncio.sleep(0.5)
+
+    # An hour of the device at one line per 0.5 s, the same on every run
+    assert virtual_loop.run_for(monitor(), 3600) == 3600
+    assert len(received) == 7200
+    assert received[-1] == json.dumps(
+        {"interval": 7199, "value": sine_wave_value(7199)}
+    )
 
 
 def test_sine_wave():
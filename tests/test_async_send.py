@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+zmq = pytest.importorskip("zmq")
+from zmq.asyncio import Context
+
+from myasync.async_send import percentile, publish, push_socket, target_temp_message
+
+
+@pytest.fixture
+def zmq_ctx():
+    ctx = Context()
+    yield ctx
+    ctx.term()
+
+
+def test_target_temp_message():
+    message = json.loads(target_temp_message())
+    assert 10 <= message["target-temp"] < 30
+
+
+def test_percentile():
+    values = [float(i) for i in range(100)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 99.0
+
+
+@pytest.mark.asyncio
+async def test_publish_batches_frames_per_send(zmq_ctx):
+    push = push_socket(zmq_ctx, "inproc://publish-test", sndhwm=100)
+    pull = zmq_ctx.socket(zmq.PULL)
+    pull.connect("inproc://publish-test")
+
+    stats = await publish(push, rate=100_000, batch_size=10, count=100)
+    received = [await pull.recv_multipart() for _ in range(stats.sends)]
+
+    assert (stats.messages, stats.sends) == (100, 10)
+    assert all(len(frames) == 10 for frames in received)
+    assert len(stats.send_latencies) == 10
+    # Bounded, so a run without duration or count does not grow without limit
+    assert stats.send_latencies.maxlen is not None
+    push.close(linger=0)
+    pull.close(linger=0)
+
+
+@pytest.mark.asyncio
+async def test_publish_is_paced_to_rate(zmq_ctx):
+    push = push_socket(zmq_ctx, "inproc://paced-test")
+    pull = zmq_ctx.socket(zmq.PULL)
+    pull.connect("inproc://paced-test")
+
+    stats = await publish(push, rate=1000, batch_size=10, duration=0.1)
+
+    # 0.1s at 1000 msgs/s is 100 messages; allow for loop scheduling jitter
+    assert 50 <= stats.messages <= 120
+    push.close(linger=0)
+    pull.close(linger=0)
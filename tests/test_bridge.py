@@ -0,0 +1,104 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+zmq = pytest.importorskip("zmq")
+from zmq.asyncio import Context
+
+from myasync.bridge import ZmqSerialBridge, temp_frame
+
+
+@pytest.fixture
+def zmq_pair():
+    """PUSH/PULL pair over inproc, standing in for async_send.sender and the bridge"""
+    ctx = Context()
+    push = ctx.socket(zmq.PUSH)
+    push.bind("inproc://bridge-test")
+    pull = ctx.socket(zmq.PULL)
+    pull.connect("inproc://bridge-test")
+    yield push, pull
+    push.close(linger=0)
+    pull.close(linger=0)
+    ctx.term()
+
+
+def serial_writer():
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+    return writer
+
+
+async def send_json(push, message):
+    await push.send_multipart([json.dumps(message).encode("utf-8")])
+
+
+def test_temp_frame():
+    assert temp_frame(21) == b"<21>"
+    assert temp_frame(21.5) == b"<21.5>"
+
+
+@pytest.mark.asyncio
+async def test_burst_conflated_to_latest_setpoint(zmq_pair):
+    push, pull = zmq_pair
+    writer = serial_writer()
+    bridge = ZmqSerialBridge(pull, writer)
+
+    for temp in range(10, 30):
+        await send_json(push, {"target-temp": temp})
+    await asyncio.sleep(0.01)
+
+    assert await bridge.pump() == 1
+    writer.write.assert_called_once_with(b"<29>")
+    writer.drain.assert_awaited_once()
+    assert bridge.stats.received == 20
+    assert bridge.stats.conflated == 19
+    assert bridge.stats.wakeups == 1
+
+
+@pytest.mark.asyncio
+async def test_malformed_messages_are_counted(zmq_pair):
+    push, pull = zmq_pair
+    writer = serial_writer()
+    bridge = ZmqSerialBridge(pull, writer)
+
+    await push.send_multipart([b"not json"])
+    await send_json(push, {"time-elapsed": 1.0})
+    await asyncio.sleep(0.01)
+
+    assert await bridge.pump() == 0
+    writer.write.assert_not_called()
+    assert bridge.stats.malformed == 2
+
+
+@pytest.mark.asyncio
+async def test_run_forwards_each_wakeup(zmq_pair):
+    push, pull = zmq_pair
+    writer = serial_writer()
+    bridge = ZmqSerialBridge(pull, writer)
+    task = asyncio.create_task(bridge.run())
+
+    await send_json(push, {"target-temp": 18})
+    async with asyncio.timeout(2):
+        while bridge.stats.frames_written < 1:
+            await asyncio.sleep(0.001)
+    task.cancel()
+
+    writer.write.assert_called_once_with(b"<18>")
+
+
+@pytest.mark.asyncio
+async def test_multipart_batch_frames_are_all_bridged(zmq_pair):
+    push, pull = zmq_pair
+    writer = serial_writer()
+    bridge = ZmqSerialBridge(pull, writer)
+
+    await push.send_multipart(
+        [json.dumps({"target-temp": temp}).encode("utf-8") for temp in (20, 21, 22)]
+    )
+    await asyncio.sleep(0.01)
+
+    assert await bridge.pump() == 1
+    writer.write.assert_called_once_with(b"<22>")
+    assert bridge.stats.received == 3
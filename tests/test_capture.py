@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+
+from myasync.arduino_serial_loop import read_batches_from_arduino, read_from_arduino
+from myasync.capture import CaptureFile, CaptureWriter, replay, replay_reader
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+from myasync.samples import sample_line
+from myasync.virtual_device import VirtualArduino
+
+
+def write_capture(path, chunks, gap=0.0):
+    with CaptureWriter(str(path)) as capture:
+        for chunk in chunks:
+            capture.record(chunk)
+            if gap:
+                time.sleep(gap)
+
+
+def test_capture_round_trip(tmp_path):
+    path = tmp_path / "session.cap"
+    write_capture(path, [b"one\n", b"tw", b"o\n"])
+
+    with CaptureFile(str(path)) as capture:
+        records = [(at, bytes(chunk)) for at, chunk in capture]
+
+    assert [chunk for _, chunk in records] == [b"one\n", b"tw", b"o\n"]
+    times = [at for at, _ in records]
+    assert times == sorted(times)
+
+
+def test_truncated_record_ends_capture(tmp_path):
+    path = tmp_path / "session.cap"
+    write_capture(path, [b"complete\n", b"cut short\n"])
+    with open(path, "r+b") as file:
+        file.truncate(path.stat().st_size - 3)
+
+    with CaptureFile(str(path)) as capture:
+        assert [bytes(chunk) for _, chunk in capture] == [b"complete\n"]
+
+
+def test_appending_continues_the_timeline(tmp_path):
+    path = tmp_path / "session.cap"
+    write_capture(path, [b"first\n"])
+    time.sleep(0.05)
+    write_capture(path, [b"second\n"])
+
+    with CaptureFile(str(path)) as capture:
+        (first, _), (second, _) = [(at, bytes(chunk)) for at, chunk in capture]
+    assert second - first >= 0.05
+
+
+def test_rejects_files_that_are_not_captures(tmp_path):
+    path = tmp_path / "not.cap"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        CaptureFile(str(path))
+
+
+@pytest.mark.asyncio
+async def test_replay_speed(tmp_path):
+    path = tmp_path / "session.cap"
+    write_capture(path, [sample_line(i) for i in range(5)], gap=0.05)
+
+    stats = await replay(str(path), LineFramingProtocol(), speed=1)
+    assert stats.elapsed >= 0.18
+    fast = await replay(str(path), LineFramingProtocol(), speed=10)
+    assert fast.elapsed < stats.elapsed / 3
+    assert fast.chunks == 5
+
+
+@pytest.mark.asyncio
+async def test_replay_shortens_long_gaps(tmp_path):
+    path = tmp_path / "session.cap"
+    write_capture(path, [b"a\n", b"b\n"], gap=0.3)
+
+    stats = await replay(str(path), LineFramingProtocol(), speed=1, max_gap=0.01)
+    assert stats.elapsed < 0.1
+
+
+@pytest.mark.asyncio
+async def test_replay_feeds_read_from_arduino(tmp_path):
+    path = tmp_path / "session.cap"
+    stream = b"".join(sample_line(i) for i in range(250))
+    write_capture(path, [stream[i : i + 100] for i in range(0, len(stream), 100)])
+    db_queue = asyncio.Queue()
+
+    reader, replaying = replay_reader(str(path), speed=None)
+    await read_from_arduino(reader, db_queue, line_delay=0)
+    await replaying
+
+    intervals = []
+    while not db_queue.empty():
+        intervals += list(db_queue.get_nowait().intervals)
+    assert intervals == list(range(250))
+
+
+@pytest.mark.asyncio
+async def test_capture_from_port_replays_identically(tmp_path):
+    path = str(tmp_path / "session.cap")
+    with CaptureWriter(path) as capture:
+        with VirtualArduino(rate=None, baudrate=None, count=100) as device:
+            protocol, writer = await open_framed_serial_connection(
+                device.port, capture=capture
+            )
+            received = 0
+            while received < 100:
+                received += len(await protocol.read_batch())
+            writer.close()
+
+    db_queue = asyncio.Queue()
+    protocol = LineFramingProtocol()
+    replaying = asyncio.create_task(replay(path, protocol, speed=None))
+    await read_batches_from_arduino(protocol, db_queue)
+    await replaying
+
+    intervals = []
+    while not db_queue.empty():
+        intervals += list(db_queue.get_nowait().intervals)
+    assert intervals == list(range(100))
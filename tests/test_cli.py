@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+import pytest
+
+from myasync import arduino_serial_loop, cli
+from myasync.bench.cold_start import HEAVY, environment
+
+
+def loaded_after(code):
+    """The HEAVY modules a fresh interpreter has imported after running code"""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(*sorted(sys.modules))"],
+        capture_output=True,
+        text=True,
+        env=environment(),
+        check=True,
+    )
+    return [name for name in HEAVY if name in result.stdout.split()]
+
+
+def test_help_imports_no_event_loop_or_transport():
+    assert (
+        loaded_after("from myasync import cli; cli.build_parser().format_help()") == []
+    )
+
+
+@pytest.mark.parametrize(
+    "module, expected",
+    [
+        ("myasync.async_serial_monitor", ["asyncio"]),
+        ("myasync.arduino_serial_loop", ["asyncio", "sqlite3"]),
+    ],
+)
+def test_serial_pipelines_load_neither_zmq_nor_pyserial(module, expected):
+    # pyserial comes in when a port is opened, pyzmq only with --publish
+    assert loaded_after(f"import {module}") == expected
+
+
+def test_ingest_forwards_only_given_options(monkeypatch):
+    calls = []
+
+    async def main(**kwargs):
+        calls.append(kwargs)
+
+    monkeypatch.setattr(arduino_serial_loop, "main", main)
+    cli.main(["ingest", "--framed", "--db", "x.db", "--publish", "tcp://*:5600"])
+
+    assert calls == [
+        {"db_path": "x.db", "framed": True, "publish_endpoint": "tcp://*:5600"}
+    ]
+
+
+def test_ingest_rejects_single_port_options_with_config():
+    with pytest.raises(SystemExit, match="--config only combines"):
+        cli.main(["ingest", "--config", "ports.json", "--framed"])
+
+
+def test_bench_lists_and_runs_benchmarks(capsys, monkeypatch):
+    cli.main(["bench"])
+    assert {"clock", "cold_start", "e2e"} <= set(capsys.readouterr().out.split())
+
+    monkeypatch.setattr(sys, "argv", sys.argv[:])
+    cli.main(["bench", "clock", "--samples", "2000"])
+    assert "align()" in capsys.readouterr().out
@@ -0,0 +1,105 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from myasync import clock
+from myasync.arduino_serial_loop import read_batches_from_arduino
+from myasync.clock import ClockAligner
+from myasync.framing import LineFramingProtocol
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+
+PERIOD = 0.01 * (1 + 100e-6)  # a 100 Hz device whose crystal runs 100 ppm slow
+LINK = 0.002  # minimum transfer latency
+
+
+def device_chunks(samples, per_chunk=8, seed=1):
+    """(true acquisition times, batches stamped like framing would)"""
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    acquired = [start + PERIOD * i for i in range(samples)]
+    batches = []
+    for first in range(0, samples, per_chunk):
+        last = min(first + per_chunk, samples) - 1
+        received_at = acquired[last] + LINK + rng.expovariate(1 / 0.005)
+        batch = SampleBatch()
+        for i in range(first, last + 1):
+            batch.append(received_at, i, 0.0)
+        batches.append(batch)
+    return acquired, batches
+
+
+def test_now_is_monotonic_on_the_wall_clock_scale():
+    stamps = [clock.now() for _ in range(1000)]
+
+    assert stamps == sorted(stamps)
+    assert abs(stamps[-1] - time.time()) < 0.01
+
+
+def test_aligner_recovers_acquisition_times():
+    acquired, batches = device_chunks(5000)
+    aligner = ClockAligner()
+    errors, raw_errors = [], []
+
+    for batch in batches:
+        raw_errors.extend(
+            t - acquired[i] for t, i in zip(batch.timestamps, batch.intervals)
+        )
+        aligner.align(batch)
+        errors.extend(
+            t - acquired[i] for t, i in zip(batch.timestamps, batch.intervals)
+        )
+
+    # Once the period has settled, to well under the 5 ms mean queueing jitter
+    settled = sorted(abs(e - LINK) for e in errors[2500:])
+    assert settled[int(len(settled) * 0.99)] < 0.0005
+    assert aligner.period == pytest.approx(PERIOD, rel=1e-5)
+    assert sum(raw_errors) / len(raw_errors) > 0.03
+
+
+def test_counter_going_back_restarts_alignment():
+    aligner = ClockAligner()
+    for i in range(10):
+        aligner.observe(1000 + i, 100.0 + i * 0.01)
+
+    aligner.observe(0, 200.0)
+
+    assert aligner.stats.resets == 1
+    assert aligner.acquisition_time(0) == 200.0
+    assert aligner.period is None
+
+
+@pytest.mark.asyncio
+async def test_framing_stamps_chunks_when_received(monkeypatch):
+    protocol = LineFramingProtocol()
+    monkeypatch.setattr(clock, "now", lambda: 123.5)
+    protocol.data_received(b"".join(sample_lines(2)))
+    monkeypatch.setattr(clock, "now", lambda: 999.0)
+
+    assert await protocol.read_timed_batch() == (
+        123.5,
+        [line.rstrip() for line in sample_lines(2)],
+    )
+
+
+@pytest.mark.asyncio
+async def test_reader_queues_aligned_batches():
+    acquired, batches = device_chunks(2000, per_chunk=16)
+    aligner = ClockAligner()
+    for batch in batches[:-1]:
+        aligner.align(batch)
+    protocol = LineFramingProtocol()
+    db_queue = asyncio.Queue()
+    received_at = batches[-1].timestamps[0]
+    protocol.lines_received(list(sample_lines(16, start=1984)), received_at)
+    protocol.connection_lost(None)
+
+    await read_batches_from_arduino(protocol, db_queue, aligner=aligner)
+
+    batch = db_queue.get_nowait()
+    assert batch.received_at == received_at
+    assert [
+        round(t - LINK - a, 3) for t, a in zip(batch.timestamps, acquired[1984:])
+    ] == [0.0] * 16
@@ -0,0 +1,175 @@
+import asyncio
+import json
+from asyncio import Queue
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from myasync.codec import (
+    BINARY,
+    JSON_LINES,
+    SYNC,
+    CodecProtocol,
+    JsonLinesDecoder,
+    negotiate_codec,
+)
+from myasync.command_writer import write_commands
+from myasync.records import SampleBatch
+
+
+def decode_all(codec, data: bytes, chunk_size: int = 7):
+    decoder = codec.decoder()
+    batch = SampleBatch()
+    messages = []
+    for i in range(0, len(data), chunk_size):
+        messages += decoder.decode(data[i : i + chunk_size], batch, 1.0)
+    return decoder, batch, messages
+
+
+@pytest.mark.parametrize("codec", [JSON_LINES, BINARY])
+def test_samples_round_trip_across_chunks(codec):
+    data = b"".join(codec.encode_sample(i, 20.5) for i in range(10))
+
+    _, batch, messages = decode_all(codec, data)
+
+    assert messages == []
+    assert list(batch.intervals) == list(range(10))
+    assert list(batch.values) == [20.5] * 10
+
+
+@pytest.mark.parametrize("codec", [JSON_LINES, BINARY])
+def test_commands_decode_as_messages(codec):
+    data = codec.encode_command(
+        {"status": "ok", "id": "cmd_001"}
+    ) + codec.encode_command("LED_ON")
+
+    _, _, messages = decode_all(codec, data)
+
+    assert messages == [{"status": "ok", "id": "cmd_001"}, "LED_ON"]
+
+
+def test_malformed_json_sample_is_rejected_and_decoding_continues():
+    data = (
+        b'{"interval": null, "value": 1}\n'
+        b'{"interval": "one", "value": 2}\n'
+        b'{"interval": 1e999, "value": 2}\n' + JSON_LINES.encode_sample(2, 20.5)
+    )
+
+    decoder, batch, messages = decode_all(JSON_LINES, data)
+
+    assert messages == []
+    assert list(batch.intervals) == [2]
+    assert batch.rejected == 3
+    assert decoder.buffer == bytearray()
+
+
+def test_overlong_json_line_is_discarded_up_to_its_newline():
+    decoder = JsonLinesDecoder(max_line_length=64)
+    batch = SampleBatch()
+    data = b"x" * 200 + b"\n" + JSON_LINES.encode_sample(1, 20.0)
+
+    messages = []
+    for i in range(0, len(data), 50):
+        messages += decoder.decode(data[i : i + 50], batch, 1.0)
+
+    assert messages == []
+    assert list(batch.intervals) == [1]
+    assert decoder.overruns == 1
+
+
+def test_binary_resyncs_after_corrupt_frame():
+    good = BINARY.encode_sample(1, 20.0)
+    corrupt = bytearray(BINARY.encode_sample(2, 21.0))
+    corrupt[-3] ^= 0xFF
+    data = b"noise" + bytes(corrupt) + SYNC[:1] + good
+
+    decoder, batch, _ = decode_all(BINARY, data, chunk_size=3)
+
+    assert list(batch.intervals) == [1]
+    assert decoder.crc_errors == 1
+
+
+@pytest.mark.asyncio
+async def test_protocol_switches_codec_mid_chunk():
+    protocol = CodecProtocol(JSON_LINES)
+    ack = json.dumps({"status": "ok", "codec": "binary"}).encode() + b"\n"
+
+    protocol.data_received(
+        JSON_LINES.encode_sample(1, 20.0) + ack + BINARY.encode_sample(2, 21.0)
+    )
+
+    assert protocol.codec is BINARY
+    batch = protocol._batches.get_nowait()
+    assert list(batch.intervals) == [1, 2]
+    assert protocol._messages.get_nowait() == {"status": "ok", "codec": "binary"}
+
+
+@pytest.mark.asyncio
+async def test_negotiate_codec_switches_on_ack():
+    protocol = CodecProtocol(JSON_LINES)
+    writer = MagicMock()
+
+    async def ack():
+        protocol.data_received(b'{"status": "ok", "codec": "binary"}\n')
+
+    writer.drain = AsyncMock(side_effect=ack)
+
+    assert await negotiate_codec(protocol, writer, "binary") is BINARY
+    sent = json.loads(writer.write.call_args.args[0])
+    assert sent == {"action": "codec", "codec": "binary"}
+
+
+@pytest.mark.asyncio
+async def test_negotiate_codec_falls_back_on_timeout():
+    protocol = CodecProtocol(JSON_LINES)
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+
+    assert await negotiate_codec(protocol, writer, "binary", timeout=0.05) is JSON_LINES
+
+
+@pytest.mark.asyncio
+async def test_read_samples_returns_empty_batch_on_close():
+    protocol = CodecProtocol(BINARY)
+    protocol.data_received(BINARY.encode_sample(1, 20.0))
+    protocol.connection_lost(None)
+
+    assert len(await protocol.read_samples()) == 1
+    assert not await protocol.read_samples()
+    assert await protocol.read_message() is None
+
+
+@pytest.mark.asyncio
+async def test_protocol_pauses_on_unread_samples_and_drops_unread_messages():
+    protocol = CodecProtocol(BINARY, high_watermark=20, max_messages=3)
+    transport = MagicMock()
+    protocol.connection_made(transport)
+    for i in range(5):
+        protocol.data_received(
+            b"".join(BINARY.encode_sample(i * 10 + j, 20.0) for j in range(10))
+            + BINARY.encode_command(f"line {i}")
+        )
+
+    transport.pause_reading.assert_called_once()
+    assert protocol.dropped_messages == 2
+    for _ in range(4):
+        await protocol.read_samples()
+    transport.resume_reading.assert_not_called()
+    await protocol.read_samples()
+    transport.resume_reading.assert_called_once()
+
+    protocol.connection_lost(None)
+    messages = [await protocol.read_message() for _ in range(4)]
+    assert messages == ["line 2", "line 3", "line 4", None]
+
+
+@pytest.mark.asyncio
+async def test_command_writer_frames_with_binary_codec(mock_serial_connection):
+    mock_writer = mock_serial_connection["writer"]
+    command_queue = Queue()
+    await command_queue.put("LED_ON")
+    task = asyncio.create_task(write_commands(mock_writer, command_queue, codec=BINARY))
+    await command_queue.join()
+    task.cancel()
+
+    mock_writer.write.assert_called_once_with(BINARY.encode_command("LED_ON"))
@@ -0,0 +1,139 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from myasync.command_client import CommandClient
+from myasync.device_commands import send_pipelined_commands
+
+
+class EchoDevice:
+    """
+    Writer/reader pair for a device that answers each JSON command.
+    Responses are held back until `release()` so tests control their order.
+    """
+
+    def __init__(self, echo_ids: bool = True, drop: set[str] = frozenset()):
+        self.reader = asyncio.StreamReader()
+        self.writer = MagicMock()
+        self.writer.write.side_effect = self._received
+        self.writer.drain = AsyncMock()
+        self.echo_ids = echo_ids
+        self.drop = set(drop)
+        self.held: list[dict] = []
+
+    def _received(self, data: bytes):
+        command = json.loads(data)
+        if command["id"] in self.drop:
+            return
+        response = {"status": "ok", "action": command["action"]}
+        if self.echo_ids:
+            response["id"] = command["id"]
+        self.held.append(response)
+
+    def release(self, reverse: bool = False):
+        for response in reversed(self.held) if reverse else self.held:
+            self.reader.feed_data((json.dumps(response) + "\r\n").encode())
+        self.held.clear()
+
+
+@pytest.mark.asyncio
+async def test_window_of_commands_in_flight_before_any_response():
+    device = EchoDevice()
+    async with CommandClient(device.reader, device.writer, window=3) as client:
+        sends = asyncio.gather(*(client.send({"action": f"a{i}"}) for i in range(5)))
+        await asyncio.sleep(0.01)
+
+        # Three written without waiting for a round trip, the rest wait for a slot
+        assert device.writer.write.call_count == 3
+
+        while len(device.writer.write.call_args_list) < 5 or device.held:
+            device.release()
+            await asyncio.sleep(0.001)
+        responses = await asyncio.wait_for(sends, timeout=2)
+
+    assert [r["action"] for r in responses] == [f"a{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_responses_matched_by_id():
+    device = EchoDevice()
+    async with CommandClient(device.reader, device.writer) as client:
+        sends = client.send_many(
+            [{"action": "get_status", "id": "cmd_001"}, {"action": "reset", "id": "cmd_002"}]
+        )
+        task = asyncio.ensure_future(sends)
+        await asyncio.sleep(0.01)
+        device.release(reverse=True)
+        responses = await asyncio.wait_for(task, timeout=2)
+
+    assert responses == [
+        {"status": "ok", "action": "get_status", "id": "cmd_001"},
+        {"status": "ok", "action": "reset", "id": "cmd_002"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_responses_without_id_resolve_in_order():
+    device = EchoDevice(echo_ids=False)
+    async with CommandClient(device.reader, device.writer) as client:
+        task = asyncio.ensure_future(client.send_many([{"action": "a"}, {"action": "b"}]))
+        await asyncio.sleep(0.01)
+        device.release()
+        responses = await asyncio.wait_for(task, timeout=2)
+
+    assert [r["action"] for r in responses] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_samples_are_not_taken_for_responses():
+    device = EchoDevice(echo_ids=False)
+    async with CommandClient(device.reader, device.writer) as client:
+        task = asyncio.ensure_future(client.send({"action": "a"}))
+        await asyncio.sleep(0.01)
+        device.reader.feed_data(b'{"interval": 0, "value": 20.0}\r\n' * 3)
+        device.release()
+        response = await asyncio.wait_for(task, timeout=2)
+
+    assert response["action"] == "a"
+    assert client.skipped_samples == 3
+    assert client.unmatched_responses == 0
+
+
+@pytest.mark.asyncio
+async def test_per_command_timeout():
+    device = EchoDevice(drop={"slow"})
+    async with CommandClient(device.reader, device.writer, timeout=0.05) as client:
+        slow = asyncio.ensure_future(client.send({"action": "x", "id": "slow"}))
+        fast = asyncio.ensure_future(client.send({"action": "y", "id": "fast"}))
+        await asyncio.sleep(0.01)
+        device.release()
+
+        assert (await fast)["id"] == "fast"
+        with pytest.raises(TimeoutError, match="slow"):
+            await slow
+
+
+@pytest.mark.asyncio
+async def test_connection_closed_fails_pending_commands():
+    device = EchoDevice()
+    async with CommandClient(device.reader, device.writer) as client:
+        task = asyncio.ensure_future(client.send({"action": "x"}))
+        await asyncio.sleep(0.01)
+        device.reader.feed_eof()
+        with pytest.raises(ConnectionError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_send_pipelined_commands(mock_serial_connection):
+    device = EchoDevice()
+    device.writer.write.side_effect = lambda data: (device._received(data), device.release())
+    mock_serial_connection["open_connection"].return_value = (device.reader, device.writer)
+
+    commands = [{"action": "get_status", "id": "cmd_001"}, {"action": "reset", "id": "cmd_002"}]
+    responses = await send_pipelined_commands(commands)
+
+    assert [r["id"] for r in responses] == ["cmd_001", "cmd_002"]
+    device.writer.close.assert_called_once()
@@ -0,0 +1,100 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from myasync.arduino_serial_loop import handle_arduino_commands
+from myasync.command_writer import (
+    Command,
+    CommandQueue,
+    CommandWriterStats,
+    coalesce_commands,
+    command_key,
+)
+
+
+def test_command_key():
+    assert command_key("LED_ON") == command_key("LED_OFF") == "LED"
+    assert command_key("<21.5>") == "target-temp"
+    assert command_key('{"target-temp": 21}') == "target-temp"
+    assert command_key('{"action": "reset"}') is None
+    assert command_key("PING") is None
+
+
+def test_coalesce_keeps_latest_per_key_in_order():
+    commands = [
+        Command.from_payload("LED_ON"),
+        Command.from_payload("<20>"),
+        Command.from_payload("PING"),
+        Command.from_payload("<21>"),
+        Command.from_payload("LED_OFF"),
+        Command.from_payload("<22>"),
+    ]
+
+    kept = coalesce_commands(commands)
+
+    assert [c.payload for c in kept] == ["PING", "LED_OFF", "<22>"]
+
+
+def test_opted_out_commands_are_always_sent():
+    commands = [
+        Command.from_payload("<20>", coalesce=False),
+        Command.from_payload("<21>"),
+        Command.from_payload("<22>"),
+    ]
+
+    assert [c.payload for c in coalesce_commands(commands)] == ["<20>", "<22>"]
+
+
+@pytest.mark.asyncio
+async def test_burst_sent_in_one_write_and_drain():
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+    command_queue = asyncio.Queue()
+    stats = CommandWriterStats()
+    for payload in ["LED_ON", "<20>", "<21>", "LED_OFF", "PING"]:
+        command_queue.put_nowait(payload)
+
+    task = asyncio.create_task(handle_arduino_commands(writer, command_queue, stats))
+    await asyncio.wait_for(command_queue.join(), timeout=1)
+    task.cancel()
+
+    writer.write.assert_called_once_with(b"<21>\nLED_OFF\nPING\n")
+    writer.drain.assert_awaited_once()
+    assert (stats.queued, stats.sent, stats.coalesced, stats.writes) == (5, 3, 2, 1)
+    assert len(stats.latencies) == 3
+    assert stats.latency_percentile(50) >= 0
+
+
+@pytest.mark.asyncio
+async def test_command_queue_latency_includes_time_queued():
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+    command_queue = CommandQueue()
+    stats = CommandWriterStats()
+    await command_queue.put("<20>")
+    command_queue.put_nowait("LED_ON")
+    await asyncio.sleep(0.05)
+
+    task = asyncio.create_task(handle_arduino_commands(writer, command_queue, stats))
+    await asyncio.wait_for(command_queue.join(), timeout=1)
+    task.cancel()
+
+    assert stats.sent == 2
+    assert min(stats.latencies) >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_write_error_still_marks_commands_done():
+    writer = MagicMock()
+    writer.drain = AsyncMock(side_effect=OSError("port closed"))
+    command_queue = asyncio.Queue()
+    stats = CommandWriterStats()
+    command_queue.put_nowait("LED_ON")
+
+    task = asyncio.create_task(handle_arduino_commands(writer, command_queue, stats))
+    await asyncio.wait_for(command_queue.join(), timeout=1)
+    task.cancel()
+
+    assert stats.errors == 1
+    assert stats.sent == 0
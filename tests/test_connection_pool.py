@@ -0,0 +1,106 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from myasync.connection_pool import SerialConnectionPool
+from myasync.device_commands import configure_device_settings, send_command_to_device
+
+
+@pytest.mark.asyncio
+async def test_helpers_reuse_pooled_connection(mock_serial_connection):
+    async with SerialConnectionPool() as pool:
+        first = await send_command_to_device({"action": "ping"}, pool=pool)
+        second = await send_command_to_device({"action": "ping"}, pool=pool)
+
+        mock_serial_connection["open_connection"].assert_called_once_with(
+            url="/dev/ttyACM0", baudrate=115200
+        )
+        mock_serial_connection["writer"].close.assert_not_called()
+        assert (first["id"], second["id"]) == ("cmd_001", "cmd_002")
+        assert len(pool) == 1
+
+    mock_serial_connection["writer"].close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_connections_keyed_by_port_and_baudrate(mock_serial_connection):
+    async with SerialConnectionPool() as pool:
+        await send_command_to_device({"action": "ping"}, pool=pool)
+        await send_command_to_device({"action": "ping"}, baudrate=9600, pool=pool)
+        await send_command_to_device({"action": "ping"}, port="/dev/ttyACM1", pool=pool)
+
+        assert mock_serial_connection["open_connection"].call_count == 3
+        assert pool.opens == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_are_serialized(mock_serial_connection):
+    order = []
+
+    async def exchange(pool, name):
+        async with pool.connection("/dev/ttyACM0") as (reader, writer):
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-end")
+
+    async with SerialConnectionPool() as pool:
+        await asyncio.gather(exchange(pool, "a"), exchange(pool, "b"))
+
+    mock_serial_connection["open_connection"].assert_called_once()
+    assert order == ["a-start", "a-end", "b-start", "b-end"]
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_evicted_after_ttl(mock_serial_connection):
+    async with SerialConnectionPool(idle_ttl=0.01) as pool:
+        await send_command_to_device({"action": "ping"}, pool=pool)
+        await asyncio.sleep(0.02)
+
+        assert pool.evict_idle() == 1
+        assert len(pool) == 0
+        mock_serial_connection["writer"].close.assert_called_once()
+
+        await send_command_to_device({"action": "ping"}, pool=pool)
+        assert mock_serial_connection["open_connection"].call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_connection_is_reopened(mock_serial_connection):
+    async with SerialConnectionPool() as pool:
+        await send_command_to_device({"action": "ping"}, pool=pool)
+
+        mock_serial_connection["writer"].is_closing.return_value = True
+        new_writer = MagicMock(is_closing=MagicMock(return_value=False), drain=AsyncMock())
+        reader = mock_serial_connection["reader"]
+        reader.readline.side_effect = [b'{"status": "ok"}\r\n']
+        mock_serial_connection["open_connection"].return_value = (reader, new_writer)
+        await send_command_to_device({"action": "ping"}, pool=pool)
+
+        assert mock_serial_connection["open_connection"].call_count == 2
+        mock_serial_connection["writer"].close.assert_called_once()
+        new_writer.write.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_connection_discarded_after_io_error(mock_serial_connection):
+    mock_serial_connection["reader"].readline.side_effect = OSError("device unplugged")
+
+    async with SerialConnectionPool() as pool:
+        with pytest.raises(OSError):
+            await send_command_to_device({"action": "ping"}, pool=pool)
+        assert len(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_kept_after_configuration_error(mock_serial_connection):
+    error_response = {"status": "error", "message": "invalid command"}
+    mock_serial_connection["reader"].readline.side_effect = [
+        (json.dumps(error_response) + "\r\n").encode()
+    ]
+
+    async with SerialConnectionPool() as pool:
+        with pytest.raises(ValueError, match="Configuration failed"):
+            await configure_device_settings({"invalid_setting": "bad_value"}, pool=pool)
+        assert len(pool) == 1
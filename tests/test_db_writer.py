@@ -0,0 +1,171 @@
+import asyncio
+import sqlite3
+import pytest
+
+from myasync.db_writer import (
+    SQLiteSink,
+    collect_batch,
+    write_batch_with_retry,
+    write_batches_to_database,
+)
+from myasync.records import SampleBatch
+from myasync.watermark_queue import OverflowPolicy, WatermarkQueue
+
+
+class FlakySink:
+    """Sink that fails with a transient error a fixed number of times"""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.batches = []
+
+    async def write_batch(self, rows):
+        if self.failures > 0:
+            self.failures -= 1
+            raise self.error
+        self.batches.append(list(rows))
+
+
+@pytest.mark.asyncio
+async def test_collect_batch_bounded_by_count():
+    queue = asyncio.Queue()
+    for i in range(10):
+        queue.put_nowait(i)
+
+    assert await collect_batch(queue, max_batch_size=4, max_linger=1) == [0, 1, 2, 3]
+    assert queue.qsize() == 6
+
+
+@pytest.mark.asyncio
+async def test_collect_batch_counts_samples():
+    queue = asyncio.Queue()
+    for size in (3, 3, 3):
+        batch = SampleBatch()
+        for i in range(size):
+            batch.append(0.0, i, 20.0)
+        queue.put_nowait(batch)
+
+    batch = await collect_batch(queue, max_batch_size=5, max_linger=1, size=len)
+    assert [len(item) for item in batch] == [3, 3]
+    assert queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_collect_batch_bounded_by_linger():
+    queue = asyncio.Queue()
+    queue.put_nowait("first")
+
+    batch = await asyncio.wait_for(
+        collect_batch(queue, max_batch_size=100, max_linger=0.01), timeout=1
+    )
+    assert batch == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_retry_on_transient_error():
+    sink = FlakySink(2, sqlite3.OperationalError("database is locked"))
+
+    await write_batch_with_retry(sink, ["a", "b"], max_retries=3, retry_delay=0)
+
+    assert sink.batches == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_non_transient_error_is_not_retried():
+    sink = FlakySink(1, ValueError("bad row"))
+
+    with pytest.raises(ValueError):
+        await write_batch_with_retry(sink, ["a"], max_retries=3, retry_delay=0)
+    assert sink.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_batches_committed_and_task_done(tmp_path):
+    path = tmp_path / "readings.db"
+    sink = SQLiteSink(str(path))
+    queue = asyncio.Queue()
+    for start in range(0, 25, 5):
+        batch = SampleBatch(device="uno")
+        for i in range(start, start + 5):
+            batch.append(1000.0 + i, i, 20.0)
+        queue.put_nowait(batch)
+
+    task = asyncio.create_task(
+        write_batches_to_database(queue, sink, max_batch_size=10, max_linger=0.01)
+    )
+    # join() only returns once task_done was called for every queued batch
+    await asyncio.wait_for(queue.join(), timeout=5)
+    task.cancel()
+    await sink.close()
+
+    with sqlite3.connect(path) as connection:
+        rows = connection.execute(
+            "SELECT device, timestamp, interval, value FROM samples ORDER BY id"
+        ).fetchall()
+    assert len(rows) == 25
+    assert rows[0] == ("uno", 1000.0, 0, 20.0)
+    assert rows[-1][2] == 24
+
+
+@pytest.mark.asyncio
+async def test_batch_failing_transiently_is_requeued_until_committed():
+    sink = FlakySink(4, sqlite3.OperationalError("disk I/O error"))
+    queue = asyncio.Queue()
+    for i in range(3):
+        queue.put_nowait(
+            SampleBatch.from_lines([b'{"interval": %d, "value": 20.0}' % i])
+        )
+
+    task = asyncio.create_task(
+        write_batches_to_database(queue, sink, max_retries=1, retry_delay=0)
+    )
+    await asyncio.wait_for(queue.join(), timeout=5)
+    task.cancel()
+    committed = [batch for batches in sink.batches for batch in batches]
+    assert sorted(i for batch in committed for i in batch.intervals) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_requeued_batch_survives_drop_newest():
+    queue = WatermarkQueue(maxsize=2, policy=OverflowPolicy.DROP_NEWEST)
+
+    def batch(interval):
+        return SampleBatch.from_lines([b'{"interval": %d, "value": 20.0}' % interval])
+
+    class RefillingSink(FlakySink):
+        async def write_batch(self, rows):
+            if self.failures > 0:
+                # The reader fills the queue while the database is down
+                for interval in (2, 3):
+                    queue.put_nowait(batch(interval))
+            await super().write_batch(rows)
+
+    sink = RefillingSink(1, sqlite3.OperationalError("database is locked"))
+    queue.put_nowait(batch(0))
+    queue.put_nowait(batch(1))
+
+    task = asyncio.create_task(
+        write_batches_to_database(queue, sink, max_retries=0, retry_delay=0)
+    )
+    await asyncio.wait_for(queue.join(), timeout=5)
+    task.cancel()
+    committed = [batch for batches in sink.batches for batch in batches]
+    assert [i for batch in committed for i in batch.intervals] == [0, 1, 2, 3]
+    assert queue.stats.requeued == 2
+    assert queue.stats.dropped_newest == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_failing_permanently_is_dropped_and_marked_done():
+    sink = FlakySink(10, ValueError("bad row"))
+    queue = asyncio.Queue()
+    for _ in range(3):
+        queue.put_nowait(SampleBatch.from_lines([b'{"interval": 1, "value": 20.0}']))
+
+    task = asyncio.create_task(
+        write_batches_to_database(queue, sink, max_retries=1, retry_delay=0)
+    )
+    await asyncio.wait_for(queue.join(), timeout=5)
+    task.cancel()
+    assert sink.batches == []
@@ -0,0 +1,113 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+from myasync.arduino_serial_loop import read_batches_from_arduino, write_data_to_db
+from myasync.eventlog import EventLog, Sampling, format_record
+from myasync.framing import LineFramingProtocol
+from myasync.records import SampleBatch
+
+
+class BlockedSink(io.StringIO):
+    """A stream whose writes wait until released, like a stalled terminal"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.release.wait(5)
+        return super().write(text)
+
+
+def test_records_are_logfmt():
+    line = format_record(
+        0.25, "info", "serial", "Arduino", {"port": "/dev/pts/3", "line": 'a "b"'}
+    )
+
+    assert line.endswith(
+        ' level=info cat=serial msg=Arduino port=/dev/pts/3 line="a \\"b\\""'
+    )
+    assert line.startswith("ts=") and ".250 " in line
+
+
+def test_sampling_keeps_one_in_n_and_every_error():
+    sink = io.StringIO()
+    log = EventLog(stream=sink, sampling={"db": Sampling(every=10)})
+
+    for i in range(25):
+        log.log("db", "Wrote to DB", rows=i)
+    log.error("db", "Database locked")
+    log.log("other", "unsampled")
+    log.close()
+
+    lines = sink.getvalue().splitlines()
+    assert [line.split("rows=")[-1] for line in lines[:3]] == ["0", "10", "20"]
+    assert "level=error" in lines[3] and "unsampled" in lines[4]
+    assert log.stats.sampled_out == 22
+    assert log.stats.written == 5
+
+
+def test_rate_limit_allows_a_burst_per_second():
+    log = EventLog(stream=io.StringIO(), sampling={"serial": Sampling(per_second=5)})
+
+    for i in range(1000):
+        log.log("serial", "Arduino", line=i)
+    log.close()
+
+    assert 5 <= log.stats.logged <= 6
+    assert log.stats.rate_limited == 1000 - log.stats.logged
+
+
+def test_blocked_sink_never_blocks_the_caller():
+    sink = BlockedSink()
+    log = EventLog(stream=sink, sampling={}, maxsize=100, flush_interval=0.01)
+
+    start = time.perf_counter()
+    for i in range(10_000):
+        log.log("serial", "Arduino", line=i)
+    elapsed = time.perf_counter() - start
+    sink.release.set()
+    log.close()
+
+    assert elapsed < 1.0
+    assert log.stats.dropped >= 10_000 - 2 * 100
+    assert log.stats.written == log.stats.logged
+
+
+@pytest.mark.asyncio
+async def test_write_data_to_db_logs_through_the_shared_log(monkeypatch):
+    sink = io.StringIO()
+    log = EventLog(stream=sink)
+    monkeypatch.setattr("myasync.arduino_serial_loop.LOG", log)
+    batch = SampleBatch.from_lines(
+        [b'{"interval": 1, "value": 2.5}', b'{"interval": 2, "value": 2.5}'], 0.0
+    )
+
+    await write_data_to_db(batch)
+    log.close()
+
+    assert (
+        'cat=db msg="Wrote to DB" rows=2 first_interval=1 last_interval=2'
+        in sink.getvalue()
+    )
+
+
+@pytest.mark.asyncio
+async def test_framed_reader_logs_rejected_lines_with_a_running_total(monkeypatch):
+    sink = io.StringIO()
+    log = EventLog(stream=sink)
+    monkeypatch.setattr("myasync.arduino_serial_loop.LOG", log)
+    protocol = LineFramingProtocol()
+    protocol.data_received(b'boot\n{"interval": 1, "value": 2.5}\nready\n')
+    protocol.data_received(b"oops\n")
+    protocol.connection_lost(None)
+
+    await read_batches_from_arduino(protocol, asyncio.Queue())
+    log.close()
+
+    assert "lines=2 total=2" in sink.getvalue()
+    assert "lines=1 total=3" in sink.getvalue()
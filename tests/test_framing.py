@@ -0,0 +1,97 @@
+import asyncio
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from myasync.framing import LineFramingProtocol, open_framed_serial_connection
+
+
+@pytest.mark.asyncio
+async def test_all_lines_in_chunk_form_one_batch():
+    protocol = LineFramingProtocol()
+
+    protocol.data_received(b'{"interval": 0}\r\n{"interval": 1}\r\n{"inter')
+
+    assert await protocol.read_batch() == [b'{"interval": 0}', b'{"interval": 1}']
+    assert protocol.stats.lines == 2
+
+
+@pytest.mark.asyncio
+async def test_partial_line_is_completed_by_next_chunk():
+    protocol = LineFramingProtocol()
+
+    protocol.data_received(b"ab")
+    protocol.data_received(b"c\r")
+    protocol.data_received(b"\n\n\r\nde\n")
+
+    # Blank lines are skipped, like the strip() check in read_from_arduino
+    assert await protocol.read_batch() == [b"abc", b"de"]
+    assert protocol.stats.batches == 1
+
+
+@pytest.mark.asyncio
+async def test_overlong_line_is_discarded_up_to_its_newline():
+    protocol = LineFramingProtocol(max_line_length=8)
+
+    protocol.data_received(b"0123456789")
+    protocol.data_received(b"abc")
+    protocol.data_received(b"tail\nok\n0123456789\nfine\n")
+
+    assert await protocol.read_batch() == [b"ok", b"fine"]
+    assert protocol.stats.overruns == 2
+
+
+@pytest.mark.asyncio
+async def test_reading_pauses_until_queued_lines_are_drained():
+    transport = Mock()
+    protocol = LineFramingProtocol(high_watermark=4, low_watermark=1)
+    protocol.connection_made(transport)
+
+    protocol.data_received(b"a\nb\n")
+    protocol.data_received(b"c\nd\n")
+    transport.pause_reading.assert_called_once()
+    assert protocol.stats.pauses == 1
+
+    await protocol.read_batch()
+    transport.resume_reading.assert_not_called()
+    await protocol.read_batch()
+    transport.resume_reading.assert_called_once()
+    assert protocol.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_read_batch_returns_empty_after_connection_lost():
+    protocol = LineFramingProtocol()
+    protocol.data_received(b"last\n")
+    protocol.connection_lost(None)
+
+    assert await protocol.read_batch() == [b"last"]
+    assert await protocol.read_batch() == []
+    assert await protocol.read_batch() == []
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pseudo-terminal")
+@pytest.mark.asyncio
+async def test_open_framed_serial_connection_over_pty():
+    controller, device = os.openpty()
+    try:
+        protocol, writer = await open_framed_serial_connection(os.ttyname(device))
+        os.write(controller, b"PING\r\nhello\r\n")
+
+        lines = []
+        while len(lines) < 2:
+            lines += await asyncio.wait_for(protocol.read_batch(), timeout=2)
+        assert lines == [b"PING", b"hello"]
+
+        writer.write(b"PONG\n")
+        await writer.drain()
+        # The transport writes from a loop callback, so read off the loop
+        echoed = await asyncio.wait_for(asyncio.to_thread(os.read, controller, 64), 2)
+        assert echoed.startswith(b"PONG")
+
+        writer.close()
+        await writer.wait_closed()
+    finally:
+        os.close(controller)
+        os.close(device)
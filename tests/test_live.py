@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from myasync.arduino_serial_loop import read_batches_from_arduino
+from myasync.framing import LineFramingProtocol
+from myasync.live import LiveStore, SampleRing
+from myasync.records import Sample, SampleBatch
+from myasync.samples import sample_lines
+
+
+def make_batch(start, count, device="uno"):
+    batch = SampleBatch(device)
+    for i in range(start, start + count):
+        batch.append(float(i), i, i * 0.5)
+    return batch
+
+
+def test_ring_wraps_and_keeps_newest():
+    ring = SampleRing(capacity=8)
+    ring.extend(make_batch(0, 5))
+    ring.extend(make_batch(5, 6))
+
+    assert len(ring) == 8
+    assert ring.last() == Sample(10.0, 10, 5.0)
+    assert list(ring.last_n(4).intervals) == [7, 8, 9, 10]
+    assert list(ring.last_n(100).intervals) == list(range(3, 11))
+
+
+def test_ring_keeps_tail_of_oversized_batch():
+    ring = SampleRing(capacity=4)
+    ring.extend(make_batch(0, 3))
+    ring.extend(make_batch(3, 10))
+
+    assert list(ring.last_n(4).intervals) == [9, 10, 11, 12]
+    assert ring.total == 13
+
+
+def test_ring_window_spans_the_wrap():
+    ring = SampleRing(capacity=8)
+    ring.extend(make_batch(0, 13))
+
+    stats = ring.window(7.0)
+
+    assert (stats.count, stats.min, stats.max, stats.mean) == (6, 3.5, 6.0, 4.75)
+    assert ring.window(100.0) is None
+    assert ring.since(0.0) == 8
+
+
+@pytest.mark.asyncio
+async def test_store_queries_per_device():
+    live = LiveStore(capacity=16)
+    live.update(make_batch(0, 10, device="uno"))
+    live.update(make_batch(100, 2, device="mega"))
+
+    assert await live.last("uno") == Sample(9.0, 9, 4.5)
+    assert list((await live.last_n("mega", 5)).intervals) == [100, 101]
+    assert (await live.window("uno", 2.0, now=9.0)).count == 3
+    assert await live.last("nano") is None
+    assert await live.window("nano", 60.0) is None
+
+
+@pytest.mark.asyncio
+async def test_window_uses_the_sample_clock_and_queries_allocate_nothing():
+    live = LiveStore(capacity=16, now=lambda: 9.0)
+    live.update(make_batch(0, 10, device="uno"))
+
+    assert (await live.window("uno", 2.0)).count == 3
+    assert list((await live.last_n("nano", 5)).intervals) == []
+    assert await live.window("nano", 60.0) is None
+    assert list(live.rings) == [("uno", "value")]
+
+
+@pytest.mark.asyncio
+async def test_next_wakes_on_the_reader_path():
+    live = LiveStore()
+    db_queue = asyncio.Queue()
+    protocol = LineFramingProtocol()
+    waiter = asyncio.create_task(live.next(""))
+    await asyncio.sleep(0)
+
+    protocol.data_received(b"".join(sample_lines(3, start=7)))
+    protocol.connection_lost(None)
+    await read_batches_from_arduino(protocol, db_queue, live=live)
+
+    assert (await asyncio.wait_for(waiter, 1)).interval == 7
+    assert (await live.last("")).interval == 9
+    assert db_queue.qsize() == 1
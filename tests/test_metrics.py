@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from myasync.arduino_serial_loop import read_batches_from_arduino
+from myasync.db_writer import write_batches_to_database
+from myasync.framing import LineFramingProtocol
+from myasync.metrics import Histogram, PipelineMetrics, Registry, serve_metrics
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+from myasync.watermark_queue import OverflowPolicy, WatermarkQueue
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs done", labels={"port": "a"})
+    registry.gauge("depth", "Queue depth", fn=lambda: 7)
+    counter.inc()
+    counter.inc(4)
+
+    assert registry.render() == (
+        "# HELP jobs_total Jobs done\n"
+        "# TYPE jobs_total counter\n"
+        'jobs_total{port="a"} 5\n'
+        "# HELP depth Queue depth\n"
+        "# TYPE depth gauge\n"
+        "depth 7\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5, n=3)
+    histogram.observe(2.0)
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 4',
+        'latency_seconds_bucket{le="+Inf"} 5',
+        "latency_seconds_sum 3.55",
+        "latency_seconds_count 5",
+    ]
+
+
+def test_same_name_different_kind_is_rejected():
+    registry = Registry()
+    registry.counter("things", "Things")
+    with pytest.raises(ValueError):
+        registry.gauge("things", "Things")
+
+
+def test_watch_queue_reads_depth_and_drops_at_scrape():
+    metrics = PipelineMetrics()
+    queue = WatermarkQueue(maxsize=2, policy=OverflowPolicy.DROP_NEWEST)
+    metrics.watch_queue("db", queue)
+    for item in range(3):
+        queue.put_nowait(item)
+
+    text = metrics.registry.render()
+    assert 'myasync_queue_depth{queue="db"} 2' in text
+    assert 'myasync_queue_dropped_newest_total{queue="db"} 1' in text
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stages_record_metrics():
+    metrics = PipelineMetrics()
+    db_queue = asyncio.Queue()
+    protocol = LineFramingProtocol()
+    protocol.data_received(b"".join(sample_lines(50)) + b"not a sample\n")
+    protocol.connection_lost(None)
+
+    class Sink:
+        async def write_batch(self, batches):
+            pass
+
+    await read_batches_from_arduino(protocol, db_queue, metrics)
+    writer = asyncio.create_task(
+        write_batches_to_database(db_queue, Sink(), max_linger=0, metrics=metrics)
+    )
+    await db_queue.join()
+    writer.cancel()
+
+    assert metrics.samples_read.value == 50
+    assert metrics.lines_rejected.value == 1
+    assert metrics.rows_committed.value == 50
+    assert metrics.read_to_enqueue.count == 50
+    assert metrics.enqueue_to_commit.count == 50
+
+
+@pytest.mark.asyncio
+async def test_batch_enqueued_stamps_batch():
+    metrics = PipelineMetrics()
+    batch = SampleBatch.from_lines(sample_lines(3), timestamp=time.time() - 0.2)
+
+    metrics.batch_enqueued(batch)
+
+    assert batch.enqueued_at > 0
+    assert metrics.read_to_enqueue.counts[-1] == 0
+    assert metrics.read_to_enqueue.sum == pytest.approx(0.6, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_serve_metrics_over_http():
+    metrics = PipelineMetrics()
+    metrics.samples_read.inc(3)
+    server = await serve_metrics(metrics.registry, port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def get(path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    try:
+        response = await get("/metrics")
+        assert response.startswith("HTTP/1.1 200 OK")
+        assert "text/plain; version=0.0.4" in response
+        assert "myasync_samples_read_total 3" in response
+        assert (await get("/other")).startswith("HTTP/1.1 404")
+    finally:
+        server.close()
+        await server.wait_closed()
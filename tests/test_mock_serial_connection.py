@@ -3,81 +3,11 @@ import json
 import asyncio
 import serial_asyncio
 
-
-# Example functions that write to serial port
-async def send_command_to_device(command, port="/dev/ttyACM0", baudrate=115200):
-    """Send a single command to the device and return the response."""
-    reader, writer = await serial_asyncio.open_serial_connection(
-        url=port, baudrate=baudrate
-    )
-
-    try:
-        # Send the command
-        command_bytes = (json.dumps(command) + "\n").encode()
-        writer.write(command_bytes)
-        await writer.drain()  # Wait for data to be sent
-
-        # Read the response
-        response_line = await reader.readline()
-        response = json.loads(response_line.decode("utf-8").strip())
-
-        return response
-    finally:
-        writer.close()
-
-
-async def send_multiple_commands(commands, port="/dev/ttyACM0", baudrate=115200):
-    """Send multiple commands and collect all responses."""
-    reader, writer = await serial_asyncio.open_serial_connection(
-        url=port, baudrate=baudrate
-    )
-
-    responses = []
-    try:
-        for cmd in commands:
-            # Send command
-            command_bytes = (json.dumps(cmd) + "\n").encode()
-            writer.write(command_bytes)
-            await writer.drain()
-
-            # Read response
-            response_line = await reader.readline()
-            response = json.loads(response_line.decode("utf-8").strip())
-            responses.append(response)
-
-            # Small delay between commands
-            await asyncio.sleep(0.1)
-
-        return responses
-    finally:
-        writer.close()
-
-
-async def configure_device_settings(settings, port="/dev/ttyACM0", baudrate=115200):
-    """Send configuration settings to device and verify they were applied."""
-    reader, writer = await serial_asyncio.open_serial_connection(
-        url=port, baudrate=baudrate
-    )
-
-    try:
-        # Send configuration command
-        config_command = {"action": "configure", "settings": settings}
-
-        command_bytes = (json.dumps(config_command) + "\n").encode()
-        writer.write(command_bytes)
-        await writer.drain()
-
-        # Read acknowledgment
-        response_line = await reader.readline()
-        response = json.loads(response_line.decode("utf-8").strip())
-
-        if response.get("status") != "ok":
-            raise ValueError(f"Configuration failed: {response}")
-
-        return response
-
-    finally:
-        writer.close()
+from myasync.device_commands import (
+    configure_device_settings,
+    send_command_to_device,
+    send_multiple_commands,
+)
 
 
 # Test cases for writing to serial port
@@ -192,6 +122,19 @@ async def test_write_error_handling(mock_serial_connection):
         await configure_device_settings(settings)
 
 
+@pytest.mark.asyncio
+async def test_response_is_read_past_streamed_samples(mock_serial_connection):
+    """Samples the device streams before it answers are not the response."""
+    ack = {"status": "ok", "settings": {"reporting_interval": 30}}
+    mock_serial_connection["reader"].readline.side_effect = [
+        b'{"interval": 0, "value": 20.0}\r\n',
+        b'{"interval": 1, "value": 20.3}\r\n',
+        (json.dumps(ack) + "\r\n").encode(),
+    ]
+
+    assert await configure_device_settings({"reporting_interval": 30}) == ack
+
+
 @pytest.mark.asyncio
 async def test_writer_drain_called_properly(mock_serial_connection):
     """Test that writer.drain() is called to ensure data transmission."""
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+zmq = pytest.importorskip("zmq")
+from zmq.asyncio import Context
+
+from myasync.arduino_serial_loop import read_batches_from_arduino
+from myasync.framing import LineFramingProtocol
+from myasync.publisher import (
+    SamplePublisher,
+    SampleSubscriber,
+    topic,
+    unpack_published,
+)
+from myasync.records import Sample, SampleBatch
+from myasync.samples import sample_lines
+
+
+def make_batch(start, count, device="uno"):
+    batch = SampleBatch(device)
+    for i in range(start, start + count):
+        batch.append(float(i), i, i * 0.5)
+    return batch
+
+
+@pytest.fixture
+def pubsub():
+    """A publisher and a way to connect subscribers to it, over inproc"""
+    ctx = Context()
+    publisher = SamplePublisher.bind("inproc://publisher-test", context=ctx)
+    subscribers = []
+
+    async def connect(**kwargs):
+        subscriber = SampleSubscriber.connect("inproc://publisher-test", ctx, **kwargs)
+        subscribers.append(subscriber)
+        # PUB drops everything until the subscription has propagated
+        await asyncio.sleep(0.05)
+        return subscriber
+
+    yield publisher, connect
+    for subscriber in subscribers:
+        subscriber.close()
+    publisher.close()
+    ctx.term()
+
+
+def test_unpack_round_trips_frames():
+    batch = make_batch(0, 5, device="mega")
+    frames = [
+        topic("mega"),
+        len(batch).to_bytes(4, "little"),
+        bytes(batch.timestamps),
+        bytes(batch.intervals),
+        bytes(batch.values),
+    ]
+
+    unpacked = unpack_published(frames)
+
+    assert unpacked.device == "mega"
+    assert list(unpacked) == list(batch)
+    with pytest.raises(ValueError):
+        unpack_published(frames[:2] + [bytes(batch.timestamps)[:8]] + frames[3:])
+
+
+@pytest.mark.asyncio
+async def test_subscribers_filter_by_device(pubsub):
+    publisher, connect = pubsub
+    everything = await connect()
+    uno_only = await connect(devices=["uno"])
+
+    publisher.update(make_batch(0, 3, device="uno"))
+    publisher.update(make_batch(10, 2, device="mega"))
+
+    batches = await asyncio.wait_for(everything.receive(), 1)
+    while len(batches) < 2:
+        batches += await asyncio.wait_for(everything.receive(), 1)
+    assert [(b.device, len(b)) for b in batches] == [("uno", 3), ("mega", 2)]
+    [uno] = await asyncio.wait_for(uno_only.receive(), 1)
+    assert list(uno.intervals) == [0, 1, 2]
+    assert publisher.stats.messages == 2 and publisher.stats.samples == 5
+
+
+@pytest.mark.asyncio
+async def test_conflating_subscriber_keeps_newest_per_device(pubsub):
+    publisher, connect = pubsub
+    latest = await connect(conflate=True)
+
+    for start in range(0, 50, 5):
+        publisher.update(make_batch(start, 5, device="uno"))
+    publisher.update(make_batch(100, 1, device="mega"))
+    await asyncio.sleep(0.05)
+
+    batches = await asyncio.wait_for(latest.receive(), 1)
+
+    assert {b.device: list(b) for b in batches} == {
+        "uno": [Sample(49.0, 49, 24.5)],
+        "mega": [Sample(100.0, 100, 50.0)],
+    }
+    assert latest.stats.conflated == 9
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_never_blocks_the_publisher():
+    ctx = Context()
+    publisher = SamplePublisher.bind("inproc://slow-test", context=ctx, send_hwm=4)
+    slow = ctx.socket(zmq.SUB)
+    slow.setsockopt(zmq.RCVHWM, 4)
+    slow.connect("inproc://slow-test")
+    slow.setsockopt(zmq.SUBSCRIBE, b"")
+    await asyncio.sleep(0.05)
+    try:
+        for start in range(0, 1000, 10):
+            publisher.update(make_batch(start, 10))
+
+        # Never read: the overflow is dropped, not an error or a wait
+        assert publisher.stats.messages == 100
+        assert publisher.stats.errors == 0
+    finally:
+        slow.close(linger=0)
+        publisher.close()
+        ctx.term()
+
+
+@pytest.mark.asyncio
+async def test_reader_publishes_queued_batches(pubsub):
+    publisher, connect = pubsub
+    subscriber = await connect()
+    db_queue = asyncio.Queue()
+    protocol = LineFramingProtocol()
+
+    protocol.data_received(b"".join(sample_lines(3, start=7)))
+    protocol.connection_lost(None)
+    await read_batches_from_arduino(protocol, db_queue, publisher=publisher)
+
+    [batch] = await asyncio.wait_for(subscriber.receive(), 1)
+    assert list(batch) == list(db_queue.get_nowait())
@@ -0,0 +1,46 @@
+from conftest import response_generator
+from myasync.records import Sample, SampleBatch, parse_sample_line
+
+
+def test_parse_sample_line():
+    assert parse_sample_line(b'{"interval": 3, "value": 20.5}\r\n') == (3, 20.5)
+    assert parse_sample_line("PING") is None
+    assert parse_sample_line('{"status": "ok"}') is None
+
+
+def test_batch_from_generator_lines():
+    generator = response_generator()
+    lines = [next(generator) for _ in range(20)]
+
+    batch = SampleBatch.from_lines(lines, timestamp=12.5, device="uno")
+
+    assert len(batch) == 20
+    assert list(batch.intervals) == list(range(20))
+    assert min(batch.values) >= 19.0 and max(batch.values) <= 21.0
+    assert batch[0] == Sample(12.5, 0, 20.0)
+    assert batch.device == "uno"
+
+
+def test_rejected_lines_are_counted():
+    batch = SampleBatch.from_lines([b"PING", b'{"interval": 1, "value": 2}', b"{"])
+
+    assert len(batch) == 1
+    assert batch.rejected == 2
+
+
+def test_extend_and_iterate():
+    first = SampleBatch.from_lines([b'{"interval": 0, "value": 1}'], timestamp=1.0)
+    second = SampleBatch.from_lines([b'{"interval": 1, "value": 2}'], timestamp=2.0)
+
+    first.extend(second)
+
+    assert list(first) == [Sample(1.0, 0, 1.0), Sample(2.0, 1, 2.0)]
+    assert list(first.rows()) == [(1.0, 0, 1.0), (2.0, 1, 2.0)]
+
+
+def test_buffered_sample_is_24_bytes():
+    batch = SampleBatch()
+    for i in range(1000):
+        batch.append(float(i), i, 20.0)
+
+    assert batch.nbytes == 24_000
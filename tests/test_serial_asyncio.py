@@ -0,0 +1,64 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from myasync.test_serial_asyncio import InputChunkProtocol
+
+
+def connected(**kwargs):
+    protocol = InputChunkProtocol(**kwargs)
+    protocol.connection_made(MagicMock())
+    return protocol
+
+
+@pytest.mark.asyncio
+async def test_idle_consumer_gets_chunks_without_pausing():
+    protocol = connected()
+    read = asyncio.create_task(protocol.read())
+    await asyncio.sleep(0)
+
+    protocol.data_received(b'{"interval": 0}\n')
+
+    assert await asyncio.wait_for(read, 0.05) == b'{"interval": 0}\n'
+    assert protocol.stats.pauses == 0
+    protocol.transport.pause_reading.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pauses_at_high_watermark_and_resumes_at_low():
+    protocol = connected(high_watermark=30, low_watermark=10)
+
+    for _ in range(3):
+        protocol.data_received(b"x" * 10)
+    protocol.data_received(b"y" * 5)  # already queued by the transport
+
+    assert protocol.paused
+    protocol.transport.pause_reading.assert_called_once()
+    assert await protocol.read() == b"x" * 10
+    assert await protocol.read() == b"x" * 10
+    protocol.transport.resume_reading.assert_not_called()
+    await protocol.read()
+
+    assert not protocol.paused
+    protocol.transport.resume_reading.assert_called_once()
+    assert protocol.buffered == 5
+    assert protocol.stats.peak_buffered == 35
+    assert protocol.stats.max_chunk == 10
+    assert protocol.stats.paused_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_read_returns_empty_once_closed():
+    protocol = connected()
+    protocol.data_received(b"last")
+    protocol.connection_lost(None)
+
+    assert await protocol.read() == b"last"
+    assert await protocol.read() == b""
+    assert await protocol.read() == b""
+
+
+def test_watermarks_are_validated():
+    with pytest.raises(ValueError):
+        InputChunkProtocol(high_watermark=10, low_watermark=10)
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import serial
+
+from myasync.framing import FramingStats
+from myasync.metrics import Histogram, LoopLagMonitor
+from myasync.records import SampleBatch
+from myasync.serial_thread import open_threaded_serial_connection
+from myasync.virtual_device import VirtualArduino
+
+
+async def wait_until(condition, timeout=2.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_reads_lines_then_sees_hang_up():
+    with VirtualArduino(rate=None, baudrate=None, count=50) as device:
+        protocol, writer = await open_threaded_serial_connection(device.port)
+        lines = []
+        while len(lines) < 50:
+            lines += await protocol.read_batch()
+        device.stop()
+        assert await asyncio.wait_for(protocol.read_batch(), 2) == []
+        writer.close()
+        await writer.wait_closed()
+
+    assert list(SampleBatch.from_lines(lines).intervals) == list(range(50))
+    assert protocol.stats.lines == 50
+
+
+@pytest.mark.asyncio
+async def test_stats_are_only_updated_on_the_loop():
+    updated_by = set()
+
+    class LoopOnlyStats(FramingStats):
+        def __setattr__(self, name, value):
+            updated_by.add(threading.current_thread())
+            super().__setattr__(name, value)
+
+    with VirtualArduino(rate=None, baudrate=None, count=50) as device:
+        protocol, writer = await open_threaded_serial_connection(device.port)
+        # Nothing is counted into the protocol before the loop runs again
+        protocol.stats = LoopOnlyStats()
+        lines = []
+        while len(lines) < 50:
+            lines += await protocol.read_batch()
+        device.stop()
+        assert await asyncio.wait_for(protocol.read_batch(), 2) == []
+        writer.close()
+        await writer.wait_closed()
+
+    assert updated_by == {threading.current_thread()}
+    assert protocol.stats.lines == 50
+    assert protocol.stats.bytes >= sum(map(len, lines))
+
+
+@pytest.mark.asyncio
+async def test_reads_keep_their_time_while_the_loop_is_blocked():
+    with VirtualArduino(rate=200) as device:
+        protocol, writer = await open_threaded_serial_connection(device.port)
+        await protocol.read_batch()
+        # Stall the loop; the reader thread keeps reading and stamping lines
+        blocked_at = time.time()
+        time.sleep(0.3)
+        received_at, _ = await protocol.read_timed_batch()
+        writer.close()
+        await writer.wait_closed()
+
+    assert received_at - blocked_at < 0.1
+
+
+@pytest.mark.asyncio
+async def test_writes_go_through_the_writer_thread():
+    with VirtualArduino(rate=0) as device:
+        protocol, writer = await open_threaded_serial_connection(device.port)
+        writer.write(b"LED_ON\n<21.5>")
+        await writer.drain()
+        await wait_until(lambda: device.target_temp is not None)
+        assert device.led is True
+        assert writer.transport.get_write_buffer_size() == 0
+        writer.close()
+        await writer.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_sees_a_blocked_loop():
+    histogram = Histogram("lag", "Lag", buckets=(0.01, 0.1))
+    monitor = LoopLagMonitor(interval=0.01, histogram=histogram)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+    time.sleep(0.15)
+    await wait_until(lambda: monitor.max >= 0.1)
+    task.cancel()
+
+    assert histogram.counts[-1] >= 1
+    assert monitor.count == histogram.count
+
+
+@pytest.mark.asyncio
+async def test_port_that_opens_after_the_timeout_is_closed(monkeypatch):
+    port = MagicMock()
+    release = threading.Event()
+
+    def slow_open(*args, **kwargs):
+        release.wait(5)
+        return port
+
+    monkeypatch.setattr(serial, "serial_for_url", slow_open)
+    with pytest.raises(TimeoutError):
+        async with asyncio.timeout(0.01):
+            await open_threaded_serial_connection("/dev/ttyACM0")
+    release.set()
+
+    await wait_until(lambda: port.close.called)
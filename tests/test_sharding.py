@@ -0,0 +1,159 @@
+import asyncio
+import queue
+from asyncio import QueueFull
+from collections import defaultdict
+
+import pytest
+
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+from myasync.sharding import ShardedPipeline, ship_batches, shard_ports
+from myasync.spool import unpack_batch
+from myasync.supervisor import PortConfig
+from myasync.virtual_device import VirtualArduino
+
+
+async def wait_until(condition, timeout=2.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def test_shard_ports_round_robin():
+    ports = [PortConfig(f"/dev/ttyACM{i}") for i in range(5)]
+
+    shards = shard_ports(ports, 2)
+
+    assert [[port.url for port in shard] for shard in shards] == [
+        ["/dev/ttyACM0", "/dev/ttyACM2", "/dev/ttyACM4"],
+        ["/dev/ttyACM1", "/dev/ttyACM3"],
+    ]
+    assert len(shard_ports(ports[:1], 4)) == 1
+
+
+@pytest.mark.asyncio
+async def test_ship_batches_groups_packed_batches():
+    db_queue = asyncio.Queue()
+    shipped = queue.Queue()
+    for start in range(0, 30, 10):
+        db_queue.put_nowait(
+            SampleBatch.from_lines(sample_lines(10, start), device="uno")
+        )
+
+    task = asyncio.create_task(ship_batches(db_queue, shipped, max_linger=0))
+    await db_queue.join()
+    task.cancel()
+
+    packed = shipped.get_nowait()
+    batches = [unpack_batch(payload) for payload in packed]
+    assert [batch.device for batch in batches] == ["uno"] * 3
+    assert [i for batch in batches for i in batch.intervals] == list(range(30))
+
+
+@pytest.mark.asyncio
+async def test_ship_batches_sends_what_it_collected_when_cancelled():
+    db_queue = asyncio.Queue()
+    shipped = queue.Queue()
+    for start in range(0, 20, 10):
+        db_queue.put_nowait(SampleBatch.from_lines(sample_lines(10, start)))
+
+    # Lingers for more batches, so the cancel lands inside collect_batch
+    task = asyncio.create_task(ship_batches(db_queue, shipped, max_linger=10))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    batches = [unpack_batch(payload) for payload in shipped.get_nowait()]
+    assert [i for batch in batches for i in batch.intervals] == list(range(20))
+    await asyncio.wait_for(db_queue.join(), 1)
+
+
+@pytest.mark.asyncio
+async def test_workers_ship_samples_and_take_commands():
+    devices = [VirtualArduino(rate=None, baudrate=None, count=200) for _ in range(3)]
+    for device in devices:
+        device.start()
+    ports = [
+        PortConfig(device.port, name=f"dev{i}") for i, device in enumerate(devices)
+    ]
+    pipeline = ShardedPipeline(ports, workers=2)
+    task = asyncio.create_task(pipeline.run())
+    try:
+        intervals = defaultdict(list)
+        async with asyncio.timeout(30):
+            while sum(map(len, intervals.values())) < 600:
+                batch = await pipeline.db_queue.get()
+                intervals[batch.device] += batch.intervals
+                pipeline.db_queue.task_done()
+
+        pipeline.send_command("dev2", "LED_ON")
+        await wait_until(lambda: devices[2].led, timeout=5)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        for device in devices:
+            device.stop()
+
+    assert {name: sorted(got) for name, got in intervals.items()} == {
+        f"dev{i}": list(range(200)) for i in range(3)
+    }
+    assert [stats.samples for stats in pipeline.stats] == [400, 200]
+    assert not any(process.is_alive() for process in pipeline.processes)
+
+
+@pytest.mark.asyncio
+async def test_dead_worker_is_restarted():
+    device = VirtualArduino(rate=1000, baudrate=None)
+    device.start()
+    pipeline = ShardedPipeline([PortConfig(device.port, name="dev0")], workers=1)
+    task = asyncio.create_task(pipeline.run())
+    try:
+        async with asyncio.timeout(30):
+            await pipeline.db_queue.get()
+            first = pipeline.processes[0]
+            first.kill()
+            await wait_until(lambda: pipeline.stats[0].restarts == 1, timeout=10)
+            # Samples flow again through the new worker
+            while not pipeline.db_queue.empty():
+                pipeline.db_queue.get_nowait()
+            await pipeline.db_queue.get()
+        assert pipeline.processes[0] is not first
+        assert pipeline.processes[0].is_alive()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        device.stop()
+
+    assert not any(process.is_alive() for process in pipeline.processes)
+
+
+@pytest.mark.asyncio
+async def test_commands_for_a_restarting_worker_are_held():
+    device = VirtualArduino(rate=1000, baudrate=None)
+    device.start()
+    pipeline = ShardedPipeline(
+        [PortConfig(device.port, name="dev0")],
+        workers=1,
+        max_pending_commands=2,
+        restart_delay=lambda attempt: 0.5,
+    )
+    task = asyncio.create_task(pipeline.run())
+    try:
+        async with asyncio.timeout(30):
+            await pipeline.db_queue.get()
+            first = pipeline.processes[0]
+            first.kill()
+            await asyncio.to_thread(first.join)
+            # Dead but not noticed by _run_shard yet
+            pipeline.send_command("dev0", "PING")
+            await wait_until(lambda: pipeline.restarting[0], timeout=5)
+            pipeline.send_command("dev0", "LED_ON")
+            with pytest.raises(QueueFull):
+                pipeline.send_command("dev0", "PING")
+            await wait_until(lambda: len(device.commands_received) >= 2, timeout=15)
+        assert device.commands_received == ["PING", "LED_ON"]
+        assert device.led
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        device.stop()
@@ -0,0 +1,182 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from myasync.db_writer import SQLiteSink, write_batches_to_database
+from myasync.records import SampleBatch
+from myasync.samples import sample_lines
+from myasync.spool import SpoolQueue, pack_batch, unpack_batch
+
+
+def make_batch(start, count=10, device="ttyACM0"):
+    return SampleBatch.from_lines(
+        sample_lines(count, start), timestamp=1000.0 + start, device=device
+    )
+
+
+def intervals(batches):
+    return [interval for batch in batches for interval in batch.intervals]
+
+
+def drain(queue):
+    batches = []
+    while not queue.empty():
+        batches.append(queue.get_nowait())
+        queue.task_done()
+    return batches
+
+
+def committed_intervals(path):
+    with sqlite3.connect(path) as connection:
+        return [
+            row[0]
+            for row in connection.execute("SELECT interval FROM samples ORDER BY id")
+        ]
+
+
+def test_pack_round_trip():
+    batch = make_batch(5, device="port-β")
+
+    restored = unpack_batch(pack_batch(batch, 123.0))
+
+    assert restored.device == "port-β"
+    assert list(restored.rows()) == list(batch.rows())
+    assert restored.enqueued_at == 123.0
+
+
+def test_overflow_spills_and_keeps_order(tmp_path):
+    queue = SpoolQueue(tmp_path, memory_size=3)
+    for start in range(0, 100, 10):
+        queue.put_nowait(make_batch(start))
+
+    assert queue.qsize() == 10
+    assert queue.spooled == 7
+    # Draining the memory head must not let new batches overtake the spooled ones
+    queue.get_nowait()
+    queue.task_done()
+    queue.put_nowait(make_batch(100))
+
+    assert intervals(drain(queue)) == list(range(10, 110))
+    assert queue.stats.spilled == 8
+    assert queue.stats.replayed == 8
+
+
+def test_segments_rotate_and_are_removed_once_committed(tmp_path):
+    queue = SpoolQueue(tmp_path, memory_size=0, segment_bytes=600)
+    for start in range(0, 100, 10):
+        queue.put_nowait(make_batch(start))
+
+    assert len(list(tmp_path.glob("*.seg"))) > 2
+    drain(queue)
+    assert len(list(tmp_path.glob("*.seg"))) == 1
+    assert queue.stats.segments_removed == queue.stats.segments_created - 1
+
+
+def test_torn_tail_is_skipped_on_restart(tmp_path):
+    queue = SpoolQueue(tmp_path, memory_size=0)
+    for start in range(0, 30, 10):
+        queue.put_nowait(make_batch(start))
+    queue.close()
+    (segment,) = tmp_path.glob("*.seg")
+    with open(segment, "r+b") as file:
+        file.truncate(segment.stat().st_size - 5)
+
+    restarted = SpoolQueue(tmp_path, memory_size=0)
+    assert restarted.spooled == 2
+    restarted.put_nowait(make_batch(30))
+    assert intervals(drain(restarted)) == list(range(20)) + list(range(30, 40))
+
+
+@pytest.mark.asyncio
+async def test_restart_resumes_after_last_commit(tmp_path):
+    db_path = str(tmp_path / "readings.db")
+    spool_dir = tmp_path / "spool"
+
+    # First run: everything spills, then only the first three batches commit
+    sink = SQLiteSink(db_path)
+    queue = SpoolQueue(spool_dir, memory_size=0, start=await sink.spool_position("db"))
+    for start in range(0, 100, 10):
+        queue.put_nowait(make_batch(start))
+    first = [queue.get_nowait() for _ in range(3)]
+    await sink.write_batch(first)
+    # Fetched but never committed: lost with the process
+    queue.get_nowait()
+    queue.close()
+    await sink.close()
+
+    # Second run picks up after the committed batches
+    sink = SQLiteSink(db_path)
+    start = await sink.spool_position("db")
+    assert start is not None
+    queue = SpoolQueue(spool_dir, memory_size=0, start=start)
+    assert queue.spooled == 7
+    writer = asyncio.create_task(write_batches_to_database(queue, sink, max_linger=0))
+    await queue.join()
+    writer.cancel()
+    await sink.close()
+
+    assert committed_intervals(db_path) == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_until_database_recovers(tmp_path):
+    class FlakySink:
+        def __init__(self):
+            self.failures = 3
+            self.batches = []
+
+        async def write_batch(self, batches):
+            if self.failures:
+                self.failures -= 1
+                raise sqlite3.OperationalError("database is locked")
+            self.batches += batches
+
+    sink = FlakySink()
+    queue = SpoolQueue(tmp_path, memory_size=2)
+    for start in range(0, 50, 10):
+        queue.put_nowait(make_batch(start))
+
+    writer = asyncio.create_task(
+        write_batches_to_database(
+            queue,
+            sink,
+            max_batch_size=10,
+            max_linger=0,
+            max_retries=None,
+            retry_delay=0.001,
+            catchup_batch_size=1000,
+        )
+    )
+    await asyncio.wait_for(queue.join(), 2)
+    writer.cancel()
+
+    assert intervals(sink.batches) == list(range(50))
+    assert queue.stats.spilled == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_keeps_spooled_batches_on_disk(tmp_path):
+    class DownSink:
+        async def write_batch(self, batches):
+            raise sqlite3.OperationalError("database is locked")
+
+    queue = SpoolQueue(tmp_path, memory_size=0, segment_bytes=600)
+    for start in range(0, 100, 10):
+        queue.put_nowait(make_batch(start))
+
+    writer = asyncio.create_task(
+        write_batches_to_database(
+            queue, DownSink(), max_batch_size=30, max_linger=0, retry_delay=0
+        )
+    )
+    # Every batch has been read back from disk, failed and been spooled again
+    async with asyncio.timeout(5):
+        while queue.stats.replayed < 20:
+            await asyncio.sleep(0.001)
+    writer.cancel()
+    await asyncio.gather(writer, return_exceptions=True)
+    queue.close()
+
+    restarted = SpoolQueue(tmp_path, memory_size=0)
+    assert set(intervals(drain(restarted))) == set(range(100))
@@ -0,0 +1,144 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from myasync.framing import LineFramingProtocol
+from myasync.supervisor import (
+    PortConfig,
+    PortState,
+    SerialSupervisor,
+    backoff_delay,
+    load_port_configs,
+)
+
+
+class FakePorts:
+    """Stands in for open_framed_serial_connection, one protocol per successful open"""
+
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = set(failing)
+        self.opened: dict[str, list[LineFramingProtocol]] = {}
+        self.writers: dict[str, MagicMock] = {}
+
+    async def __call__(self, url, baudrate=115200):
+        if url in self.failing:
+            raise OSError(f"could not open port {url}")
+        protocol = LineFramingProtocol()
+        writer = MagicMock()
+        writer.drain = AsyncMock()
+        writer.wait_closed = AsyncMock()
+        self.opened.setdefault(url, []).append(protocol)
+        self.writers[url] = writer
+        return protocol, writer
+
+
+async def wait_until(predicate, timeout=2.0):
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.001)
+
+
+def test_backoff_delay_is_capped_and_jittered():
+    assert backoff_delay(0, base_delay=0.5, rng=lambda: 1.0) == 0.5
+    assert backoff_delay(3, base_delay=0.5, rng=lambda: 1.0) == 4.0
+    assert backoff_delay(20, base_delay=0.5, max_delay=30.0, rng=lambda: 1.0) == 30.0
+    assert backoff_delay(20, rng=lambda: 0.0) == 0.0
+
+
+def test_load_port_configs(tmp_path):
+    path = tmp_path / "ports.json"
+    path.write_text(
+        json.dumps(
+            {"ports": [{"url": "/dev/ttyACM0"}, {"url": "/dev/ttyACM1", "name": "uno"}]}
+        )
+    )
+
+    ports = load_port_configs(str(path))
+
+    assert ports == [
+        PortConfig("/dev/ttyACM0", 115200, "/dev/ttyACM0"),
+        PortConfig("/dev/ttyACM1", 115200, "uno"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failing_port_does_not_stall_others():
+    fake = FakePorts(failing={"/dev/bad"})
+    db_queue = asyncio.Queue()
+    supervisor = SerialSupervisor(
+        [PortConfig("/dev/good", name="good"), PortConfig("/dev/bad", name="bad")],
+        db_queue,
+        base_delay=0.001,
+        max_delay=0.01,
+    )
+
+    with patch("myasync.supervisor.open_framed_serial_connection", new=fake):
+        task = asyncio.create_task(supervisor.run())
+        await wait_until(lambda: "/dev/good" in fake.opened)
+        fake.opened["/dev/good"][0].data_received(b'{"interval": 0, "value": 20.0}\r\n')
+        batch = await asyncio.wait_for(db_queue.get(), timeout=2)
+        await wait_until(lambda: supervisor.health["bad"].failures >= 3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert batch.device == "good"
+    assert supervisor.health["good"].samples == 1
+    assert supervisor.health["good"].failures == 0
+    assert "could not open port" in supervisor.health["bad"].last_error
+    assert supervisor.health["bad"].state is PortState.STOPPED
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_port_closes():
+    fake = FakePorts()
+    supervisor = SerialSupervisor([PortConfig("/dev/uno")], asyncio.Queue(), base_delay=0.001)
+
+    with patch("myasync.supervisor.open_framed_serial_connection", new=fake):
+        task = asyncio.create_task(supervisor.run())
+        await wait_until(lambda: len(fake.opened.get("/dev/uno", [])) == 1)
+        first_writer = fake.writers["/dev/uno"]
+        fake.opened["/dev/uno"][0].connection_lost(None)
+        await wait_until(lambda: len(fake.opened["/dev/uno"]) == 2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    first_writer.close.assert_called_once()
+    first_writer.wait_closed.assert_awaited_once()
+    health = supervisor.health["/dev/uno"]
+    assert health.connects == 2
+    assert health.last_error == "port closed"
+
+
+@pytest.mark.asyncio
+async def test_quiet_port_is_reconnected():
+    fake = FakePorts()
+    supervisor = SerialSupervisor(
+        [PortConfig("/dev/uno")], asyncio.Queue(), base_delay=0.001, read_timeout=0.01
+    )
+
+    with patch("myasync.supervisor.open_framed_serial_connection", new=fake):
+        task = asyncio.create_task(supervisor.run())
+        await wait_until(lambda: supervisor.health["/dev/uno"].connects >= 2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert "no data" in supervisor.health["/dev/uno"].last_error
+
+
+@pytest.mark.asyncio
+async def test_commands_go_to_their_own_port():
+    fake = FakePorts()
+    supervisor = SerialSupervisor([PortConfig("/dev/a"), PortConfig("/dev/b")], asyncio.Queue())
+
+    with patch("myasync.supervisor.open_framed_serial_connection", new=fake):
+        task = asyncio.create_task(supervisor.run())
+        await wait_until(lambda: len(fake.opened) == 2)
+        await supervisor.command_queues["/dev/b"].put("LED_ON")
+        await asyncio.wait_for(supervisor.command_queues["/dev/b"].join(), timeout=2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    fake.writers["/dev/b"].write.assert_called_once_with(b"LED_ON\n")
+    fake.writers["/dev/a"].write.assert_not_called()
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+import serial_asyncio
+
+from myasync.codec import BINARY, open_codec_serial_connection
+from myasync.device_commands import configure_device_settings, send_command_to_device
+from myasync.framing import open_framed_serial_connection
+from myasync.records import SampleBatch
+from myasync.virtual_device import VirtualArduino
+
+
+async def wait_until(condition, timeout=2.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_emits_samples_then_hangs_up():
+    with VirtualArduino(rate=None, baudrate=None, count=50) as device:
+        protocol, writer = await open_framed_serial_connection(device.port)
+        lines = []
+        while len(lines) < 50:
+            lines += await protocol.read_batch()
+        device.stop()
+        assert await protocol.read_batch() == []
+        writer.close()
+
+    batch = SampleBatch.from_lines(lines)
+    assert list(batch.intervals) == list(range(50))
+    assert batch.rejected == 0
+
+
+@pytest.mark.asyncio
+async def test_baud_pacing_limits_throughput():
+    # 100 JSON samples of ~47 bytes are ~0.4s at 115200 baud, not instant
+    with VirtualArduino(rate=None, baudrate=115200, count=100) as device:
+        protocol, writer = await open_framed_serial_connection(device.port)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        received = 0
+        while received < 100:
+            received += len(await protocol.read_batch())
+        assert loop.time() - start > 0.3
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_answers_commands():
+    with VirtualArduino(rate=0) as device:
+        assert await send_command_to_device({"action": "ping"}, port=device.port) == {
+            "status": "ok",
+            "response": "PONG",
+        }
+        response = await configure_device_settings({"rate": 5}, port=device.port)
+        assert response["settings"] == {"rate": 5}
+        assert device.settings == {"rate": 5}
+
+
+@pytest.mark.asyncio
+async def test_bad_setpoint_is_answered_with_an_error():
+    with VirtualArduino(rate=0) as device:
+        response = await send_command_to_device(
+            {"target-temp": "warm", "id": "cmd_001"}, port=device.port
+        )
+        assert response["status"] == "error"
+        assert response["id"] == "cmd_001"
+        # The device thread is still running
+        assert await send_command_to_device({"action": "ping"}, port=device.port) == {
+            "status": "ok",
+            "response": "PONG",
+        }
+
+
+@pytest.mark.asyncio
+async def test_applies_setpoint_frames_and_led_commands():
+    with VirtualArduino(rate=0) as device:
+        reader, writer = await serial_asyncio.open_serial_connection(url=device.port)
+        writer.write(b"LED_ON\n<21.5>")
+        await writer.drain()
+        await wait_until(lambda: device.target_temp is not None)
+        assert device.target_temp == 21.5
+        assert device.led is True
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_codec_negotiation():
+    with VirtualArduino(rate=None, baudrate=None, count=200) as device:
+        protocol, writer = await open_codec_serial_connection(
+            device.port, codec="binary"
+        )
+        assert protocol.codec is BINARY
+        received = 0
+        while received < 200:
+            received += len(await protocol.read_samples())
+        assert device.codec is BINARY
+        writer.close()
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+
+def test_sleeps_take_no_wall_time(virtual_loop):
+    woke = []
+
+    async def sleeper(name, delay):
+        await asyncio.sleep(delay)
+        woke.append((name, virtual_loop.time()))
+
+    async def main():
+        await asyncio.gather(sleeper("hour", 3600), sleeper("minute", 60))
+
+    started = time.perf_counter()
+    assert virtual_loop.run_for(main(), 7200) == 3600
+
+    assert woke == [("minute", 60), ("hour", 3600)]
+    assert time.perf_counter() - started < 1
+
+
+def test_timeouts_use_virtual_time(virtual_loop):
+    async def main():
+        async with asyncio.timeout(30):
+            await asyncio.Event().wait()
+
+    with pytest.raises(TimeoutError):
+        virtual_loop.run_for(main(), 60)
+    assert virtual_loop.time() == 30
+
+
+def test_time_stands_still_while_executor_work_runs(virtual_loop):
+    order = []
+
+    async def main():
+        timer = asyncio.create_task(asyncio.sleep(1))
+        timer.add_done_callback(lambda _: order.append(("timer", virtual_loop.time())))
+        await virtual_loop.run_in_executor(None, time.sleep, 0.05)
+        order.append(("thread", virtual_loop.time()))
+        await timer
+
+    virtual_loop.run_for(main(), 10)
+
+    assert order == [("thread", 0), ("timer", 1)]
+
+
+def test_run_until_reports_virtual_seconds(virtual_loop):
+    ticks = []
+
+    async def ticker():
+        while True:
+            await asyncio.sleep(0.25)
+            ticks.append(virtual_loop.time())
+
+    elapsed = virtual_loop.run_until(ticker(), lambda: len(ticks) >= 8, poll=0.1)
+    assert elapsed == pytest.approx(2.0, abs=0.1)
+    with pytest.raises(TimeoutError):
+        virtual_loop.run_until(ticker(), lambda: False, timeout=5)
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+
+from myasync.arduino_serial_loop import read_from_arduino
+from myasync.watermark_queue import OverflowPolicy, WatermarkQueue
+
+
+@pytest.mark.asyncio
+async def test_drop_newest_keeps_head():
+    queue = WatermarkQueue(maxsize=3, policy=OverflowPolicy.DROP_NEWEST)
+    for i in range(5):
+        await queue.put(i)
+
+    assert [queue.get_nowait() for _ in range(3)] == [0, 1, 2]
+    assert queue.stats.dropped_newest == 2
+    assert queue.stats.enqueued == 3
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_tail():
+    queue = WatermarkQueue(maxsize=3, policy=OverflowPolicy.DROP_OLDEST)
+    for i in range(5):
+        await queue.put(i)
+
+    assert [queue.get_nowait() for _ in range(3)] == [2, 3, 4]
+    assert queue.stats.dropped_oldest == 2
+
+    # Dropped items must not hold up join()
+    for _ in range(3):
+        queue.task_done()
+    await asyncio.wait_for(queue.join(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_requeue_puts_items_back_at_the_head():
+    queue = WatermarkQueue(maxsize=3, policy=OverflowPolicy.DROP_NEWEST)
+    for i in range(3):
+        queue.put_nowait(i)
+    taken = [queue.get_nowait(), queue.get_nowait()]
+    queue.put_nowait(3)
+    queue.put_nowait(4)
+
+    queue.requeue_nowait(taken)
+
+    assert [queue.get_nowait() for _ in range(5)] == [0, 1, 2, 3, 4]
+    assert queue.stats.dropped_newest == 0
+    assert queue.stats.peak_depth == 5
+    # Once for each get, including the two that were handed back
+    for _ in range(7):
+        queue.task_done()
+    await asyncio.wait_for(queue.join(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_block_waits_for_low_watermark():
+    queue = WatermarkQueue(maxsize=10, high_watermark=4, low_watermark=1)
+    for i in range(4):
+        await queue.put(i)
+    assert queue.above_high_watermark
+
+    producer = asyncio.create_task(queue.put(4))
+    await asyncio.sleep(0)
+    assert not producer.done()
+
+    # Draining to 2 is not enough, the producer is held until depth <= 1
+    queue.get_nowait()
+    queue.get_nowait()
+    await asyncio.sleep(0)
+    assert not producer.done()
+
+    queue.get_nowait()
+    await asyncio.wait_for(producer, timeout=1)
+    assert queue.stats.blocked_puts == 1
+    assert queue.stats.high_watermark_hits == 1
+    assert queue.stats.peak_depth == 4
+
+
+def test_invalid_watermarks():
+    with pytest.raises(ValueError):
+        WatermarkQueue(maxsize=10, high_watermark=11)
+    with pytest.raises(ValueError):
+        WatermarkQueue(maxsize=10, high_watermark=5, low_watermark=5)
+
+
+@pytest.mark.asyncio
+async def test_read_from_arduino_without_delay(mock_serial_connection):
+    queue = WatermarkQueue(maxsize=50, high_watermark=50, low_watermark=10)
+    reader = mock_serial_connection["reader"]
+
+    task = asyncio.create_task(
+        read_from_arduino(reader, queue, line_delay=0, batch_size=10)
+    )
+    while not queue.above_high_watermark:
+        await asyncio.sleep(0)
+    task.cancel()
+
+    # The mock reader never suspends, so the only thing stopping it is backpressure
+    assert queue.qsize() == 50
+    batch = queue.get_nowait()
+    assert len(batch) == 10
+    assert list(batch.intervals) == list(range(10))